@@ -0,0 +1,566 @@
+# Filename:    benchmark.py
+#
+# Description: This file measures how fast the pipeline runs on a large,
+#              synthetic corpus of FOMC-like statements, so that changes to
+#              the code can be checked for speed as well as for correctness.
+#              The statements are made up of the words in the stop list, the
+#              n-grams in the replacement list and the words of any raw
+#              statements that have already been downloaded, with the header
+#              and footer that cleanStatements.py removes.
+#
+# Input:       The word lists in the directory 'data' and, optionally, the
+#              raw statements in statements/statements.raw and the pages
+#              stored by pullStatements.py in statements/statements.html.
+#
+# Output:      Printed timings. Each benchmark also checks that the fast code
+#              gives exactly the same output as the code it replaces.
+#              benchmarkScaling also writes its measurements, per stage and
+#              corpus size, to output/benchmark.json. benchmarkHashing prints
+#              how far the persistence computed from hashed tdms is from the
+#              exact one.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys, json, math, random, re, shutil, string, time, tempfile
+import warnings
+import platform, resource, subprocess, tracemalloc
+from   datetime import date, timedelta
+from   nltk.stem.lancaster import LancasterStemmer
+import cleanStatements, pullStatements, persistence, corpusStore
+from   bs4 import GuessedAtParserWarning
+from   stemCache import StemCache
+from   htmlCache import HtmlCache
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Where the word lists are
+datadir      = cleanStatements.datadir
+# Where the raw statements are, if they have been downloaded
+statementdir = cleanStatements.statementdir
+# Words to use if no statements have been downloaded
+fallbackWords = ('inflation expectations economic activity labor market '
+                 'growth energy prices oil commodity foreign global '
+                 'productivity policy committee target range percent '
+                 'employment housing sector investment spending household '
+                 'consumer weather hurricane accommodative firming '
+                 'tightening easing balance sheet securities treasury '
+                 'mortgage 2 1/2 u.s.').split()
+# Corpus sizes (number of statements) used by benchmarkScaling, the share of
+# made-up words in them (see syntheticStatements), and where the results go
+scalingSizes  = [300, 3000, 30000]
+scalingNew    = 0.002
+benchmarkFile = os.path.join('output', 'benchmark.json')
+# Numbers of hashed features compared with the exact tdms by benchmarkHashing
+hashingSizes  = [2**10, 2**12, 2**14, 2**18]
+# The word/phrase counts timed by benchmarkScaling (as in persistence.main)
+countLists    = [['inflation expectations', 'inflationary expectations'],
+                 ['productive', 'productivity'],
+                 ['energy', 'commodity', 'commodities', 'oil'],
+                 ['foreign', 'global', 'abroad', 'geopolitical'],
+                 ['weather', 'hurricane', 'katrina', 'winter'],
+                 []]
+# extractStatement warns that it has to guess which parser BeautifulSoup uses
+warnings.filterwarnings('ignore', category = GuessedAtParserWarning)
+
+#-----------------------------------------------------------------------------#
+# corpusWords: Returns three lists used to make synthetic statements: the stop
+#   words, the n-grams from the replacement list and the other words, taken
+#   from the raw statements in statementdir if there are any.
+#-----------------------------------------------------------------------------#
+def corpusWords ():
+    stoplist = [line.strip().lower() for line in
+                open(os.path.join(datadir, 'stoplist_mcdonald_comb.txt'), 'r')]
+    ngrams   = cleanStatements.getReplacementList(
+                   os.path.join(datadir, 'wordlist.txt'))[0]
+    words    = set()
+    if os.path.isdir(statementdir):
+        for f in os.listdir(statementdir):
+            text = open(os.path.join(statementdir, f), 'r').read()
+            words.update(re.findall(r'[A-Za-z0-9.,;:\-]+', text))
+    words = sorted(words) if words else fallbackWords
+    return stoplist, ngrams, words
+
+#-----------------------------------------------------------------------------#
+# syntheticStatements: Returns a list of ndocs made-up raw statements, each
+#   with between minWords and maxWords words. newWords is the share of words
+#   that are made up (a random string of letters, or a number), so that, as in
+#   a real corpus, the vocabulary keeps growing with the number of statements.
+#   The same seed always gives the same statements.
+#-----------------------------------------------------------------------------#
+def syntheticStatements (ndocs, seed = 0, minWords = 200, maxWords = 600,
+                         newWords = 0):
+    rand = random.Random(seed)
+    stoplist, ngrams, words = corpusWords()
+    footers = ['Voting for the FOMC monetary policy action were: ',
+               'In taking the discount rate action, the Board ', '']
+    statements = []
+    for d in range(ndocs):
+        body = []
+        for w in range(rand.randint(minWords, maxWords)):
+            draw = rand.random()
+            if draw < 0.45:
+                word = rand.choice(stoplist)
+            elif draw < 0.55:
+                word = rand.choice(ngrams)
+            else:
+                word = rand.choice(words)
+            if newWords and rand.random() < newWords:
+                if rand.random() < 0.5:
+                    word = ''.join(rand.choice(string.ascii_lowercase)
+                                   for c in range(rand.randint(4, 10)))
+                else:
+                    word = '%d.%d' % (rand.randint(0, 20), rand.randint(0, 99))
+            if rand.random() < 0.05:
+                word = word + rand.choice(['.', ',', ';', '\n'])
+            body.append(word)
+        statements.append('Release Date: today\nFor immediate release\n' +
+                          ' '.join(body) + '\n' + rand.choice(footers) +
+                          '\n2015 Monetary Policy\n')
+    return statements
+
+#-----------------------------------------------------------------------------#
+# timeit: Runs function(*args) repeat times, and returns the fastest time
+#   (in seconds) and the output of the last run.
+#-----------------------------------------------------------------------------#
+def timeit (function, args, repeat = 3):
+    best = None
+    for r in range(repeat):
+        start  = time.time()
+        output = function(*args)
+        took   = time.time() - start
+        best   = took if best is None else min(best, took)
+    return best, output
+
+#-----------------------------------------------------------------------------#
+# benchmarkCleaning: Times the cleaning of ndocs synthetic statements, with
+#   each of the two cleaning configurations used by cleanStatements.main
+#   (and the first without stemming, which takes most of the time and is the
+#   same in both), one n-gram and stop word at a time (cleanTextSequential)
+#   and with the compiled StatementCleaner, and checks that the output is
+#   identical.
+#-----------------------------------------------------------------------------#
+def benchmarkCleaning (ndocs = 2000):
+    statements = syntheticStatements(ndocs)
+    replacements = cleanStatements.getReplacementList(
+                       os.path.join(datadir, 'wordlist.txt'))
+    stoplist     = [line.rstrip('\n') for line in
+                    open(os.path.join(datadir, 'stoplist_mcdonald_comb.txt'),
+                         'r')]
+    configs = [
+        ('Preprocessing', replacements, stoplist, '[^A-Za-z ]+', 1),
+        ('Preprocessing, no stemming', replacements, stoplist,
+         '[^A-Za-z ]+', 0),
+        ('No preprocessing',
+         cleanStatements.getReplacementList(
+             os.path.join(datadir, 'wordlist.np.txt')),
+         [line.rstrip('\n') for line in
+          open(os.path.join(datadir, 'emptystop.txt'), 'r')],
+         '[^A-Za-z0-9 ]+', 0)]
+
+    for name, replacements, stoplist, charsToKeep, stem in configs:
+        cleaner = cleanStatements.StatementCleaner(replacements, stoplist,
+                                                   charsToKeep, stem)
+        old, oldOut = timeit(lambda: [cleanStatements.cleanTextSequential(
+                                          s, replacements, stoplist,
+                                          charsToKeep, stem)
+                                      for s in statements], ())
+        new, newOut = timeit(lambda: [cleaner.clean(s) for s in statements],
+                             ())
+        if oldOut != newOut:
+            raise AssertionError(name + ': compiled cleaning differs')
+        print('Cleaning (%s), %d statements: %.3fs sequential, '
+              '%.3fs compiled (%.1fx)' % (name, ndocs, old, new, old/new))
+
+#-----------------------------------------------------------------------------#
+# benchmarkStemming: Times the stemming of every word of ndocs synthetic
+#   statements with LancasterStemmer, with an empty StemCache, and with a
+#   new StemCache reading the table on disk left by the first one (a repeat
+#   run), and checks that the stems are the same.
+#-----------------------------------------------------------------------------#
+def benchmarkStemming (ndocs = 2000):
+    words = ' '.join(syntheticStatements(ndocs)).lower().split()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stems.sqlite')
+        stemmer = LancasterStemmer()
+        old, oldOut = timeit(lambda: [stemmer.stem(w) for w in words], (),
+                             repeat = 1)
+        cold = StemCache(path = path)
+        first, coldOut = timeit(lambda: [cold.stem(w) for w in words], (),
+                                repeat = 1)
+        cold.flush()
+        warm = StemCache(path = path)
+        repeat, warmOut = timeit(lambda: [warm.stem(w) for w in words], (),
+                                 repeat = 1)
+        warm.db.close()
+        cold.db.close()
+    if not oldOut == coldOut == warmOut:
+        raise AssertionError('cached stems differ')
+    print('Stemming, %d words: %.3fs uncached, %.3fs first run, '
+          '%.3fs repeat run (%d of %d stemmed)'
+          % (len(words), old, first, repeat, warm.misses, len(words)))
+
+#-----------------------------------------------------------------------------#
+# statementPage: Returns a made-up page (bytes) for the statement released on
+#   date (YYYYMMDD), with body (a list of paragraphs) laid out the way the Fed
+#   website lays out statements from the same era (see
+#   pullStatements.FOMCstatementURL): plain tables and fonts in windows-1252
+#   up to 2005, and the later templates with scripts, navigation, a "Share"
+#   section and, from 2016, "For release at" and "Last Update".
+#-----------------------------------------------------------------------------#
+def statementPage (date, body):
+    year = int(date[:4])
+    paragraphs = ''.join('<p>%s</p>\n' % p for p in body)
+    if year < 2006:
+        page = ('<html><head><title>FRB: Press Release--FOMC statement--%s'
+                '</title>\n<meta http-equiv="Content-Type" content="text/html; '
+                'charset=windows-1252"></head>\n<body bgcolor="#FFFFFF">\n'
+                '<!-- header -->\n<table width="600"><tr><td><font size="2">'
+                'Release Date: %s</font></td></tr>\n<tr><td><b>For immediate '
+                'release</b><br>&nbsp;</td></tr><tr><td>\n%s</td></tr></table>'
+                '\n<p>&#150; Voting for the FOMC monetary policy action were: '
+                'Alan Greenspan, Chairman.</p>\n<hr><a href="/fomc/">%d '
+                'Monetary policy</a><br><a href="/">Home</a> | <a href='
+                '"/press/">Press releases</a>\n</body></html>'
+                % (date, date, paragraphs, year))
+        return page.encode('windows-1252')
+    if year < 2016:
+        release = 'For immediate release'
+        footer  = '<div class="footer"><a href="/monetarypolicy.htm">%d ' \
+                  'Monetary Policy</a></div>' % year
+    else:
+        release = 'For release at 2:00 p.m. EDT'
+        footer  = '<p class="lastUpdate">Last Update:\n%s %d, %d</p>' \
+                  % ('September', int(date[6:]), year)
+    page = ('<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            '<title>Federal Reserve Board - Federal Reserve issues FOMC '
+            'statement</title>\n<script type="text/javascript">var data = '
+            '{"release": "For immediate release"};</script>\n<style>.share '
+            '{ display: inline; }</style></head>\n<body>\n<nav><ul><li><a '
+            'href="/">Home</a></li>\n<li><a href="/newsevents.htm">News '
+            '&amp; Events</a></li></ul></nav>\n<div id="article">\n<div '
+            'class="heading"><p class="article__time">%s</p>\n<h3 class='
+            '"title"><em>Federal Reserve issues FOMC statement</em></h3>\n'
+            '<p class="releaseTime">%s</p></div>\n<div class="share">\n'
+            '<span>Share</span>\n<ul><li><a href="#">Twitter</a></li>\n<li>'
+            '<a href="#">Facebook</a></li></ul>\n</div>\n<div class="col-xs-'
+            '12">\n%s<p>Voting for the monetary policy action were Jerome H. '
+            'Powell, Chair; John C. Williams, Vice Chair.</p>\n<p>For media '
+            'inquiries, call 202-452-2955.</p>\n</div></div>\n%s\n<noscript>'
+            'Please enable JavaScript</noscript>\n</body></html>'
+            % (date, release, paragraphs, footer))
+    return page.encode('utf-8')
+
+#-----------------------------------------------------------------------------#
+# benchmarkExtraction: Times the extraction of the statements from ndocs
+#   pages, with extractStatement and with pullStatements.StatementExtractor,
+#   and checks that the text is identical. The pages are the ones stored by
+#   pullStatements.py (see htmlCache.py), if any, and made-up pages (see
+#   statementPage) for a date from each era of pullStatements.FOMCstatementURL,
+#   whose statements are also checked against the text they were made from.
+#-----------------------------------------------------------------------------#
+def benchmarkExtraction (ndocs = 500):
+    rand = random.Random(0)
+    words = corpusWords()[2]
+    dates = ['19950201', '19961113', '19990518', '20020507', '20040810',
+             '20081216', '20150128', '20250917']
+    pages = []
+    for date in dates:
+        body = [' '.join(rand.choice(words) for w in range(rand.randint(30,90)))
+                + '.' for p in range(rand.randint(3, 8))]
+        html = statementPage(date, body)
+        text = pullStatements.extractStatement(html)
+        if not text or not all(p.encode('ascii', 'ignore').decode('ascii')
+                                in text for p in body):
+            raise AssertionError(date + ': statement not extracted')
+        pages.append((date, html))
+
+    cache = HtmlCache()
+    for url in sorted(cache.index):
+        html = cache.read(url)
+        if html is not None:
+            pages.append((url, html))
+    pages = [pages[i % len(pages)] for i in range(max(ndocs, len(pages)))]
+
+    extractor = pullStatements.StatementExtractor()
+    old, oldOut = timeit(lambda: [pullStatements.extractStatement(html)
+                                  for name, html in pages], (), repeat = 1)
+    new, newOut = timeit(lambda: [extractor.extract(html)
+                                  for name, html in pages], ())
+    for (name, html), oldText, newText in zip(pages, oldOut, newOut):
+        if oldText != newText:
+            raise AssertionError(name + ': fast extraction differs')
+    print('Extraction (%s parser), %d pages: %.3fs BeautifulSoup, %.3fs '
+          'fast (%.1fx)' % (extractor.parser, len(pages), old, new, old/new))
+
+#-----------------------------------------------------------------------------#
+# writeCorpus: Writes statements (a list of strings) to directory, one file
+#   per statement, named like the real ones (statement.fomc.YYYYMMDD.txt),
+#   with one made-up date per day from January 1, 1900 on. Returns the list
+#   of file names.
+#-----------------------------------------------------------------------------#
+def writeCorpus (statements, directory):
+    os.makedirs(directory, exist_ok = True)
+    names = []
+    for d in range(len(statements)):
+        day = date(1900, 1, 1) + timedelta(days = d)
+        names.append('statement.fomc.' + day.strftime('%Y%m%d') + '.txt')
+        with open(os.path.join(directory, names[-1]), 'w') as f:
+            f.write(statements[d])
+    return names
+
+#-----------------------------------------------------------------------------#
+# measure: Runs function() once and returns a dictionary with the wall clock
+#   and CPU time it took (in seconds), and the peak resident memory of this
+#   process so far (in MB). If memory is True, function() is then run a
+#   second time, with tracemalloc on, to find the most memory (in MB) that
+#   it allocated at once (tracemalloc slows python down, so it is not on
+#   while timing). reset, if given, is run (untimed) before each run, so that
+#   the second does the same work as the first rather than reuse what the
+#   first left behind.
+#-----------------------------------------------------------------------------#
+def measure (function, memory = True, reset = None):
+    if reset is not None:
+        reset()
+    start, cpu = time.perf_counter(), time.process_time()
+    function()
+    result = {'seconds'   : time.perf_counter() - start,
+              'cpuSeconds': time.process_time() - cpu,
+              'maxRSSMB'  : resource.getrusage(resource.RUSAGE_SELF)
+                            .ru_maxrss/1024.0}
+    if memory:
+        if reset is not None:
+            reset()
+        tracemalloc.start()
+        function()
+        result['peakMB'] = tracemalloc.get_traced_memory()[1]/2.0**20
+        tracemalloc.stop()
+    return result
+
+#-----------------------------------------------------------------------------#
+# dropPack: Deletes the pack of directory, with the statements and tokens
+#   kept from it in this process (see corpusStore.py), so that the next stage
+#   to read directory packs and tokenizes it again.
+#-----------------------------------------------------------------------------#
+def dropPack (directory):
+    path = corpusStore.corpusPath(directory)
+    shutil.rmtree(path, ignore_errors = True)
+    corpusStore.corpora.pop(path, None)
+    corpusStore.streams.pop(path, None)
+
+#-----------------------------------------------------------------------------#
+# gitCommit: Returns the commit of the code being benchmarked (None if this
+#   is not a git repository).
+#-----------------------------------------------------------------------------#
+def gitCommit ():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr = subprocess.DEVNULL,
+                                       cwd = os.path.dirname(
+                                           os.path.abspath(__file__))
+                                       ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#-----------------------------------------------------------------------------#
+# benchmarkScaling: Runs each stage of the pipeline on synthetic corpora of
+#   each of the sizes (numbers of statements) in sizes, in a temporary
+#   directory, and measures its time and memory (see measure). The stages
+#   are those of cleanStatements.main and persistence.main, for each
+#   configuration: cleanStatement, createtdm, calculatePersistence and the
+#   word counts (wordCounts/countPhrases). The results are written to outfile
+#   (as JSON, after each corpus, so a long run can be stopped) and returned:
+#   a dictionary with the commit, the machine and a list of results, one per
+#   stage and corpus. Compare two runs with compareBenchmarks.
+#-----------------------------------------------------------------------------#
+def benchmarkScaling (sizes = scalingSizes, outfile = benchmarkFile,
+                      memory = True):
+    replacements   = cleanStatements.getReplacementList(
+                         os.path.join(datadir, 'wordlist.txt'))
+    replacementsNP = cleanStatements.getReplacementList(
+                         os.path.join(datadir, 'wordlist.np.txt'))
+    stoplist       = [line.rstrip('\n') for line in
+                      open(os.path.join(datadir,
+                                        'stoplist_mcdonald_comb.txt'), 'r')]
+    stoplistNP     = [line.rstrip('\n') for line in
+                      open(os.path.join(datadir, 'emptystop.txt'), 'r')]
+    cleanings = [('', replacements, stoplist, '[^A-Za-z ]+', 1),
+                 ('.np', replacementsNP, stoplistNP, '[^A-Za-z0-9 ]+', 0)]
+    persistenceConfigs = [('.np', False, 'Baseline'),
+                          ('', False, 'Preprocessing'),
+                          ('', True, 'Preprocessing + IDF')]
+
+    report = {'commit'  : gitCommit(),
+              'time'    : time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python'  : platform.python_version(),
+              'machine' : platform.platform(),
+              'cpus'    : os.cpu_count(),
+              'results' : []}
+    TDMdir, statementDir = persistence.TDMdir, persistence.statementDir
+    try:
+        for ndocs in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                rawDir  = os.path.join(tmp, 'raw')
+                names   = writeCorpus(syntheticStatements(
+                              ndocs, newWords = scalingNew), rawDir)
+                ntokens = sum(len(open(os.path.join(rawDir, f), 'r')
+                                  .read().split()) for f in names)
+                persistence.TDMdir = tmp
+                persistence.statementDir = os.path.join(tmp, 'clean.np')
+
+                def record (stage, config, result, **counts):
+                    result = dict(result, stage = stage, config = config,
+                                  ndocs = ndocs, ntokens = ntokens, **counts)
+                    report['results'].append(result)
+                    print('%-20s %-20s %7d statements: %8.3fs %s'
+                          % (stage, config, ndocs, result['seconds'],
+                             '%8.1f MB' % result['peakMB']
+                             if 'peakMB' in result else ''))
+
+                for suffix, replace, stop, chars, stem in cleanings:
+                    cleanDir = os.path.join(tmp, 'clean' + suffix)
+                    os.makedirs(cleanDir)
+                    record('cleanStatement', 'clean' + suffix, measure(
+                        lambda: [cleanStatements.cleanStatement(
+                                     f, rawDir, replace, cleanDir, stop,
+                                     chars, stem) for f in names], memory))
+                    result = measure(lambda: cleanStatements.createtdm(
+                                         cleanDir, tmp, suffix), memory,
+                                     lambda: dropPack(cleanDir))
+                    with open(os.path.join(tmp, 'tdm' + suffix,
+                                           'meta.json'), 'r') as f:
+                        info = json.load(f)
+                    record('createtdm', 'tdm' + suffix, result,
+                           nwords = info['shape'][0], nnz = info['nnz'])
+
+                for suffix, IDF, name in persistenceConfigs:
+                    record('calculatePersistence', name, measure(
+                        lambda: persistence.calculatePersistence(
+                            suffix, IDF, name, persistence.pd.DataFrame()),
+                        memory))
+
+                record('wordCounts', 'countPhrases', measure(
+                    lambda: persistence.countPhrases(
+                        countLists, [str(i) for i in range(len(countLists))]),
+                    memory))
+
+            os.makedirs(os.path.dirname(outfile) or '.', exist_ok = True)
+            with open(outfile, 'w') as f:
+                json.dump(report, f, indent = 1)
+    finally:
+        persistence.TDMdir, persistence.statementDir = TDMdir, statementDir
+    return report
+
+#-----------------------------------------------------------------------------#
+# benchmarkHashing: Measures the error of hashing the words into a fixed
+#   number of features (see cleanStatements.createtdm) for each number in
+#   sizes: for each persistence configuration of persistence.main, the
+#   persistence is computed from the exact tdm and from the hashed one, and
+#   the largest and root mean square differences are printed, with the
+#   standard deviation expected of the error of a cosine similarity,
+#   sqrt((1 + cos^2)/features), at the mean persistence. The clean statements
+#   in cleanStatements.cleanDir and cleanDirNP are used if there are any, and
+#   ndocs synthetic statements, cleaned, otherwise. Returns a list of results.
+#-----------------------------------------------------------------------------#
+def benchmarkHashing (sizes = hashingSizes, ndocs = 300):
+    configs = [('.np', False, 'Baseline'),
+               ('', False, 'Preprocessing'),
+               ('', True, 'Preprocessing + IDF')]
+    results = []
+    TDMdir = persistence.TDMdir
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dirs = {'': cleanStatements.cleanDir,
+                    '.np': cleanStatements.cleanDirNP}
+            if not all(os.path.isdir(d) and os.listdir(d)
+                       for d in dirs.values()):
+                rawDir = os.path.join(tmp, 'raw')
+                names  = writeCorpus(syntheticStatements(
+                             ndocs, newWords = scalingNew), rawDir)
+                for suffix, replace, stop, chars, stem in [
+                    ('', 'wordlist.txt', 'stoplist_mcdonald_comb.txt',
+                     '[^A-Za-z ]+', 1),
+                    ('.np', 'wordlist.np.txt', 'emptystop.txt',
+                     '[^A-Za-z0-9 ]+', 0)]:
+                    dirs[suffix] = os.path.join(tmp, 'clean' + suffix)
+                    os.makedirs(dirs[suffix])
+                    replace = cleanStatements.getReplacementList(
+                                  os.path.join(datadir, replace))
+                    stop    = [line.rstrip('\n') for line in
+                               open(os.path.join(datadir, stop), 'r')]
+                    for f in names:
+                        cleanStatements.cleanStatement(
+                            f, rawDir, replace, dirs[suffix], stop, chars,
+                            stem)
+            persistence.TDMdir = tmp
+
+            def persistenceOf (features):
+                for suffix in dirs:
+                    cleanStatements.createtdm(dirs[suffix], tmp, suffix,
+                                              features = features)
+                return [persistence.calculatePersistence(
+                            suffix, IDF, name, persistence.pd.DataFrame())
+                        [name].values for suffix, IDF, name in configs]
+
+            exact = persistenceOf(None)
+            for features in sizes:
+                hashed = persistenceOf(features)
+                for (suffix, IDF, name), a, b in zip(configs, exact, hashed):
+                    error = b - a
+                    result = {'config'  : name,
+                              'features': features,
+                              'maxError': float(abs(error).max()),
+                              'rmsError': float(math.sqrt((error**2).mean())),
+                              'expected': math.sqrt((1 + a.mean()**2)
+                                                    / features)}
+                    results.append(result)
+                    print('Hashing (%s), %7d features: largest error %.4f, '
+                          'rms %.4f (expected %.4f)'
+                          % (name, features, result['maxError'],
+                             result['rmsError'], result['expected']))
+    finally:
+        persistence.TDMdir = TDMdir
+    return results
+
+#-----------------------------------------------------------------------------#
+# compareBenchmarks: Prints, for every stage and corpus size measured in both
+#   old and new (files written by benchmarkScaling, e.g. before and after a
+#   change), the time and memory of each and the ratio new/old.
+#-----------------------------------------------------------------------------#
+def compareBenchmarks (old, new):
+    runs = []
+    for path in [old, new]:
+        with open(path, 'r') as f:
+            runs.append(dict(((r['stage'], r['config'], r['ndocs']), r)
+                             for r in json.load(f)['results']))
+    for key in sorted(set(runs[0]) & set(runs[1])):
+        a, b = runs[0][key], runs[1][key]
+        line = '%-20s %-20s %7d: %8.3fs -> %8.3fs (%5.2fx)' \
+               % (key + (a['seconds'], b['seconds'],
+                         b['seconds']/max(a['seconds'], 1e-9)))
+        if 'peakMB' in a and 'peakMB' in b:
+            line = line + ', %8.1f -> %8.1f MB' % (a['peakMB'], b['peakMB'])
+        print(line)
+
+#-----------------------------------------------------------------------------#
+# The main function runs every benchmark. Type 'python benchmark.py scaling
+#   [sizes...]' to run benchmarkScaling instead (e.g. 'python benchmark.py
+#   scaling 300 100000'), and 'python benchmark.py compare old.json
+#   new.json' to compare two of its runs, and 'python benchmark.py hashing
+#   [features...]' to run benchmarkHashing.
+#-----------------------------------------------------------------------------#
+def main():
+    benchmarkCleaning()
+    benchmarkStemming()
+    benchmarkExtraction()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'scaling':
+        benchmarkScaling([int(n) for n in sys.argv[2:]] or scalingSizes)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        compareBenchmarks(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'hashing':
+        benchmarkHashing([int(n) for n in sys.argv[2:]] or hashingSizes)
+    else:
+        main()
@@ -20,9 +20,10 @@
 #                    information removed. They have also been stemmed, words
 #                    have been concatenated, and numbers/stopwords
 #                    have been removed.
-#              Three files for each type of preprocessing: a sparse form of the
-#              tdm, a list of words and a list of documents that compose the
-#              tdm.
+#              For each type of preprocessing, the tdm in the binary format
+#              of tdmStore.py (the directory output/tdm*), and three csv
+#              files: a sparse form of the tdm, a list of words and a list of
+#              documents that compose the tdm.
 #
 # Author:      Miguel Acosta
 #              www.acostamiguel.com
@@ -31,11 +32,20 @@
 
 
 #--------------------------------- IMPORTS -----------------------------------#
-import os, csv, re
+import os, csv, re, hashlib
 from os import listdir
 from os.path import isfile, join
-from nltk.stem.lancaster import LancasterStemmer
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+from scipy.sparse import csr_matrix
 from textmining_withnumbers import TermDocumentMatrix as TDM
+from textmining_withnumbers import HashedTermDocumentArrays
+from textmining_withnumbers import phrase_tokenizer, simple_tokenize
+from stemCache import getStemCache, lancasterStemmer
+from tdmStore import saveTDM, tdmPath
+from corpusStore import loadCorpus, loadTokens, packDirectory
+import instrumentation
 
 #-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
 # Directory where the stop words and n-grams to concatenate are
@@ -47,6 +57,32 @@ cleanDir     = os.path.join('statements','statements.clean')
 cleanDirNP   = os.path.join('statements','statements.clean.np')
 # Where the tdms should go
 outputDir    = 'output'
+# Number of processes used to clean the statements (1 cleans them one at a
+# time, in this process). The output is the same for any number.
+workers      = 1
+# Number of columns of the tdms when words are hashed into a fixed number of
+# features (see HashedTermDocumentArrays), for corpora whose vocabulary is too
+# large to keep; None counts every word exactly.
+features     = None
+# Number of documents in which a word must appear to be in the tdm
+cutoff       = 1
+# The types of cleaning done by main (with and without preprocessing): the
+# suffix of the tdm, the directory of the cleaned statements, the stop list and
+# replacement list (in datadir), the characters to remove and whether to stem.
+# runPipeline.py and the other scripts read them from here.
+cleaningConfigs = [
+    {'suffix'      : '',
+     'cleanDir'    : cleanDir,
+     'stoplist'    : 'stoplist_mcdonald_comb.txt',
+     'replacements': 'wordlist.txt',
+     'charsToKeep' : '[^A-Za-z ]+',
+     'stem'        : 1},
+    {'suffix'      : '.np',
+     'cleanDir'    : cleanDirNP,
+     'stoplist'    : 'emptystop.txt',
+     'replacements': 'wordlist.np.txt',
+     'charsToKeep' : '[^A-Za-z0-9 ]+',
+     'stem'        : 0}]
 
 #-----------------------------------------------------------------------------#
 # getReplacementList: Returns two lists, a list of N n-grams (phrase with n
@@ -60,29 +96,40 @@ def getReplacementList (list_name):
     newWords = [allWords[i] for i in range(len(allWords)) if i % 2 == 1]
     return [oldWords, newWords]
 
+#-----------------------------------------------------------------------------#
+# cleaningArgs: Returns the (replacements, locationnew, stoplist, charsToKeep,
+#   stem) tuple that cleanStatementConfigs takes for config (an element of
+#   cleaningConfigs), reading its word lists from datadir.
+#-----------------------------------------------------------------------------#
+def cleaningArgs (config):
+    stoplist = [line.rstrip('\n') for line in
+                open(os.path.join(datadir, config['stoplist']), 'r')]
+    replacements = getReplacementList(os.path.join(datadir,
+                                                   config['replacements']))
+    return (replacements, config['cleanDir'], stoplist,
+            config['charsToKeep'], config['stem'])
+
 
 
 #-----------------------------------------------------------------------------#
-# cleanStatement: This function is the meat of this code--it performs all of the
-#   cleaning/preprocessing described in the header of this document. It's
-#   inputs are:
-#     (1) statement   : a string with the filename of a single FOMC statement
-#     (2) locationold : Directory where raw statements are located (string)
-#     (3) replacements: Output from getReplacementList
-#     (4) locationnew : Directory where clean statements go (string)
-#     (5) stoplist    : A list of words to remove (list of strings)
-#     (6) charsToKeep : A regular expression of the character types to keep
-#     (7) stem        : A logical for whether to stem the words
+# Patterns used by every cleaning configuration, compiled once: punctuation
+#   and newlines (replaced with a space, in the order that they used to be
+#   replaced one at a time), and the start and end of the statement text.
 #-----------------------------------------------------------------------------#
-def cleanStatement (statement, locationold, replacements, locationnew, \
-                    stoplist, charsToKeep, stem):
-    # Read in the statement and convert it to lower case
-    original  = open(os.path.join(locationold,statement),'r').read().lower()
+punctuation = re.compile(r'\r\n|[.\n,\-;:]')
+startText   = re.compile(r'[Ff]or\s[Ii]mmediate\s[Rr]elease')
+inTaking    = re.compile(r'in\staking\sthe\sdiscount\srate\saction')
+votingFor   = re.compile(r'voting\sfor\sthe\sfomc')
 
-    clean = original
+#-----------------------------------------------------------------------------#
+# preprocessText: Performs the cleaning that does not depend on the word
+#   lists: converts the raw statement, original (a string), to lower case,
+#   removes punctuation and every character matched by the regular expression
+#   charsToKeep, and removes the header and footer of the statement.
+#-----------------------------------------------------------------------------#
+def preprocessText (original, charsToKeep):
     # Remove punctuation and newlines first, to keep space between words
-    for todelete in ['.', '\r\n', '\n', ',', '-', ';', ':']:
-        clean = clean.replace(todelete, ' ')
+    clean = punctuation.sub(' ', original.lower())
 
     # Keep only the characters that you want to keep
     clean = re.sub(charsToKeep, '', clean)
@@ -90,14 +137,13 @@ def cleanStatement (statement, locationold, replacements, locationnew, \
     clean = clean.replace(' u s ', ' unitedstates ')
 
     # Remove anything before (and including) 'for immediate release'
-    deleteBefore= re.search("[Ff]or\s[Ii]mmediate\s[Rr]elease", \
-                            clean).start() + len ('for immediate release')
+    deleteBefore= startText.search(clean).start() + \
+                  len ('for immediate release')
     clean = clean[deleteBefore:]
 
     # Looking for the end of the text
-    intaking   = re.search("in\staking\sthe\sdiscount\srate\saction",\
-                           clean)
-    votingfor  = re.search("voting\sfor\sthe\sfomc", clean)
+    intaking   = inTaking.search(clean)
+    votingfor  = votingFor.search(clean)
     if intaking == None and not votingfor == None:
         deleteAfter = votingfor.start()
     elif votingfor == None and not intaking == None:
@@ -106,7 +152,19 @@ def cleanStatement (statement, locationold, replacements, locationnew, \
         deleteAfter = len(clean)
     else:
         deleteAfter = min(votingfor.start(), intaking.start())
-    clean = clean[:deleteAfter]
+    return clean[:deleteAfter]
+
+#-----------------------------------------------------------------------------#
+# cleanTextSequential: The original implementation of the cleaning in
+#   cleanStatement, which replaces each n-gram and removes each stop word with
+#   its own pass over the text. It is kept as the reference that
+#   StatementCleaner must reproduce exactly, and is used by StatementCleaner
+#   for word lists that it cannot compile. Inputs are as in cleanStatement,
+#   except original, which is the text of the raw statement. Returns the
+#   cleaned text.
+#-----------------------------------------------------------------------------#
+def cleanTextSequential (original, replacements, stoplist, charsToKeep, stem):
+    clean = preprocessText(original, charsToKeep)
 
     # Replace replacement words (concatenations)
     for word in range(len(replacements[0])):
@@ -118,89 +176,493 @@ def cleanStatement (statement, locationold, replacements, locationnew, \
 
     # Stem words
     if stem == 1:
-        stemmer = LancasterStemmer()
+        stemmer = lancasterStemmer()()
         stemmed = [stemmer.stem(w) for w in clean.split()]
         clean   = ''
         for w in stemmed:
             clean = clean + w + ' '
+    return clean
+
+#-----------------------------------------------------------------------------#
+# overlaps: Returns the strings that must occur in a text for an occurrence
+#   of the string b to overlap an occurrence of the string a without being
+#   contained in it, i.e. a followed by the rest of b, for every suffix of a
+#   that is a prefix of b, and b followed by the rest of a, for every suffix of
+#   b that is a prefix of a. Used to find texts in which two n-grams interact.
+#-----------------------------------------------------------------------------#
+def overlaps (a, b):
+    joined = []
+    for L in range(1, min(len(a), len(b))):
+        if a.endswith(b[:L]):
+            joined.append(a + b[L:])
+        if b.endswith(a[:L]):
+            joined.append(b + a[L:])
+    return joined
+
+#-----------------------------------------------------------------------------#
+# StatementCleaner: The replacement list and stop list of a cleaning
+#   configuration, compiled once, so that each statement is cleaned in a
+#   single pass instead of one pass per n-gram and one per stop word. Its
+#   output is identical to cleanTextSequential's. The inputs are the same as
+#   the matching inputs of cleanStatement.
+#   - All n-grams are replaced by one regular expression. This is the same as
+#     replacing them one at a time unless two n-grams overlap, or an n-gram
+#     overlaps the output of an earlier replacement; the texts for which that
+#     can happen are compiled into a second expression (hazards), and a
+#     statement that contains one is cleaned the old way.
+#   - Stop words are removed by looking up each token in a dictionary. The
+#     old passes replaced ' word ' with ' ', one stop word at a time, so two
+#     copies of a stop word separated by a single space were not both
+#     removed; that is reproduced by keeping track of the spaces between
+#     tokens.
+#   - Words are stemmed through the shared cache of stemCache.py, so each
+#     distinct word is stemmed once.
+#   Use clean to get the cleaned text, and tokens to get its list of words.
+#-----------------------------------------------------------------------------#
+class StatementCleaner(object):
+    def __init__ (self, replacements, stoplist, charsToKeep, stem):
+        self.replacements = [list(replacements[0]), list(replacements[1])]
+        self.stoplist     = list(stoplist)
+        self.charsToKeep  = charsToKeep
+        self.stem         = stem
+        self.stemmer      = getStemCache()
+
+        # The n-grams: one expression to replace them all, and one for the
+        # texts where that is not the same as replacing them in order
+        old, new = self.replacements
+        self.compiledReplacements = all(old)
+        self.hazardRegex          = None
+        if old and self.compiledReplacements:
+            self.replacementMap = {}
+            for i in range(len(old)):
+                self.replacementMap.setdefault(old[i], new[i])
+            self.replacementRegex = re.compile(
+                '|'.join(re.escape(w) for w in old))
+            hazards = set()
+            endsOnOutput   = [False]*len(old)
+            startsOnOutput = [False]*len(old)
+            for i in range(len(old)):
+                for j in range(len(old)):
+                    # One n-gram inside of another
+                    if i != j and old[j] in old[i]:
+                        hazards.add(old[i])
+                    if j <= i:
+                        continue
+                    # Two n-grams that overlap
+                    hazards.update(overlaps(old[i], old[j]))
+                    # A later n-gram inside of, or overlapping, the output of
+                    # an earlier replacement
+                    if old[j] in new[i]:
+                        hazards.add(old[i])
+                    elif new[i] in old[j][1:-1]:
+                        self.compiledReplacements = False
+                    for L in range(1, min(len(new[i]), len(old[j]) - 1) + 1):
+                        if new[i].endswith(old[j][:L]):
+                            hazards.add(old[i] + old[j][L:])
+                            startsOnOutput[j] = True
+                        if new[i].startswith(old[j][-L:]):
+                            hazards.add(old[j][:-L] + old[i])
+                            endsOnOutput[j] = True
+            # An n-gram that can span the output of two replacements is not
+            # caught by the hazards
+            for j in range(len(old)):
+                if startsOnOutput[j] and endsOnOutput[j]:
+                    self.compiledReplacements = False
+            self.hazardRegex = re.compile(
+                '|'.join(re.escape(h) for h in sorted(hazards))) \
+                if hazards else None
+
+        # The stop words: each is a word followed by some number of spaces
+        # (usually zero) that must also follow it in the text
+        self.stopwords = {}
+        for rank, word in enumerate(self.stoplist):
+            word   = word.lower()
+            token  = word.rstrip(' ')
+            if not token or ' ' in token:
+                self.stopwords = None
+                break
+            self.stopwords.setdefault(token, []).append(
+                (rank, len(word) - len(token)))
+
+    #-------------------------------------------------------------------------#
+    # replace: Replaces every n-gram in clean (preprocessed text).
+    #-------------------------------------------------------------------------#
+    def replace (self, clean):
+        old, new = self.replacements
+        if not self.compiledReplacements or \
+           (self.hazardRegex is not None and self.hazardRegex.search(clean)):
+            for word in range(len(old)):
+                clean = clean.replace(old[word], new[word])
+            return clean
+        if not old:
+            return clean
+        return self.replacementRegex.sub(
+            lambda m: self.replacementMap[m.group(0)], clean)
+
+    #-------------------------------------------------------------------------#
+    # removeStopwords: Removes the stop words from clean, the text after the
+    #   n-grams are replaced. Returns the remaining tokens, the number of
+    #   spaces before each of them, and the number of spaces at the end.
+    #-------------------------------------------------------------------------#
+    def removeStopwords (self, clean):
+        # Split into tokens, counting the spaces before each one (and, at
+        # index len(tokens), the spaces at the end)
+        pieces = clean.split(' ')
+        starts = [k for k in range(len(pieces)) if pieces[k]]
+        tokens = [pieces[k] for k in starts]
+        if not tokens:
+            return [], [], len(pieces) - 1
+        gaps = [starts[0]] + \
+               [starts[t] - starts[t-1] for t in range(1, len(starts))] + \
+               [len(pieces) - 1 - starts[-1]]
+        if not self.stopwords:
+            return tokens, gaps[:-1], gaps[-1]
+
+        # Where each stop word occurs, and the order in which the stop words
+        # were removed by the old passes
+        stopwords = self.stopwords
+        where = {}
+        for i in [i for i in range(len(tokens)) if tokens[i] in stopwords]:
+            where.setdefault(tokens[i], []).append(i)
+        if not where:
+            return tokens, gaps[:-1], gaps[-1]
+        passes = sorted((rank, extra, token) for token in where
+                        for rank, extra in stopwords[token])
+
+        # Remove ' word ' + extra spaces, from left to right, as str.replace
+        # did. The next token (index n is the end of the text) inherits the
+        # spaces left over. A match cannot reuse the space that ended the
+        # previous match in the same pass.
+        n     = len(tokens)
+        alive = [True]*n
+        prev  = list(range(-1, n))
+        nxt   = list(range(1, n + 1))
+        for rank, extra, token in passes:
+            lastNext, lastAvail = -1, 0
+            for i in where[token]:
+                if not alive[i]:
+                    continue
+                after = nxt[i]
+                avail = lastAvail if i == lastNext else gaps[i]
+                if avail < 1 or gaps[after] < extra + 1:
+                    continue
+                lastNext  = after
+                lastAvail = gaps[after] - extra - 1
+                gaps[after] = gaps[i] + lastAvail
+                alive[i] = False
+                if prev[i] >= 0:
+                    nxt[prev[i]] = after
+                if after < n:
+                    prev[after] = prev[i]
+        kept = [i for i in range(n) if alive[i]]
+        return [tokens[i] for i in kept], [gaps[i] for i in kept], gaps[n]
+
+    #-------------------------------------------------------------------------#
+    # clean: Returns the cleaned version of original, the text of a raw
+    #   statement, exactly as cleanTextSequential would.
+    #-------------------------------------------------------------------------#
+    def clean (self, original):
+        if self.stopwords is None:
+            return cleanTextSequential(original, self.replacements,
+                                       self.stoplist, self.charsToKeep,
+                                       self.stem)
+        clean = self.replace(preprocessText(original, self.charsToKeep))
+        if not self.stopwords and self.stem != 1:
+            return clean
+        tokens, gaps, trailing = self.removeStopwords(clean)
+        if self.stem == 1:
+            stem    = self.stemmer.stem
+            stemmed = [stem(w) for w in ' '.join(tokens).split()]
+            return ' '.join(stemmed) + ' ' if stemmed else ''
+        return ''.join([' '*gaps[i] + tokens[i] for i in range(len(tokens))]) \
+               + ' '*trailing
+
+    #-------------------------------------------------------------------------#
+    # tokens: Returns the words of the cleaned version of original.
+    #-------------------------------------------------------------------------#
+    def tokens (self, original):
+        return self.clean(original).split()
+
+#-----------------------------------------------------------------------------#
+# getCleaner: Returns the StatementCleaner for a cleaning configuration
+#   (inputs as in cleanStatement), compiling it the first time that the
+#   configuration is used.
+#-----------------------------------------------------------------------------#
+cleaners = {}
+def getCleaner (replacements, stoplist, charsToKeep, stem):
+    key = (tuple(replacements[0]), tuple(replacements[1]), tuple(stoplist),
+           charsToKeep, stem)
+    if key not in cleaners:
+        cleaners[key] = StatementCleaner(replacements, stoplist,
+                                         charsToKeep, stem)
+    return cleaners[key]
+
+#-----------------------------------------------------------------------------#
+# cleanStatement: This function is the meat of this code--it performs all of the
+#   cleaning/preprocessing described in the header of this document. It's
+#   inputs are:
+#     (1) statement   : a string with the filename of a single FOMC statement
+#     (2) locationold : Directory where raw statements are located (string)
+#     (3) replacements: Output from getReplacementList
+#     (4) locationnew : Directory where clean statements go (string)
+#     (5) stoplist    : A list of words to remove (list of strings)
+#     (6) charsToKeep : A regular expression of the character types to keep
+#     (7) stem        : A logical for whether to stem the words
+#   The work is done by a StatementCleaner, compiled the first time each
+#   configuration is used.
+#-----------------------------------------------------------------------------#
+def cleanStatement (statement, locationold, replacements, locationnew, \
+                    stoplist, charsToKeep, stem):
+    # Read in the statement
+    original = open(os.path.join(locationold,statement),'r').read()
+
+    clean = getCleaner(replacements, stoplist, charsToKeep, stem) \
+            .clean(original)
 
     # Write cleaned file
-    new = open(os.path.join(locationnew,statement), 'w')
-    new.write(clean)
-    new.close
+    with open(os.path.join(locationnew,statement), 'w') as new:
+        new.write(clean)
+
+#-----------------------------------------------------------------------------#
+# cleanStatementConfigs: Cleans a single FOMC statement in several ways,
+#   reading it only once. statement and locationold are as in cleanStatement,
+#   and configs is a list with one tuple for each type of cleaning:
+#   (replacements, locationnew, stoplist, charsToKeep, stem), as in
+#   cleanStatement. Each cleaned version is written to its locationnew. If
+#   counting is True, the word counts of each, in the form used by hashedtdm,
+#   are returned in a list (in the same order as configs), and otherwise
+#   None. This is what each process runs when the statements are cleaned in
+#   parallel; those processes do not run exit handlers, so they pass flush as
+#   True to save the new stems after each statement (in this process, they
+#   are saved every flushEvery stems and at exit; see stemCache.py).
+#-----------------------------------------------------------------------------#
+def cleanStatementConfigs (statement, locationold, configs, counting = False,
+                           flush = False):
+    # Read in the statement
+    original = open(os.path.join(locationold,statement),'r').read()
+
+    counts = []
+    for replacements, locationnew, stoplist, charsToKeep, stem in configs:
+        clean = getCleaner(replacements, stoplist, charsToKeep, stem) \
+                .clean(original)
+        with open(os.path.join(locationnew,statement), 'w') as new:
+            new.write(clean)
+        if counting:
+            counts.append(TDM().count(clean))
+    if flush:
+        getStemCache().flush()
+    return counts if counting else None
 
 #-----------------------------------------------------------------------------#
-# createtdm: Creates a term-document matrix (tdm), using the code in
-#   textmining_withnumbers, and stores the output in 'data.'
+# cleanAll: Cleans every statement in statementList (a list of file names in
+#   locationold) with each of the configs (see cleanStatementConfigs). If
+#   workers is more than 1, the statements are split across that many
+#   processes; the output does not depend on the number of workers. The pack
+#   of each directory written (see corpusStore.py) is brought up to date.
+#   If counting is True (only hashed tdms use them; see hashedtdm), returns a
+#   list with, for each config, a dictionary mapping each statement to its
+#   word counts, and otherwise a list of None.
+#-----------------------------------------------------------------------------#
+def cleanAll (statementList, locationold, configs, workers = 1,
+              counting = False):
+    clean = partial(cleanStatementConfigs, locationold = locationold,
+                    configs = configs, counting = counting,
+                    flush = workers > 1)
+    stems = getStemCache()
+    found = (stems.hits, stems.diskHits, stems.misses)
+    if workers > 1:
+        pool    = Pool(workers)
+        results = pool.map(clean, statementList,
+                           chunksize = max(1, len(statementList) //
+                                              (4*workers)))
+        pool.close()
+        pool.join()
+    else:
+        results = [clean(statement) for statement in statementList]
+    # Where the stems came from (in this process only)
+    instrumentation.count(stemsInMemory = stems.hits - found[0],
+                          stemsOnDisk   = stems.diskHits - found[1],
+                          stemsComputed = stems.misses - found[2])
+    # Bring the packed copy of each directory up to date (see corpusStore.py)
+    for config in configs:
+        packDirectory(config[1])
+    if not counting:
+        return [None for config in configs]
+    return [dict((statementList[i], results[i][c])
+                 for i in range(len(statementList)))
+            for c in range(len(configs))]
+
+#-----------------------------------------------------------------------------#
+# fileHash: Returns the SHA-1 hash of the contents of the file at path (as a
+#   hexadecimal string), used to tell whether a statement has changed.
+#-----------------------------------------------------------------------------#
+def fileHash (path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+#-----------------------------------------------------------------------------#
+# hashedtdm: Returns the (documents x columns) CSR matrix of the statements of
+#   corpus (see corpusStore.py) hashed into features columns
+#   (HashedTermDocumentArrays), and the names of its columns (see createtdm).
+#   If incremental is True, the counts of every statement are saved in
+#   outdir/tdm*.state.json (* is fname), and the next call only counts the
+#   words of the statements that have been added since. Statements are added
+#   in alphabetical (i.e. chronological) order, so this gives exactly the same
+#   tdm as starting over; if a statement that was already counted has changed
+#   or been removed, or a new one sorts before it, the tdm is rebuilt from
+#   scratch. counts is an optional dictionary mapping statements to their word
+#   counts, already computed (see cleanAll); statements that are not in it
+#   are counted here. phrases is as in createtdm (counts is then not used, as
+#   it has the words of the phrases counted separately), and the cutoff is
+#   applied from the stored document counts.
+#-----------------------------------------------------------------------------#
+def hashedtdm (corpus, outdir, fname, incremental, counts, features,
+               phrases = None, cutoff = 1):
+    statementList = corpus.names
+    hashes = [[f, h] for f, h in zip(statementList, corpus.hashes)]
+    tokenizer = simple_tokenize
+    if phrases is not None:
+        # The phrases are part of what has been counted
+        tokenizer, counts = phrase_tokenizer(phrases), None
+        phrasesHash = hashlib.sha1('\n'.join(sorted(set(phrases)))
+                                   .encode('utf-8')).hexdigest()
+        hashes = [[f, h + ':' + phrasesHash] for f, h in hashes]
+
+    # Initialize the term-document matrix, starting from the saved one when
+    # the statements it has counted are unchanged
+    stateFile = join(outdir, 'tdm' + fname + '.state.json')
+    tdm, counted = HashedTermDocumentArrays(features, tokenizer), []
+    if incremental and isfile(stateFile):
+        tdm, counted = HashedTermDocumentArrays.load_state(stateFile,
+                                                           tokenizer)
+        if counted is None or hashes[:len(counted)] != counted \
+           or tdm.features != features:
+            tdm, counted = HashedTermDocumentArrays(features, tokenizer), []
+
+    # Fill term-document matrix with the statements not yet counted
+    for f in statementList[len(counted):]:
+        if counts is not None and f in counts:
+            tdm.add_counts(counts[f])
+        else:
+            tdm.add_doc(corpus.text(f))
+    if incremental:
+        tdm.save_state(stateFile, hashes)
+    return tdm.to_csr(cutoff = cutoff)
+
+#-----------------------------------------------------------------------------#
+# createtdm: Creates a term-document matrix (tdm), and stores the output in
+#   'data.'
 #   indir is a string indicating the directory from which to crate
 #   a term-document matrix, outdir is a string denoting where to store the
 #   output, and fname is the suffix appended to the output file names.
-#   Output files are a sparse form of the tdm, a list of words and a list
-#   of documents that compose the tdm.
-#-----------------------------------------------------------------------------#
-def createtdm (indir, outdir, fname):
-    statementList = [ f for f in listdir(indir) \
-                       if isfile(join(indir,f)) ]
-    # Initialize and fill term-document matrix
-    tdm = TDM()
-    [tdm.add_doc(open(join(indir,f), 'r').read()) for f in statementList]
-
-    # Store the output as a sparse matrix: first column is the row index
-    # (for words), second is column (for documents), and third is the word count
-    # Note that these are 0-indexed. 
-    with open(join(outdir,'tdm.sparse' + fname + '.csv'), 'w') as f:
-        n = -1 # First row in tdm.rows are the word names.
-        for row in tdm.rows( cutoff = 1): # cutoff is the number of documents
-                                          # in which a term must appear to be
-                                          # included.
-            [f.write(str(n) + ',' + str(t) + ',' + str(row[t]) + '\n')
-             for t in range(len(row)) if row[t] > 0 and n > -1]
-            n = n+1
-
-    # Store the document names
-    with open(join(outdir,'tdm.docs' + fname + '.csv'), 'w') as f:
-        [f.write(filename + '\n') for filename in statementList]
-
-    # Store the word names
-    with open(join(outdir,'tdm.words' + fname + '.csv'), 'w') as f:
-        n = 0
-        for row in tdm.rows( cutoff = 1):
-            [f.write(r + '\n') for r in row if n == 0 ]
-            n = n+1
+#   meta is a dictionary describing the cleaning that produced indir (it is
+#   stored alongside the tdm), and cutoff is the number of documents in which
+#   a term must appear to be included.
+#   The statements are read from the pack of indir, split into words once and
+#   kept there as integer ids (see loadTokens in corpusStore.py): only the
+#   statements added since are split, so the tdm is always built
+#   incrementally, and it is counted from the ids in one pass
+#   (TokenStream.to_csr in textmining_withnumbers), the same tdm as
+#   TermDocumentArrays gives.
+#   If features is a number, the words are hashed into that many columns
+#   (HashedTermDocumentArrays) rather than counted exactly, so the memory used
+#   does not grow with the vocabulary; incremental and counts are only used
+#   then (see hashedtdm). The words of the tdm are then the names of the
+#   columns kept (the most frequent word hashed into each, or '#n'), and the
+#   counts may be negative; persistence.py reads it as any other tdm.
+#   phrases is an optional list of phrases (words separated by spaces, e.g.
+#   found by collocations.py) to count as single words, joined by '_' (see
+#   phrase_tokenizer and TokenStream.merge_phrases).
+#   The tdm is stored in the binary format of tdmStore.py, which is what
+#   persistence.py reads. For use outside of python (e.g. persistence.m), it
+#   is also written as csv files: a sparse form of the tdm, a list of words
+#   and a list of documents that compose the tdm.
+#-----------------------------------------------------------------------------#
+def createtdm (indir, outdir, fname, meta = None, cutoff = 1,
+               incremental = False, counts = None, features = None,
+               phrases = None):
+    with instrumentation.stage('tdm' + fname):
+        corpus = loadCorpus(indir)
+        statementList = corpus.names
+        if features is None:
+            # The words of the statements, split once and kept as integer ids
+            # with the pack (see loadTokens), the phrases made into words
+            stream = loadTokens(indir)
+            instrumentation.count(tokens = len(stream.tokens))
+            if phrases is not None:
+                stream = stream.merge_phrases(phrases)
+            sparse, words = stream.to_csr(cutoff = cutoff)
+        else:
+            sparse, words = hashedtdm(corpus, outdir, fname, incremental,
+                                      counts, features, phrases, cutoff)
+
+        # Store the output as a sparse matrix: first column is the column
+        # index (for documents), second is the row index (for words), and
+        # third is the word count. Note that these are 0-indexed.
+        docIdx = np.repeat(np.arange(sparse.shape[0]), np.diff(sparse.indptr))
+        entries = np.column_stack([docIdx, sparse.indices, sparse.data])
+        with open(join(outdir,'tdm.sparse' + fname + '.csv'), 'w') as f:
+            # Formatted a block of rows at a time
+            for start in range(0, len(entries), 100000):
+                block = entries[start:start + 100000]
+                f.write(('%d,%d,%d\n' * len(block)) %
+                        tuple(block.ravel().tolist()))
+
+        # Store the document names
+        with open(join(outdir,'tdm.docs' + fname + '.csv'), 'w') as f:
+            [f.write(filename + '\n') for filename in statementList]
+
+        # Store the word names
+        with open(join(outdir,'tdm.words' + fname + '.csv'), 'w') as f:
+            [f.write(word + '\n') for word in words]
+
+        # Store the binary, sorted version of the tdm (words x documents)
+        meta = dict(meta if meta is not None else {}, cutoff = cutoff)
+        if features is not None:
+            meta['features'] = features
+        if phrases is not None:
+            meta['phrases'] = len(set(phrases))
+        sparse = sparse.T.astype(np.float64).tocsr()
+        saveTDM(sparse, words, statementList, tdmPath(outdir, fname), meta)
+        instrumentation.count(documents = len(statementList),
+                              words     = len(words),
+                              nonzeros  = sparse.nnz)
 
 #-----------------------------------------------------------------------------#
 # The Main function generates the stop list, and word replacement lists, then
 #   loops through every file in the statements/statements.raw directory and
-#   performs two types of cleaning: one that is less extensive (saved in
-#   statements/statements.clean) and one that includes more preprocessing steps
-#   (saved in statements/statements.clean.np). 'NP' denotes 'no preprocessing.
-#   Finally, it creates the term-document matrix for each type of cleaning.
+#   performs two types of cleaning (see cleaningConfigs): one that is less
+#   extensive (saved in statements/statements.clean) and one that includes
+#   more preprocessing steps (saved in statements/statements.clean.np). 'NP'
+#   denotes 'no preprocessing.
+#   Each statement is read once for both, and the statements are split across
+#   'workers' processes (see the global variables above).
+#   Finally, it creates the term-document matrix for each type of cleaning
+#   (from the word counts found while cleaning, if they are hashed).
 #-----------------------------------------------------------------------------#
 
 def main():
-    stoplist       = [line.rstrip('\n') for line in \
-                      open(os.path.join(datadir,"stoplist_mcdonald_comb.txt")
-                           , 'r') ]
-    stoplistNP     = [line.rstrip('\n') for line in \
-                      open(os.path.join(datadir,"emptystop.txt"), 'r') ]
-
-    replacements   = getReplacementList(os.path.join(datadir,"wordlist.txt"))
-    replacementsNP = getReplacementList(os.path.join(datadir,"wordlist.np.txt"))
-
-    statementList  = [ f for f in listdir(statementdir) \
-                       if isfile(join(statementdir,f)) ]
-
-    for statement in statementList:
-        # First, the case with heavier preprocessing (keep only letters)
-        cleanStatement(statement, statementdir, replacements, \
-                       cleanDir, stoplist, '[^A-Za-z ]+',1)
-        # Second, the no-preprocessing case (keep letters and numbers)
-        cleanStatement(statement, statementdir, replacementsNP, \
-                       cleanDirNP, stoplistNP, '[^A-Za-z0-9 ]+',0)
-
-    # Create term-document matrix
-    createtdm(cleanDir  , outputDir, '')
-    createtdm(cleanDirNP, outputDir, '.np')
+    statementList  = sorted([ f for f in listdir(statementdir) \
+                              if isfile(join(statementdir,f)) ])
+    # Bring the packed copy of the raw statements up to date with any that
+    # were added or edited by hand (see corpusStore.py)
+    packDirectory(statementdir)
+
+    # Clean each statement in every way (see cleaningConfigs): first, the case
+    # with heavier preprocessing (keep only letters), second, the
+    # no-preprocessing case (keep letters and numbers)
+    with instrumentation.stage('clean', documents = len(statementList)):
+        counts = cleanAll(statementList, statementdir,
+                          [cleaningArgs(config) for config in cleaningConfigs],
+                          workers, counting = features is not None)
+
+    # Create term-document matrix, recording how the statements were cleaned
+    for config, configCounts in zip(cleaningConfigs, counts):
+        createtdm(config['cleanDir'], outputDir, config['suffix'],
+                  dict((k, config[k]) for k in
+                       ['stoplist', 'replacements', 'charsToKeep', 'stem']),
+                  cutoff = cutoff, incremental = True, counts = configCounts,
+                  features = features)
 
 
 if __name__ == "__main__":
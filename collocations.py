@@ -0,0 +1,99 @@
+# Filename:    collocations.py
+#
+# Description: This file finds the phrases (collocations) of the statements
+#              automatically, rather than from the hand-made list in
+#              data/wordlist.txt, and computes the persistence of the
+#              statements with each phrase counted as a single term. Every
+#              bigram and trigram of the statements is counted in bounded
+#              memory (lossy counting), and the phrases are ranked by how
+#              much more often their words appear together than by chance,
+#              by the log-likelihood ratio or by pointwise mutual information
+#              (see CollocationFinder in textmining_withnumbers.py).
+#
+# Input:       The statements cleaned without preprocessing by
+#              cleanStatements.py, in statements/statements.clean.np.
+#
+# Output:      output/collocations.np.csv, the phrases selected, best first,
+#                with their counts and scores;
+#              the tdm of the statements with the phrases counted as single
+#                terms (their words joined by '_'), stored by createtdm with
+#                the suffix '.np.phrases', which calculatePersistence reads
+#                like the others;
+#              output/persistence_phrases.csv, the persistence computed from
+#                it.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import csv
+from   os.path import join
+import pandas as pd
+from   textmining_withnumbers import CollocationFinder
+from   cleanStatements import cleanDirNP, outputDir, createtdm, \
+                              cleaningConfigs
+from   corpusStore import loadCorpus
+import persistence
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# How phrases are scored ('llr' or 'pmi'), how many are kept and how many
+# times a phrase must appear to be considered
+method     = 'llr'
+topPhrases = 500
+minCount   = 5
+# Largest error of the phrase counts, as a share of the number of phrases in
+# the corpus (lossy counting keeps about (1/epsilon)*log(epsilon*n) of them)
+epsilon    = 1e-5
+# Suffix of the tdm with the phrases
+suffix     = '.np.phrases'
+
+#-----------------------------------------------------------------------------#
+# findCollocations: Counts the bigrams and trigrams of every statement in
+#   indir, and returns the CollocationFinder and the best phrases (see the
+#   global variables).
+#-----------------------------------------------------------------------------#
+def findCollocations (indir, method = method, top = topPhrases,
+                      minCount = minCount, epsilon = epsilon):
+    finder = CollocationFinder(epsilon = epsilon)
+    for name, text in loadCorpus(indir):
+        finder.add_doc(text)
+    return finder, finder.select(method, top = top, min_count = minCount)
+
+#-----------------------------------------------------------------------------#
+# writeCollocations: Writes phrases to path (csv), one per row, with its
+#   count and score.
+#-----------------------------------------------------------------------------#
+def writeCollocations (finder, phrases, path, method = method):
+    with open(path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Phrase', 'Count', 'Score'])
+        for phrase in phrases:
+            n = len(phrase.split(' '))
+            writer.writerow([phrase, finder.ngrams[n][phrase],
+                             '%.2f' % finder.score(phrase, method)])
+
+#-----------------------------------------------------------------------------#
+# The main function finds the phrases of the statements cleaned without
+#   preprocessing, creates their tdm with the phrases as terms, and computes
+#   its persistence (see the header).
+#-----------------------------------------------------------------------------#
+def main():
+    finder, phrases = findCollocations(cleanDirNP)
+    writeCollocations(finder, phrases,
+                      join(outputDir, 'collocations.np.csv'))
+    # The statements were cleaned as for the '.np' tdm (see cleaningConfigs)
+    config = [c for c in cleaningConfigs if c['suffix'] == '.np'][0]
+    meta = dict((k, config[k]) for k in
+                ['stoplist', 'replacements', 'charsToKeep', 'stem'])
+    meta['collocations'] = method
+    createtdm(cleanDirNP, outputDir, suffix, meta, phrases = phrases)
+    persistenceAll = persistence.calculatePersistence(suffix, False,
+                                                      'Phrases',
+                                                      pd.DataFrame())
+    persistenceAll.to_csv(path_or_buf = join(persistence.outdir,
+                                             'persistence_phrases.csv'),
+                          index_label = "Date", float_format = '%1.2f')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+# Filename:    corpusStore.py
+#
+# Description: This file keeps each directory of statements (the raw
+#              statements, and each type of cleaned statements) as a packed
+#              corpus: all of the statements, one after the other, in a
+#              single UTF-8 file, with an index giving the name, date,
+#              position and length of each. The stages that read every
+#              statement read them from the pack, which is mapped into
+#              memory, instead of listing the directory and opening each
+#              file: a statement is a slice of the mapped file (no copy is
+#              made until it is decoded), and all of the processes that read
+#              the same pack share one copy in the operating system's page
+#              cache.
+#              Statements are only ever appended to the text file; the index
+#              is written afterwards, under a temporary name and then renamed,
+#              so a process that is reading the pack sees either the old
+#              statements or the new ones, never part of them. A statement
+#              whose text changes is appended again and the index points to
+#              the new text (a file that is written again with the same text
+#              is not). Once more than half of the text file is old text, the
+#              statements still in use are copied to a new text file, which
+#              the next index points to, and the old file is deleted.
+#              The stages that write statements update the pack of their
+#              directory (see packDirectory); loadCorpus reads the pack as it
+#              is, without looking at the files of the directory. After
+#              editing statements by hand, type 'python corpusStore.py
+#              directory ...' to update the packs of the given directories.
+#
+# Input:       A directory of statements (e.g. statements/statements.clean.np).
+#
+# Output:      A directory next to it, with the same name and '.pack' (e.g.
+#              statements/statements.clean.np.pack), containing:
+#                text.<p>.bin: the text of the statements, back to back;
+#                index.npy: one record per statement, sorted by name: its
+#                  name, date (as YYYYMMDD, from the name), text file <p>,
+#                  offset and length (in bytes) in it, SHA-1 hash, and the
+#                  size and modification time of its file when it was
+#                  packed.
+#              and, once loadTokens has been used, the statements split into
+#              words, as integer ids (see TokenStream in
+#              textmining_withnumbers.py):
+#                tokens.<n>.npy, offsets.<n>.npy, words.<n>.npy: the ids of
+#                  the words of the statements, back to back (int32), where
+#                  each statement starts, and the word of each id;
+#                tokens.json: the version <n> of these files, and the
+#                  statements (and their hashes) that they hold.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys, re, mmap, json, glob, hashlib
+from   datetime import datetime as dt
+import numpy as np
+from   textmining_withnumbers import TokenStream
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# The fields of the index, but the name (whose width depends on the names)
+indexFields = [('date', np.int32), ('part', np.int32), ('offset', np.int64),
+               ('length', np.int64), ('sha1', 'U40'), ('size', np.int64),
+               ('mtime', np.int64)]
+# Share of the text files that may be old text before they are rewritten
+maxGarbage  = 0.5
+# The date in the name of a statement (e.g. statement.fomc.20150729.txt)
+datePattern = re.compile(r'(\d{8})')
+# The arrays of a TokenStream kept in a pack (see saveTokens)
+tokenArrays = ['tokens', 'offsets', 'words']
+# The packs and token streams already open in this process, by path, with
+# the version of their index and tokens
+corpora     = {}
+streams     = {}
+
+#-----------------------------------------------------------------------------#
+# corpusPath: Returns the directory in which the pack of the statements in
+#   directory is kept.
+#-----------------------------------------------------------------------------#
+def corpusPath (directory):
+    return os.path.normpath(directory) + '.pack'
+
+#-----------------------------------------------------------------------------#
+# nameDate: Returns the date in the name of a statement, as an integer
+#   (YYYYMMDD), or 0 if there is none.
+#-----------------------------------------------------------------------------#
+def nameDate (name):
+    found = datePattern.search(name)
+    return int(found.group(1)) if found else 0
+
+#-----------------------------------------------------------------------------#
+# textPath: Returns the path of text file part of the pack in path.
+#-----------------------------------------------------------------------------#
+def textPath (path, part):
+    return os.path.join(path, 'text.%d.bin' % part)
+
+#-----------------------------------------------------------------------------#
+# readIndex, writeIndex: Read the index of the pack in path (an empty one if
+#   there is none, or if it was written by an older version of this file),
+#   and replace it with index.
+#-----------------------------------------------------------------------------#
+def readIndex (path):
+    indexFile = os.path.join(path, 'index.npy')
+    empty = np.zeros(0, dtype = [('name', 'U1')] + indexFields)
+    if not os.path.isfile(indexFile):
+        return empty
+    index = np.load(indexFile)
+    if list(index.dtype.names) != ['name'] + [f for f, t in indexFields]:
+        return empty
+    return index
+
+def writeIndex (path, index):
+    tmp = os.path.join(path, 'index.tmp.npy')
+    with open(tmp, 'wb') as f:
+        np.save(f, index)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, 'index.npy'))
+
+#-----------------------------------------------------------------------------#
+# makeIndex: Returns the index (see the header) of records, a dictionary
+#   mapping each name to the tuple of the other fields.
+#-----------------------------------------------------------------------------#
+def makeIndex (records):
+    names = sorted(records)
+    width = max([len(name) for name in names] + [1])
+    return np.array([(name,) + tuple(records[name]) for name in names],
+                    dtype = [('name', 'U%d' % width)] + indexFields)
+
+#-----------------------------------------------------------------------------#
+# removeUnused: Deletes the text files of the pack in path that index does
+#   not point to (a process that has one open keeps it until it closes it).
+#-----------------------------------------------------------------------------#
+def removeUnused (path, index):
+    used = set(textPath(path, int(p)) for p in np.unique(index['part']))
+    for old in glob.glob(os.path.join(path, 'text*.bin')):
+        if old not in used:
+            os.remove(old)
+
+#-----------------------------------------------------------------------------#
+# compact: Copies the statements of the pack in path (whose index is index)
+#   to a new text file, without the old text that no statement uses any
+#   more, and points the index to it (see the header). Returns the new
+#   index.
+#-----------------------------------------------------------------------------#
+def compact (path, index):
+    part = int(index['part'].max()) + 1 if len(index) else 0
+    records, offset = {}, 0
+    buffers = {}
+    with open(textPath(path, part), 'wb') as f:
+        for r in index:
+            p = int(r['part'])
+            if p not in buffers:
+                with open(textPath(path, p), 'rb') as old:
+                    buffers[p] = old.read()
+            start = int(r['offset'])
+            f.write(buffers[p][start:start + int(r['length'])])
+            records[str(r['name'])] = (r['date'], part, offset, r['length'],
+                                       r['sha1'], r['size'], r['mtime'])
+            offset += int(r['length'])
+        f.flush()
+        os.fsync(f.fileno())
+    index = makeIndex(records)
+    writeIndex(path, index)
+    removeUnused(path, index)
+    return index
+
+#-----------------------------------------------------------------------------#
+# appendStatements: Adds statements, a list of (name, text) pairs, to the pack
+#   in path (created if needed), replacing any statement of the same name, as
+#   one atomic update (see the header); a statement whose text has not
+#   changed is not added again. The text may be a string or UTF-8 bytes.
+#   sources, if given, holds the (size, modification time) of the file of
+#   each statement (-1 for none), and remove the names of statements to take
+#   out of the pack. The text files are rewritten (see compact) once more
+#   than maxGarbage of them is unused.
+#-----------------------------------------------------------------------------#
+def appendStatements (path, statements, sources = None, remove = ()):
+    os.makedirs(path, exist_ok = True)
+    old = dict((str(r['name']), r) for r in readIndex(path))
+    for name in remove:
+        old.pop(name, None)
+    records = dict((name, tuple(r[f] for f, t in indexFields))
+                   for name, r in old.items())
+    part = max([int(r['part']) for r in old.values()] + [0])
+    with open(textPath(path, part), 'ab') as f:
+        f.seek(0, os.SEEK_END)
+        for s, (name, text) in enumerate(statements):
+            data = text.encode('utf-8') if isinstance(text, str) else text
+            size, mtime = sources[s] if sources is not None else (-1, -1)
+            sha1 = hashlib.sha1(data).hexdigest()
+            if name in old and str(old[name]['sha1']) == sha1:
+                # The same text: only where it came from has changed
+                records[name] = records[name][:-2] + (size, mtime)
+                continue
+            records[name] = (nameDate(name), part, f.tell(), len(data), sha1,
+                             size, mtime)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    index = makeIndex(records)
+    writeIndex(path, index)
+    removeUnused(path, index)
+    total = sum(os.path.getsize(textPath(path, int(p)))
+                for p in np.unique(index['part']))
+    if total and total - index['length'].sum() > maxGarbage*total:
+        compact(path, index)
+
+#-----------------------------------------------------------------------------#
+# packDirectory: Brings the pack of directory (in path, by default next to it;
+#   see corpusPath) up to date with its files: the files that are new or have
+#   changed (in size or modification time) since they were packed are read
+#   and appended, and the statements whose files are gone are taken out
+#   (but not those added by appendStatements without a file). Returns the
+#   path of the pack.
+#-----------------------------------------------------------------------------#
+def packDirectory (directory, path = None):
+    path  = corpusPath(directory) if path is None else path
+    index = dict((str(r['name']), (int(r['size']), int(r['mtime'])))
+                 for r in readIndex(path))
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            info = entry.stat()
+            files[entry.name] = (info.st_size, info.st_mtime_ns)
+    changed = sorted(name for name in files if index.get(name) != files[name])
+    removed = [name for name in index
+               if name not in files and index[name][0] >= 0]
+    if changed or removed or not os.path.isfile(os.path.join(path,
+                                                             'index.npy')):
+        statements = []
+        for name in changed:
+            with open(os.path.join(directory, name), 'rb') as f:
+                statements.append((name, f.read()))
+        appendStatements(path, statements, [files[name] for name in changed],
+                         removed)
+    return path
+
+#-----------------------------------------------------------------------------#
+# Corpus: The statements of a pack, read-only. The text file is mapped into
+#   memory, and the index read, when it is opened; later updates of the pack
+#   are not seen (open it again, or use loadCorpus).
+#     names, dates: The names of the statements (sorted), and their dates (as
+#       datetime objects, from the names).
+#     hashes: The SHA-1 hash of each statement (as fileHash in
+#       cleanStatements.py would give for its file).
+#   Statements are given by name or position: data returns a memoryview of
+#   the bytes of a statement (no copy), and text decodes them.
+#-----------------------------------------------------------------------------#
+class Corpus(object):
+    def __init__ (self, path):
+        self.path  = path
+        # The index first: the text file is never shorter than it says
+        self.index = readIndex(path)
+        self.names = [str(name) for name in self.index['name']]
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+        self.hashes = [str(h) for h in self.index['sha1']]
+        self.dates  = [dt(d // 10000, d // 100 % 100, d % 100) if d else None
+                       for d in self.index['date'].tolist()]
+        # The text files, mapped (a text file that is gone was replaced by
+        # a newer one, with a newer index, after the index was read)
+        self.buffers = {}
+        for part in np.unique(self.index['part']).tolist():
+            with open(textPath(path, part), 'rb') as f:
+                self.buffers[part] = memoryview(b'') \
+                    if os.fstat(f.fileno()).st_size == 0 else \
+                    memoryview(mmap.mmap(f.fileno(), 0,
+                                         access = mmap.ACCESS_READ))
+
+    def __len__ (self):
+        return len(self.names)
+
+    def __contains__ (self, name):
+        return name in self.positions
+
+    def __iter__ (self):
+        for i in range(len(self.names)):
+            yield self.names[i], self.text(i)
+
+    def position (self, key):
+        return self.positions[key] if isinstance(key, str) else int(key)
+
+    def data (self, key):
+        record = self.index[self.position(key)]
+        offset = int(record['offset'])
+        return self.buffers[int(record['part'])][offset:offset +
+                                                 int(record['length'])]
+
+    def text (self, key):
+        return str(self.data(key), 'utf-8')
+
+#-----------------------------------------------------------------------------#
+# loadCorpus: Returns the Corpus of the statements in the pack of directory,
+#   as it is: the files of the directory are not looked at (see the header),
+#   unless it has no pack yet, in which case it is packed first. A pack that
+#   has not changed since it was last opened in this process is not opened
+#   again (the index is replaced, never rewritten, when the pack changes, so
+#   its inode tells).
+#-----------------------------------------------------------------------------#
+def loadCorpus (directory):
+    path = corpusPath(directory)
+    indexFile = os.path.join(path, 'index.npy')
+    if not os.path.isfile(indexFile):
+        packDirectory(directory, path)
+    tried = None
+    while True:
+        info  = os.stat(indexFile)
+        stamp = (info.st_ino, info.st_mtime_ns, info.st_size)
+        if path in corpora and corpora[path][0] == stamp:
+            break
+        try:
+            corpora[path] = (stamp, Corpus(path))
+            break
+        except FileNotFoundError:
+            # Only if the pack was rewritten while it was being opened (see
+            # compact)
+            if stamp == tried:
+                raise
+            tried = stamp
+    return corpora[path][1]
+
+#-----------------------------------------------------------------------------#
+# readTokenInfo: Returns the contents of tokens.json in the pack in path (see
+#   saveTokens), or None if there is none.
+#-----------------------------------------------------------------------------#
+def readTokenInfo (path):
+    infoFile = os.path.join(path, 'tokens.json')
+    if not os.path.isfile(infoFile):
+        return None
+    with open(infoFile, 'r') as f:
+        return json.load(f)
+
+#-----------------------------------------------------------------------------#
+# saveTokens: Writes stream (a TokenStream of the statements of the pack in
+#   path) to the pack, with docs, the [name, hash] of each of its statements.
+#   Each version is written to new files, and then tokens.json, which names
+#   them, is replaced, so a process that is reading the previous version
+#   never sees a mix of the two (the old files are deleted, but a process
+#   that has them open keeps them until it closes them).
+#-----------------------------------------------------------------------------#
+def saveTokens (path, stream, docs):
+    info = readTokenInfo(path)
+    generation = info['generation'] + 1 if info is not None else 0
+    arrays = {'tokens' : stream.tokens,
+              'offsets': stream.offsets,
+              'words'  : np.array(stream.words, dtype = str)}
+    for name in tokenArrays:
+        tmp = os.path.join(path, '%s.%d.tmp.npy' % (name, generation))
+        np.save(tmp, np.ascontiguousarray(arrays[name]))
+        os.replace(tmp, os.path.join(path, '%s.%d.npy' % (name, generation)))
+    tmp = os.path.join(path, 'tokens.tmp.json')
+    with open(tmp, 'w') as f:
+        json.dump({'generation': generation, 'docs': docs}, f)
+    os.replace(tmp, os.path.join(path, 'tokens.json'))
+    for name in tokenArrays:
+        for old in glob.glob(os.path.join(path, name + '.*.npy')):
+            if old != os.path.join(path, '%s.%d.npy' % (name, generation)):
+                os.remove(old)
+
+#-----------------------------------------------------------------------------#
+# loadTokens: Returns the statements in directory as a TokenStream (the
+#   words of each, as simple_tokenize splits them, as integer ids; see
+#   textmining_withnumbers.py), kept in its pack. Only the statements that
+#   have been added to the pack since the stream was saved are tokenized; if
+#   a statement that was already tokenized has changed or been removed, or a
+#   new one sorts before it, the stream is built again. The arrays are mapped
+#   into memory, read-only.
+#-----------------------------------------------------------------------------#
+def loadTokens (directory):
+    corpus = loadCorpus(directory)
+    path   = corpus.path
+    docs   = [[name, h] for name, h in zip(corpus.names, corpus.hashes)]
+    info   = readTokenInfo(path)
+    if info is not None and info['docs'] == docs:
+        key = (info['generation'], len(docs))
+        if path in streams and streams[path][0] == key:
+            return streams[path][1]
+    stream, done = TokenStream(), 0
+    if info is not None and info['docs'] == docs[:len(info['docs'])]:
+        arrays = [np.load(os.path.join(path, '%s.%d.npy'
+                                       % (name, info['generation'])),
+                          mmap_mode = 'r') for name in tokenArrays]
+        stream = TokenStream.from_arrays(arrays[0], arrays[1],
+                                         [str(w) for w in arrays[2]])
+        done = len(info['docs'])
+    if done < len(docs) or info is None:
+        stream.add_docs([corpus.text(d) for d in range(done, len(docs))])
+        saveTokens(path, stream, docs)
+    streams[path] = ((readTokenInfo(path)['generation'], len(docs)), stream)
+    return stream
+
+#-----------------------------------------------------------------------------#
+# The main function updates the packs of the directories given (see the
+#   header).
+#-----------------------------------------------------------------------------#
+def main():
+    for directory in sys.argv[1:]:
+        packDirectory(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Filename:    htmlCache.py
+#
+# Description: This file keeps a local copy of every page downloaded by
+#              pullStatements.py, so that the statements can be extracted
+#              again (e.g. after fixing an extraction pattern) without
+#              downloading the archive again. Pages are stored by the SHA-1
+#              hash of their content, and an index records, for each URL, the
+#              hash of the latest copy, when it was fetched and its ETag and
+#              Last-Modified headers. These are sent back with the next
+#              request for the URL, so the server only sends the page again
+#              if it has changed.
+#
+# Input:       Pages downloaded by pullStatements.Fetcher.
+#
+# Output:      The directory statements/statements.html, containing:
+#                objects/xx/<hash>.html, the pages, where xx are the first two
+#                  characters of the hash;
+#                index.json, the index described above.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, json, hashlib, threading
+from   datetime import datetime, timezone
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Where the pages are stored
+cacheDir = os.path.join('statements','statements.html')
+
+#-----------------------------------------------------------------------------#
+# HtmlCache: The pages stored in path (see the header). Use store to add a
+#   page, lookup to find the index entry for a URL, read to get a page back,
+#   and conditionalHeaders to get the headers for a conditional request. The
+#   index is written to disk by save. It is safe to use from several threads.
+#-----------------------------------------------------------------------------#
+class HtmlCache(object):
+    def __init__ (self, path = cacheDir):
+        self.path      = path
+        self.indexFile = os.path.join(path, 'index.json')
+        self.lock      = threading.Lock()
+        if os.path.isfile(self.indexFile):
+            with open(self.indexFile, 'r') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    #-------------------------------------------------------------------------#
+    # objectPath: Returns the file in which the page with hash sha1 is kept.
+    #-------------------------------------------------------------------------#
+    def objectPath (self, sha1):
+        return os.path.join(self.path, 'objects', sha1[:2], sha1 + '.html')
+
+    #-------------------------------------------------------------------------#
+    # lookup: Returns the index entry for url (a dictionary with keys url,
+    #   sha1, fetched, etag and lastModified), or None if the page is not
+    #   stored.
+    #-------------------------------------------------------------------------#
+    def lookup (self, url):
+        with self.lock:
+            entry = self.index.get(url)
+        if entry is None or not os.path.isfile(self.objectPath(entry['sha1'])):
+            return None
+        return entry
+
+    #-------------------------------------------------------------------------#
+    # read: Returns the stored page for url (bytes), or None.
+    #-------------------------------------------------------------------------#
+    def read (self, url):
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        with open(self.objectPath(entry['sha1']), 'rb') as f:
+            return f.read()
+
+    #-------------------------------------------------------------------------#
+    # conditionalHeaders: Returns the headers that ask the server to send the
+    #   page at url only if it differs from the stored copy.
+    #-------------------------------------------------------------------------#
+    def conditionalHeaders (self, url):
+        entry   = self.lookup(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('lastModified'):
+                headers['If-Modified-Since'] = entry['lastModified']
+        return headers
+
+    #-------------------------------------------------------------------------#
+    # store: Stores body (bytes), the page fetched from url, whose response
+    #   had headers (a dictionary with lower-case keys). Returns its hash.
+    #-------------------------------------------------------------------------#
+    def store (self, url, body, headers = None):
+        headers = headers or {}
+        sha1    = hashlib.sha1(body).hexdigest()
+        path    = self.objectPath(sha1)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            tmp = path + '.%d.%d.tmp' % (os.getpid(), threading.get_ident())
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+        entry = {'url'         : url,
+                 'sha1'        : sha1,
+                 'fetched'     : datetime.now(timezone.utc).isoformat(),
+                 'etag'        : headers.get('etag'),
+                 'lastModified': headers.get('last-modified')}
+        with self.lock:
+            self.index[url] = entry
+        return sha1
+
+    #-------------------------------------------------------------------------#
+    # touch: Records that the stored copy of url was confirmed to be current
+    #   (the server replied 304, not modified).
+    #-------------------------------------------------------------------------#
+    def touch (self, url):
+        with self.lock:
+            if url in self.index:
+                self.index[url]['fetched'] = \
+                    datetime.now(timezone.utc).isoformat()
+
+    #-------------------------------------------------------------------------#
+    # save: Writes the index to disk.
+    #-------------------------------------------------------------------------#
+    def save (self):
+        os.makedirs(self.path, exist_ok = True)
+        with self.lock:
+            tmp = self.indexFile + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.index, f, indent = 1, sort_keys = True)
+            os.replace(tmp, self.indexFile)
@@ -0,0 +1,162 @@
+# Filename:    instrumentation.py
+#
+# Description: This file measures where the time and memory of a run go. The
+#              scripts mark each of their stages (fetching, extraction,
+#              cleaning, stemming, building and loading the tdms, weighting,
+#              similarity and counting) with
+#                  with instrumentation.stage('name'):
+#                      ...
+#              and add counts (documents, tokens, words, nonzeros...) to the
+#              stage that is running with instrumentation.count. For each
+#              stage, the wall clock and CPU time, the resident memory at the
+#              start and end and the peak resident memory of the process are
+#              recorded, along with the counts.
+#              Measuring is off unless the environment variable FOMC_PROFILE
+#              is set (e.g. 'FOMC_PROFILE=1 python cleanStatements.py'), or
+#              enable() is called. When it is off, stage and count do nothing,
+#              and cost a function call.
+#              Stages run by other processes (e.g. when the statements are
+#              cleaned in parallel) are measured as a whole, by the process
+#              that started them.
+#
+# Input:       None.
+#
+# Output:      When measuring is on, a report of the run, written when python
+#              exits to output/profile.<script>.json (where <script> is the
+#              name of the script that was run): when and how the script was
+#              run, and a list of stages, in the order they finished, each
+#              with its name, the name of the stage it ran in (if any), its
+#              measurements and its counts.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys, json, time, atexit, platform
+from   contextlib import nullcontext
+# resource is not available on Windows, where memory is not measured
+try:
+    import resource
+except ImportError:
+    resource = None
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Whether measuring is on (see enable)
+enabled   = False
+# Where the report is written
+reportDir = 'output'
+# The stages that have finished, and those that are running (innermost last)
+stages    = []
+running   = []
+# When the run started
+started   = time.time()
+# What stage returns when measuring is off
+noStage   = nullcontext()
+
+#-----------------------------------------------------------------------------#
+# currentRSS: Returns the resident memory of this process, in MB (None where
+#   it cannot be read). peakRSS returns the most it has been so far.
+#-----------------------------------------------------------------------------#
+def currentRSS ():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')/2.0**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peakRSS ():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, and macOS bytes
+    return peak/2.0**20 if sys.platform == 'darwin' else peak/1024.0
+
+#-----------------------------------------------------------------------------#
+# Stage: Measures one stage of a run (see the header). Use it through stage.
+#-----------------------------------------------------------------------------#
+class Stage(object):
+    def __init__ (self, name, counts):
+        self.record = {'name': name, 'counts': dict(counts)}
+
+    def __enter__ (self):
+        self.record['parent'] = running[-1].record['name'] if running else None
+        self.record['rssStartMB'] = currentRSS()
+        running.append(self)
+        self.wall = time.perf_counter()
+        self.cpu  = time.process_time()
+        return self
+
+    def __exit__ (self, *exception):
+        self.record['seconds']    = time.perf_counter() - self.wall
+        self.record['cpuSeconds'] = time.process_time() - self.cpu
+        self.record['rssEndMB']   = currentRSS()
+        self.record['peakRSSMB']  = peakRSS()
+        self.record['failed']     = exception[0] is not None
+        running.remove(self)
+        stages.append(self.record)
+        return False
+
+#-----------------------------------------------------------------------------#
+# stage: Returns a context manager that measures the code run inside it as
+#   the stage name, with the initial counts given as keyword arguments (see
+#   count). Does nothing if measuring is off.
+#-----------------------------------------------------------------------------#
+def stage (name, **counts):
+    if not enabled:
+        return noStage
+    return Stage(name, counts)
+
+#-----------------------------------------------------------------------------#
+# count: Adds the counts given as keyword arguments (e.g. documents = 10) to
+#   those of the innermost running stage. Does nothing if measuring is off
+#   or no stage is running.
+#-----------------------------------------------------------------------------#
+def count (**counts):
+    if not enabled or not running:
+        return
+    record = running[-1].record['counts']
+    for key, value in counts.items():
+        record[key] = record.get(key, 0) + value
+
+#-----------------------------------------------------------------------------#
+# report: Returns the report of the run so far (see the header).
+#-----------------------------------------------------------------------------#
+def report ():
+    return {'script' : os.path.basename(sys.argv[0]) if sys.argv else None,
+            'argv'   : sys.argv[1:],
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                     time.localtime(started)),
+            'seconds': time.time() - started,
+            'python' : platform.python_version(),
+            'machine': platform.platform(),
+            'stages' : stages}
+
+#-----------------------------------------------------------------------------#
+# writeReport: Writes the report of the run to path (by default,
+#   output/profile.<script>.json) and returns path.
+#-----------------------------------------------------------------------------#
+def writeReport (path = None):
+    if path is None:
+        script = os.path.splitext(os.path.basename(sys.argv[0]
+                                                   if sys.argv else ''))[0]
+        path   = os.path.join(reportDir,
+                              'profile.' + (script or 'python') + '.json')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    with open(path, 'w') as f:
+        json.dump(report(), f, indent = 1)
+    return path
+
+#-----------------------------------------------------------------------------#
+# enable: Turns measuring on (or off, if on is False). The first time it is
+#   turned on, the report is set to be written when python exits.
+#-----------------------------------------------------------------------------#
+registered = False
+def enable (on = True):
+    global enabled, registered
+    enabled = on
+    if on and not registered:
+        atexit.register(writeReport)
+        registered = True
+
+if os.environ.get('FOMC_PROFILE', '') not in ('', '0'):
+    enable()
@@ -0,0 +1,265 @@
+# Filename:    nearDuplicates.py
+#
+# Description: This file finds the passages that are reused, word for word or
+#              nearly, from one statement to another, and when each first and
+#              last appeared, without comparing every pair of passages.
+#              The cleaned statements (without preprocessing) are cut into
+#              overlapping passages of passageLength words, and each passage
+#              is described by its set of shingles (the sequences of
+#              shingleSize words in it). Its MinHash signature, the smallest
+#              value of each of numHashes random hash functions over its
+#              shingles, gives an estimate of the Jaccard similarity of any
+#              two passages (the share of the functions on which their
+#              signatures agree). The signatures are cut into bands of
+#              numHashes/bands values, and passages that agree on a whole band
+#              (locality-sensitive hashing) are put in the same bucket; only
+#              passages of different statements that share a bucket are
+#              compared: a new passage joins the group of the most similar
+#              passage of the earlier statements, if their estimated
+#              similarity is at least minSimilarity, and otherwise starts a
+#              group of its own. Each group is a reused passage, with the
+#              statements it appears in.
+#              The work grows linearly with the number of passages, as long
+#              as each bucket holds few passages: only the bucketLimit latest
+#              passages of each bucket are kept, which is enough to link a new
+#              passage to the group of a passage reused in many statements.
+#              The index is kept in output/nearDuplicates.state.npz, and new
+#              statements are added to it without going over the others again
+#              (it is built again if a statement already in it has changed,
+#              or if a new statement is older than the last one in it).
+#
+# Input:       The statements cleaned by cleanStatements.py, in
+#              statements/statements.clean.np (read from its pack; see
+#              corpusStore.py).
+#
+# Output:      output/nearDuplicates.np.csv, which contains one row per group
+#              of passages found in more than one statement, most widespread
+#              first: the dates of the first and last statements in which it
+#              appears, the number of statements in which it does, and its
+#              text in the first of them.
+#              output/nearDuplicates.state.npz, the index.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, csv, zlib
+from   os.path import join, isfile
+import numpy as np
+from   cleanStatements import cleanDirNP, outputDir
+from   corpusStore import loadCorpus
+import instrumentation
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Number of words in a passage, and between the starts of two passages
+passageLength = 30
+passageStep   = 10
+# Number of words in a shingle
+shingleSize   = 4
+# Number of hash functions in a signature, and number of bands they are cut
+# into: passages with a similarity s share a bucket with probability
+# 1 - (1 - s^r)^bands, r = numHashes/bands (0.5 for s = 0.42)
+numHashes     = 128
+bands         = 32
+# Smallest estimated similarity of two linked passages
+minSimilarity = 0.6
+# Number of passages kept in each bucket (the latest ones)
+bucketLimit   = 64
+# Seed of the hash functions
+seed          = 2015
+# The hash functions are (a*x + b) mod prime, of the crc32 x of a shingle
+prime         = (1 << 31) - 1
+# Where the index and the results go
+stateFile     = join(outputDir, 'nearDuplicates.state.npz')
+duplicateFile = join(outputDir, 'nearDuplicates.np.csv')
+
+#-----------------------------------------------------------------------------#
+# passageOffsets: Returns the position of the first word of each passage of a
+#   statement of nwords words: every passageStep words, and the last one
+#   ending with the statement (a single passage if it is shorter than
+#   passageLength).
+#-----------------------------------------------------------------------------#
+def passageOffsets (nwords, length = passageLength, step = passageStep):
+    offsets = list(range(0, max(nwords - length, 0) + 1, step))
+    if offsets[-1] + length < nwords:
+        offsets.append(nwords - length)
+    return offsets
+
+#-----------------------------------------------------------------------------#
+# PassageIndex: The MinHash signatures of the passages of a list of
+#   statements, and the LSH buckets they are in. Each passage has its
+#   statement (a position in statements), the position of its first word and
+#   its group (the first passage of the group). Add statements, in order,
+#   with add, and keep the index with save and load.
+#-----------------------------------------------------------------------------#
+class PassageIndex(object):
+    def __init__ (self):
+        random = np.random.RandomState(seed)
+        self.a = random.randint(1, prime, numHashes).astype(np.uint64)
+        self.b = random.randint(0, prime, numHashes).astype(np.uint64)
+        self.statements, self.checksums = [], []
+        self.signatures, self.statementOf, self.offsets = [], [], []
+        self.group   = []
+        self.buckets = {}
+
+    # settings: The settings that the signatures and links depend on, which
+    #   must be the same for a saved index to be used.
+    @staticmethod
+    def settings ():
+        return np.array([passageLength, passageStep, shingleSize, numHashes,
+                         bands, bucketLimit, seed,
+                         int(round(minSimilarity*1e6))], dtype = np.int64)
+
+    @classmethod
+    def load (cls, path = stateFile):
+        state = np.load(path)
+        index = cls()
+        if not np.array_equal(state['settings'], cls.settings()):
+            return index
+        index.statements = [str(s) for s in state['statements']]
+        index.checksums  = [int(c) for c in state['checksums']]
+        index.signatures = list(state['signatures'])
+        index.statementOf = [int(s) for s in state['statementOf']]
+        index.offsets    = [int(o) for o in state['offsets']]
+        index.group      = [int(g) for g in state['group']]
+        for p in range(len(index.signatures)):
+            index.bucket(p)
+        return index
+
+    def save (self, path = stateFile):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, settings = self.settings(),
+                     statements = np.array(self.statements, dtype = str),
+                     checksums = np.array(self.checksums, dtype = np.int64),
+                     signatures = np.array(self.signatures, dtype = np.uint32)
+                                    .reshape(-1, numHashes),
+                     statementOf = np.array(self.statementOf,
+                                            dtype = np.int64),
+                     offsets = np.array(self.offsets, dtype = np.int64),
+                     group = np.array(self.group, dtype = np.int64))
+        os.replace(tmp, path)
+
+    # passageSignatures: Returns the signatures (passages x numHashes) of the
+    #   passages of words (a list) starting at offsets.
+    def passageSignatures (self, words, offsets):
+        shingles = [zlib.crc32(' '.join(words[i:i + shingleSize])
+                               .encode('utf-8'))
+                    for i in range(max(len(words) - shingleSize + 1, 1))]
+        x = np.array(shingles, dtype = np.uint64) % np.uint64(prime)
+        hashes = (self.a[:, None]*x[None, :] + self.b[:, None]) % \
+                 np.uint64(prime)
+        span = max(passageLength - shingleSize + 1, 1)
+        return [hashes[:, o:o + span].min(axis = 1).astype(np.uint32)
+                for o in offsets]
+
+    # bucket: Puts passage p in its bucket of each band, and returns the set
+    #   of passages that were already in them.
+    def bucket (self, p):
+        found = set()
+        for band, values in enumerate(self.signatures[p].reshape(bands, -1)):
+            members = self.buckets.setdefault((band, values.tobytes()), [])
+            found.update(members)
+            members.append(p)
+            if len(members) > bucketLimit:
+                del members[0]
+        return found
+
+    # add: Adds statement (its name), whose cleaned text is text, putting
+    #   each of its passages in a group (see the header).
+    def add (self, statement, text):
+        words = text.split()
+        s = len(self.statements)
+        self.statements.append(statement)
+        self.checksums.append(zlib.crc32(text.encode('utf-8')))
+        if not words:
+            return
+        offsets = passageOffsets(len(words))
+        for offset, signature in zip(offsets,
+                                     self.passageSignatures(words, offsets)):
+            p = len(self.signatures)
+            self.signatures.append(signature)
+            self.statementOf.append(s)
+            self.offsets.append(offset)
+            self.group.append(p)
+            candidates = sorted(q for q in self.bucket(p)
+                                if self.statementOf[q] != s)
+            if candidates:
+                similarity = np.mean(np.array([self.signatures[q]
+                                               for q in candidates])
+                                     == signature, axis = 1)
+                best = int(np.argmax(similarity))
+                if similarity[best] >= minSimilarity:
+                    self.group[p] = self.group[candidates[best]]
+
+    # groups: Returns the groups of passages found in more than one
+    #   statement, as a list of lists of passages (in order, the first being
+    #   the group), those found in the most statements first.
+    def groups (self):
+        members = {}
+        for p in range(len(self.group)):
+            members.setdefault(self.group[p], []).append(p)
+        found = [group for group in members.values()
+                 if len(set(self.statementOf[p] for p in group)) > 1]
+        found.sort(key = lambda group: (-len(set(self.statementOf[p]
+                                                 for p in group)), group[0]))
+        return found
+
+#-----------------------------------------------------------------------------#
+# updateIndex: Returns the index of the statements in locationold (the one
+#   saved in path, with the new statements added, if it can be used; see the
+#   header), and saves it. Also returns the statements (a Corpus; see
+#   corpusStore.py).
+#-----------------------------------------------------------------------------#
+def updateIndex (locationold = cleanDirNP, path = stateFile):
+    corpus = loadCorpus(locationold)
+    statementList = corpus.names
+    index = PassageIndex.load(path) if isfile(path) else PassageIndex()
+    known = set(index.statements)
+    if any(s not in corpus or zlib.crc32(corpus.data(s)) != c
+           for s, c in zip(index.statements, index.checksums)) or \
+       any(s not in known and s < index.statements[-1]
+           for s in statementList if index.statements):
+        index = PassageIndex()
+        known = set()
+    new = [s for s in statementList if s not in known]
+    with instrumentation.stage('nearDuplicates', documents = len(new)):
+        for statement in new:
+            index.add(statement, corpus.text(statement))
+        instrumentation.count(passages = len(index.signatures))
+    if new or not isfile(path):
+        index.save(path)
+    return index, corpus
+
+#-----------------------------------------------------------------------------#
+# writeDuplicates: Writes the groups of passages of index found in more than
+#   one statement to the csv file path (see the header), with their text
+#   and dates taken from corpus (the cleaned statements).
+#-----------------------------------------------------------------------------#
+def writeDuplicates (index, corpus, path = duplicateFile):
+    dates = dict((name, date.strftime('%Y-%m-%d'))
+                 for name, date in zip(corpus.names, corpus.dates))
+    with open(path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['First', 'Last', 'Statements', 'Text'])
+        for group in index.groups():
+            statements = sorted(set(index.statementOf[p] for p in group))
+            first = index.statements[statements[0]]
+            writer.writerow([dates[first],
+                             dates[index.statements[statements[-1]]],
+                             len(statements),
+                             ' '.join(corpus.text(first).split()[
+                                 index.offsets[group[0]]:
+                                 index.offsets[group[0]] + passageLength])])
+
+#-----------------------------------------------------------------------------#
+# The main function adds the new statements to the index and writes the
+#   reused passages (see the header).
+#-----------------------------------------------------------------------------#
+def main():
+    index, corpus = updateIndex()
+    writeDuplicates(index, corpus)
+
+
+if __name__ == "__main__":
+    main()
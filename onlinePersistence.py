@@ -0,0 +1,234 @@
+# Filename:    onlinePersistence.py
+#
+# Description: This file adds new statements to the persistence results of
+#              persistence.py without computing them again. For each
+#              persistence configuration (the tdm, and whether IDF weighting
+#              is used; see persistence.py), it keeps the word counts of the
+#              last statement and the last persistence values (as many as
+#              the moving average needs), so adding a statement only
+#              requires its word counts: the work grows with the number of
+#              distinct words in the new statement (and, with IDF weighting,
+#              in the one before it), not with the number of statements.
+#              With IDF weighting, the number of statements in which each word
+#              occurs is kept too. The new persistence is the one that
+#              persistence.py would compute for the newest statement; the
+#              earlier ones are not changed (with IDF weighting, persistence.py
+#              would compute them with the document frequencies of the whole
+#              corpus, so they would change slightly).
+#              Type 'python onlinePersistence.py' after downloading new
+#              statements (pullStatements.py): the statements newer than the
+#              last one in the results are cleaned (as in cleanStatements.py)
+#              and added, one at a time. The first time, the state is built
+#              from the tdms and persistence.py is run, if needed, so that
+#              the results are up to date. The tdms are not updated (run
+#              cleanStatements.py, or runPipeline.py, for that), but each
+#              cleaned statement is added to the pack of its directory (see
+#              corpusStore.py).
+#
+# Input:       The raw statements in statements/statements.raw, the tdms
+#              stored by cleanStatements.py, and the output of persistence.py.
+#
+# Output:      A row added to output/persistence_AM15.csv and
+#              output/persistenceMA_AM15.csv for every new statement, the
+#              cleaned statements, and the state, in
+#              output/persistence.state.json.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, json, math
+from   os.path import join, isfile
+from   datetime import datetime as dt
+import numpy as np
+from   textmining_withnumbers import TermDocumentArrays
+from   tdmStore import loadTDM, tdmPath
+from   weighting import weigh
+import cleanStatements, persistence, corpusStore
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Where the state is kept, and the files that are updated
+stateFile = join(persistence.outdir, 'persistence.state.json')
+persistenceFile   = join(persistence.outdir, 'persistence_AM15.csv')
+persistenceMAFile = join(persistence.outdir, 'persistenceMA_AM15.csv')
+
+#-----------------------------------------------------------------------------#
+# statementDate: Returns the date of a statement (e.g. 2015-07-29), from its
+#   file name, as in the index of the output of persistence.py.
+#-----------------------------------------------------------------------------#
+def statementDate (statement):
+    return dt.strptime(statement[15:23], '%Y%m%d').strftime('%Y-%m-%d')
+
+#-----------------------------------------------------------------------------#
+# cosine: Returns the cosine similarity of two documents, given as
+#   dictionaries of word counts, with each word weighted by weights[word] if
+#   weights is not None (NaN if either has no words, as with cossim). Only
+#   the words of the two documents are visited.
+#-----------------------------------------------------------------------------#
+def cosine (a, b, weights = None):
+    if weights is not None:
+        a = dict((word, n*weights[word]) for word, n in a.items())
+        b = dict((word, n*weights[word]) for word, n in b.items())
+    norms = math.sqrt(sum(v*v for v in a.values())
+                      * sum(v*v for v in b.values()))
+    if norms == 0:
+        return float('nan')
+    if len(b) < len(a):
+        a, b = b, a
+    return sum(v*b.get(word, 0) for word, v in a.items())/norms
+
+#-----------------------------------------------------------------------------#
+# OnlinePersistence: The state of the persistence results (see the header):
+#   the last statement added and, for each configuration (named as in
+#   persistence.descriptive), its tdm suffix, whether it uses IDF weighting,
+#   the word counts of the last statement, the last persistence values and,
+#   with IDF weighting, the number of statements and the number of
+#   statements in which each word occurs. Build it with fromTDMs, and keep it
+#   with save and load.
+#-----------------------------------------------------------------------------#
+class OnlinePersistence(object):
+    def __init__ (self, last, configs, window = persistence.maWindow):
+        self.last    = last
+        self.configs = configs
+        self.window  = window
+
+    @classmethod
+    def fromTDMs (cls, TDMdir = persistence.TDMdir,
+                  window = persistence.maWindow):
+        configs, last = {}, None
+        for suffix, IDF, name in zip(persistence.fileSuffixes,
+                                     persistence.useIDF,
+                                     persistence.descriptive):
+            TDM, words, docs, meta = loadTDM(tdmPath(TDMdir, suffix))
+            TDM = TDM.tocsc()
+            last = str(docs[-1])
+            config = {'suffix': suffix, 'IDF': IDF}
+            column = TDM[:, TDM.shape[1] - 1]
+            config['last'] = dict((str(words[i]), float(n)) for i, n in
+                                  zip(column.indices, column.data))
+            # The last persistence values (window of them), computed from
+            # the last window+1 statements, as persistence.py does
+            recent = TDM[:, max(TDM.shape[1] - window - 1, 0):]
+            if IDF:
+                n_i = np.asarray((TDM != 0).sum(axis = 1)).ravel()
+                config['ndocs'] = int(TDM.shape[1])
+                config['df'] = dict((str(words[i]), int(n_i[i]))
+                                    for i in np.flatnonzero(n_i))
+                recent = weigh(TDM, 'idf').tocsc()[:, -recent.shape[1]:]
+            config['window'] = persistence.lagSimilarity(recent, 1).tolist()
+            configs[name] = config
+        return cls(last, configs, window)
+
+    @classmethod
+    def load (cls, path = stateFile):
+        with open(path, 'r') as f:
+            state = json.load(f)
+        return cls(state['last'], state['configs'], state['window'])
+
+    def save (self, path = stateFile):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'last': self.last, 'configs': self.configs,
+                       'window': self.window}, f)
+        os.replace(tmp, path)
+
+    # add: Adds statement, whose word counts in each tdm are counts[suffix],
+    #   and returns a dictionary with the persistence and its moving average
+    #   (NaN until there are window values) for each configuration.
+    def add (self, statement, counts):
+        results = {}
+        for name, config in self.configs.items():
+            new = counts[config['suffix']]
+            weights = None
+            if config['IDF']:
+                df = config['df']
+                for word in new:
+                    df[word] = df.get(word, 0) + 1
+                config['ndocs'] += 1
+                ndocs = float(config['ndocs'])
+                weights = dict((word, math.log(ndocs/df[word]))
+                               for word in set(new) | set(config['last']))
+            value = cosine(config['last'], new, weights)
+            window = (config['window'] + [value])[-self.window:]
+            average = (sum(window)/len(window) if len(window) == self.window
+                       else float('nan'))
+            config['last'], config['window'] = new, window
+            results[name] = (value, average)
+        self.last = statement
+        return results
+
+#-----------------------------------------------------------------------------#
+# appendRow: Adds a row to the csv file path (written by persistence.py),
+#   for date, with values[column] in each of its columns.
+#-----------------------------------------------------------------------------#
+def appendRow (path, date, values):
+    with open(path, 'r') as f:
+        columns = f.readline().rstrip('\n').split(',')[1:]
+    row = [date] + ['' if math.isnan(values[column])
+                    else '%1.2f' % values[column] for column in columns]
+    with open(path, 'a') as f:
+        f.write(','.join(row) + '\n')
+
+#-----------------------------------------------------------------------------#
+# lastDate: Returns the date in the last row of the csv file path.
+#-----------------------------------------------------------------------------#
+def lastDate (path):
+    with open(path, 'r') as f:
+        lines = f.read().rstrip('\n').split('\n')
+    return lines[-1].split(',')[0]
+
+#-----------------------------------------------------------------------------#
+# getState: Returns the state of the results: the saved one if it matches
+#   the results, and otherwise one built from the tdms (and saved),
+#   after running persistence.py if its results do not end with the last
+#   statement of the tdms.
+#-----------------------------------------------------------------------------#
+def getState ():
+    # The results have been written again by persistence.py since the state
+    # was saved if they are newer
+    if isfile(stateFile) and isfile(persistenceFile) and \
+       os.path.getmtime(stateFile) >= os.path.getmtime(persistenceFile):
+        state = OnlinePersistence.load()
+        if statementDate(state.last) == lastDate(persistenceFile):
+            return state
+    state = OnlinePersistence.fromTDMs()
+    if not isfile(persistenceFile) or \
+       statementDate(state.last) != lastDate(persistenceFile):
+        persistence.main()
+    state.save()
+    return state
+
+#-----------------------------------------------------------------------------#
+# The main function cleans and adds every raw statement newer than the last
+#   one in the results (see the header).
+#-----------------------------------------------------------------------------#
+def main():
+    state = getState()
+    statementList = sorted(f for f in os.listdir(cleanStatements.statementdir)
+                           if isfile(join(cleanStatements.statementdir, f))
+                           and f > state.last)
+    if not statementList:
+        return
+    cleaners = [(config['suffix'],) + cleanStatements.cleaningArgs(config)
+                for config in cleanStatements.cleaningConfigs]
+    for statement in statementList:
+        counts = {}
+        for suffix, replacements, cleanDir, stoplist, chars, stem in cleaners:
+            cleanStatements.cleanStatement(statement,
+                                           cleanStatements.statementdir,
+                                           replacements, cleanDir, stoplist,
+                                           chars, stem)
+            counts[suffix] = TermDocumentArrays().count(
+                open(join(cleanDir, statement), 'r').read())
+            corpusStore.packDirectory(cleanDir)
+        results = state.add(statement, counts)
+        date = statementDate(statement)
+        appendRow(persistenceFile, date,
+                  dict((name, results[name][0]) for name in results))
+        appendRow(persistenceMAFile, date,
+                  dict((name, results[name][1]) for name in results))
+        state.save()
+
+
+if __name__ == "__main__":
+    main()
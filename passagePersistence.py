@@ -0,0 +1,208 @@
+# Filename:    passagePersistence.py
+#
+# Description: This file measures persistence passage by passage: for each
+#              sentence (or paragraph) of each statement, how similar it is
+#              to the most similar sentence of the statement before (its best
+#              match), so that one can see which passages are carried over
+#              from one meeting to the next.
+#              Each raw statement is cut down to the text that
+#              cleanStatement keeps (between 'for immediate release' and the
+#              vote or discount rate paragraph), split into units, and each
+#              unit is cleaned by the same StatementCleaner as the whole
+#              statements. The units of all of the statements make one
+#              sparse (units x words) matrix, weighted (see weighting.py)
+#              and scaled to unit length, and the similarities of the units
+#              of each statement with those of the statement before are
+#              computed a few statements at a time, with one sparse product
+#              per batch.
+#              For each statement, the persistence is summarized as the mean
+#              best match of its units, and the share of its units whose best
+#              match is at least carriedOver (nearly the same passage).
+#
+# Input:       The raw statements in statements/statements.raw (read from
+#              their pack; see corpusStore.py), and the word lists in the
+#              directory 'data'.
+#
+# Output:      For each persistence configuration of persistence.py, with *
+#              its tdm suffix and <unit> 'sentence' or 'paragraph':
+#                output/passages*.<unit>.csv, one row per unit: the
+#                  statement, the number of the unit in it, the number of
+#                  its best match in the statement before, their similarity
+#                  and the text of the unit;
+#              and output/passagePersistence_AM15.csv, the mean best match
+#              and the share of units carried over of each statement, for
+#              each configuration.
+#              Type 'python passagePersistence.py paragraph' to use
+#              paragraphs instead of sentences.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import sys, re
+from   os.path import join
+import numpy as np
+import pandas as pd
+from   textmining_withnumbers import TermDocumentArrays
+from   cleanStatements import datadir, statementdir, getReplacementList, \
+                              getCleaner, startText, inTaking, votingFor, \
+                              cleaningConfigs
+from   weighting import weigh
+from   corpusStore import loadCorpus
+import persistence
+import instrumentation
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# How statements are split into units: sentences end with '.', '!' or '?'
+# followed by a capital or a number (but not after an initial, as in 'U.S.'),
+# and paragraphs are separated by blank lines
+unitSplits = {'sentence' : re.compile(r'(?<![A-Z]\.[A-Z]\.)(?<=[.!?])\s+'
+                                      r'(?=[A-Z0-9])'),
+              'paragraph': re.compile(r'\n\s*\n')}
+# Best match from which a unit counts as carried over
+carriedOver = 0.8
+# Number of statements whose units are compared at a time
+batchSize   = 32
+# Where the summary goes
+passageFile = join(persistence.outdir, 'passagePersistence_AM15.csv')
+
+#-----------------------------------------------------------------------------#
+# statementBody: Returns the part of the raw statement original that
+#   cleanStatement keeps (see preprocessText), before it is cleaned.
+#-----------------------------------------------------------------------------#
+def statementBody (original):
+    start = startText.search(original)
+    body  = original[start.end():] if start else original
+    lower = body.lower()
+    ends  = [m.start() for m in [inTaking.search(lower),
+                                 votingFor.search(lower)] if m]
+    return body[:min(ends)] if ends else body
+
+#-----------------------------------------------------------------------------#
+# statementUnits: Returns the units (see unitSplits) of the raw statement
+#   original, as a list of (text, cleaned text) pairs, leaving out those with
+#   no words once cleaned by cleaner.
+#-----------------------------------------------------------------------------#
+def statementUnits (original, cleaner, unit = 'sentence'):
+    units = []
+    for text in unitSplits[unit].split(statementBody(original)):
+        clean = cleaner.clean('For immediate release ' + text)
+        if clean.split():
+            units.append((' '.join(text.split()), clean))
+    return units
+
+#-----------------------------------------------------------------------------#
+# bestMatches: Returns, for each row (unit) of X (a units x words CSR matrix
+#   of unit-length vectors), the similarity of its best match among the units
+#   of the statement before its own, and the row of that match (NaN and -1
+#   for the units of the first statement). statementOf gives the statement
+#   (0, 1, ...) of each row, and the rows are in order of statement.
+#-----------------------------------------------------------------------------#
+def bestMatches (X, statementOf, batchSize = batchSize):
+    nunits = X.shape[0]
+    best   = np.full(nunits, np.nan)
+    match  = np.full(nunits, -1, dtype = np.int64)
+    # The first row of each statement
+    starts = np.searchsorted(statementOf,
+                             np.arange(statementOf.max() + 2 if nunits else 1))
+    for first in range(1, len(starts) - 1, batchSize):
+        last = min(first + batchSize, len(starts) - 1)
+        rows = slice(starts[first], starts[last])
+        cols = slice(starts[first - 1], starts[last - 1])
+        product = X[rows].dot(X[cols].T).tocoo()
+        r = product.row + rows.start
+        c = product.col + cols.start
+        keep = statementOf[c] == statementOf[r] - 1
+        r, c, s = r[keep], c[keep], product.data[keep]
+        # Largest similarity of each row (ties go to the first unit)
+        order = np.lexsort((c, -s, r))
+        r, c, s = r[order], c[order], s[order]
+        # (none if no unit of the batch shares a word with the one before)
+        firstOfRow = np.diff(r, prepend = -1) != 0
+        best[r[firstOfRow]]  = s[firstOfRow]
+        match[r[firstOfRow]] = c[firstOfRow]
+        # Units that share no word with the statement before
+        unmatched = match[rows] < 0
+        best[rows][unmatched] = 0.0
+    return best, match
+
+#-----------------------------------------------------------------------------#
+# passagePersistence: Computes the best matches of the units of the
+#   statements in statementList (names of statements in the pack of
+#   locationold; see corpusStore.py), cleaned as in cleaning (a
+#   dictionary like those in cleanStatements.cleaningConfigs) and weighted by
+#   the scheme weighting. Returns a pandas data frame with one row per unit
+#   (see the header) and one with one row per statement but the first: its
+#   mean best match ('Mean') and share of units carried over ('Carried').
+#-----------------------------------------------------------------------------#
+def passagePersistence (statementList, locationold, cleaning,
+                        weighting = 'raw', unit = 'sentence'):
+    cleaner = getCleaner(
+        getReplacementList(join(datadir, cleaning['replacements'])),
+        [line.rstrip('\n') for line in
+         open(join(datadir, cleaning['stoplist']), 'r')],
+        cleaning['charsToKeep'], cleaning['stem'])
+    corpus = loadCorpus(locationold)
+    tdm, texts, statementOf, numbers = TermDocumentArrays(), [], [], []
+    with instrumentation.stage('units', documents = len(statementList)):
+        for s, statement in enumerate(statementList):
+            original = corpus.text(statement)
+            units = statementUnits(original, cleaner, unit)
+            for n, (text, clean) in enumerate(units):
+                tdm.add_doc(clean)
+                texts.append(text)
+                statementOf.append(s)
+                numbers.append(n)
+        instrumentation.count(units = len(texts))
+    statementOf = np.array(statementOf, dtype = np.int64)
+    numbers     = np.array(numbers, dtype = np.int64)
+
+    with instrumentation.stage('bestMatch', units = len(texts)):
+        units, words = tdm.to_csr(cutoff = 1)
+        X = weigh(units.T.astype(np.float64), weighting + '+l2').T.tocsr()
+        best, match = bestMatches(X, statementOf)
+
+    units = pd.DataFrame({'Statement': [statementList[s] for s in statementOf],
+                          'Unit'     : numbers,
+                          'BestMatch': np.where(match >= 0,
+                                                numbers[np.maximum(match, 0)],
+                                                -1),
+                          'Similarity': best,
+                          'Text'     : texts})
+    scored = units[units['Similarity'].notna()]
+    grouped = scored.groupby('Statement', sort = True)['Similarity']
+    summary = pd.DataFrame({'Mean'   : grouped.mean(),
+                            'Carried': grouped.apply(
+                                lambda s: (s >= carriedOver).mean())})
+    summary = summary.reindex(statementList[1:])
+    summary.index = [corpus.dates[corpus.position(f)] for f in summary.index]
+    return units, summary
+
+#-----------------------------------------------------------------------------#
+# The main function computes the passage persistence of every statement, for
+#   each persistence configuration (see the header).
+#-----------------------------------------------------------------------------#
+def main():
+    unit = sys.argv[1] if len(sys.argv) > 1 else 'sentence'
+    statementList = loadCorpus(statementdir).names
+    cleanings = dict((c['suffix'], c) for c in cleaningConfigs)
+    summaries = []
+    for suffix, IDF, name in zip(persistence.fileSuffixes,
+                                 persistence.useIDF,
+                                 persistence.descriptive):
+        units, summary = passagePersistence(statementList, statementdir,
+                                            cleanings[suffix],
+                                            'idf' if IDF else 'raw', unit)
+        if not IDF:
+            units.to_csv(join(persistence.outdir, 'passages' + suffix + '.'
+                              + unit + '.csv'), index = False,
+                         float_format = '%1.3f')
+        summaries.append(summary.rename(columns = {
+            'Mean': name + ' (mean)', 'Carried': name + ' (carried over)'}))
+    pd.concat(summaries, axis = 1).to_csv(path_or_buf = passageFile,
+                                          index_label = "Date",
+                                          float_format = '%1.2f')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,10 @@
 #
 # Description: This file reads the term-document matrix (tdm) data, created by
 #              cleanStatements.py, and outputs the data from figures 1, 2, 3,
-#              5a, 5b, and 6 from Acosta and Meade (2015) (figure 4 can be
-#              generated from the calculatePersistence function below, too).
+#              5a, 5b, and 6 from Acosta and Meade (2015) (figure 4 is
+#              generated by similarityMatrix.py).
 #
-# Input:       Three csv files: tdm.sparse*.csv, tdm.words*.csv, tdm.docs*.csv,
+# Input:       The tdm stored by tdmStore.py in the directory output/tdm*,
 #              for each type of preprocessing under consideration (here, we use
 #              two sets, one where *='' (more preprocessing) and *='.np' (no
 #              preprocessing).
@@ -21,6 +21,8 @@
 #                output/count_*.csv, which contains the word/phrase counts
 #                  found in figure 1 (where * is an identifier for the search
 #                  you're running).
+#                output/counts_AM15.csv, which contains all of the
+#                  word/phrase counts, one column per search.
 #
 # Author:      Miguel Acosta
 #              www.acostamiguel.com
@@ -31,11 +33,16 @@
 #--------------------------------- IMPORTS -----------------------------------#
 import os
 import numpy as np
-from   scipy.sparse import csr_matrix
+from   scipy.sparse import csr_matrix, diags
 import matplotlib
 from   datetime import datetime as dt
 import pandas as pd
 import csv
+import json
+from   tdmStore import loadTDM, tdmPath
+from   corpusStore import loadCorpus
+from   weighting import weigh, schemeName
+import instrumentation
 
 
 #-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
@@ -47,6 +54,14 @@ from cleanStatements import cleanDirNP
 statementDir = cleanDirNP
 # Location in which to store output
 outdir = 'output'
+# The persistence results: these lists of length three correspond to the
+# three levels of preprocessing in Acosta and Meade (2015): the tdm used,
+# whether to use IDF weighting, and the name of the column in the output
+fileSuffixes = ['.np',   '',  '']
+useIDF       = [False,False,True]
+descriptive  = ['Baseline', 'Preprocessing', 'Preprocessing + IDF']
+# Number of meetings in the moving average of the persistence
+maWindow     = 8
 
 #-----------------------------------------------------------------------------#
 # cossim: calculates the cosine similarity of two vectors (numpy arrays),
@@ -60,6 +75,60 @@ def cossim(a,b):
     return(numerator/denominator)
 
 
+#-----------------------------------------------------------------------------#
+# normalizeColumns: scales each column (document) of a sparse term-document
+#   matrix, TDM, to have unit Euclidean length, in one sparse diagonal
+#   product. Columns with no words are left as zeros. Returns the normalized
+#   matrix (in csc format, so columns are cheap to slice) and the vector of
+#   column norms.
+#-----------------------------------------------------------------------------#
+def normalizeColumns(TDM):
+    TDM   = csr_matrix(TDM).tocsc()
+    norms = np.sqrt(np.asarray(TDM.multiply(TDM).sum(axis=0)).ravel())
+    scale = np.zeros(len(norms))
+    scale[norms > 0] = 1.0/norms[norms > 0]
+    return(TDM.dot(diags(scale)).tocsc(), norms)
+
+
+#-----------------------------------------------------------------------------#
+# lagSimilarity: calculates the cosine similarity between every document d and
+#   document d-lag, for all d at once, without leaving the sparse format.
+#   TDM is a (words x documents) sparse matrix, and lag is a positive integer.
+#   The element-wise product of the normalized matrix with a copy of itself
+#   shifted by lag columns holds all of the pairwise products, so summing its
+#   columns gives every similarity in a single batched operation. Memory
+#   grows with the number of nonzeros, not with words x documents. Returns a
+#   numpy array of length ndocs-lag, whose first element compares document
+#   lag to document 0. Documents with no words have similarity NaN, as with
+#   cossim.
+#-----------------------------------------------------------------------------#
+def lagSimilarity(TDM, lag=1):
+    TDMnorm, norms = normalizeColumns(TDM)
+    ndocs = TDMnorm.shape[1]
+    if lag < 1 or lag >= ndocs:
+        return(np.array([]))
+    similarity = np.asarray(TDMnorm[:,lag:].multiply(TDMnorm[:,:-lag])
+                            .sum(axis=0)).ravel()
+    similarity[(norms[lag:] == 0) | (norms[:-lag] == 0)] = np.nan
+    return(similarity)
+
+
+#-----------------------------------------------------------------------------#
+# loadCachedTDM: Returns loadTDM(path), loading the tdm only the first time
+#   (or when it has been saved again, as told by the id saveTDM writes in
+#   meta.json), so that the configurations that use the same tdm also share
+#   its weighting statistics (see weighting.py).
+#-----------------------------------------------------------------------------#
+loadedTDMs = {}
+def loadCachedTDM(path):
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        info = json.load(f)
+    stamp = (info.get('saved'), info['shape'], info['nnz'])
+    if path not in loadedTDMs or loadedTDMs[path][0] != stamp:
+        loadedTDMs[path] = (stamp, loadTDM(path))
+    return loadedTDMs[path][1]
+
+
 #-----------------------------------------------------------------------------#
 # calculatePersistence: calculates the semantic persistence of FOMC statements,
 #   found in figures 3, 5a, and 5b. The inputs are:
@@ -67,7 +136,8 @@ def cossim(a,b):
 #       how much preprocessing is used in generating the term-document matrices
 #       (this is a string).
 #     IDF: Boolean for whether or not to use inverse-document-frequency
-#       weighting
+#       weighting, or the name of any weighting scheme of weighting.py (e.g.
+#       'sublinear+idf' or 'bm25')
 #     descriptive: A string used to describe the parameters you've chosen in
 #       the calculation of persistence (e.g. 'Baseline' or 'No Preprocessing')
 #     persistenceAll: A pandas data frame, to which the persistence for each
@@ -75,53 +145,25 @@ def cossim(a,b):
 #   Returns persistenceAll, which is added to each time the function is called.
 #-----------------------------------------------------------------------------#
 def calculatePersistence(fileSuffix, IDF, descriptive, persistenceAll):
-    # File names containing the tdm, associated words (rows) and document
-    # names (columns)
-    TDMfile   = os.path.join(TDMdir,'tdm.sparse' + fileSuffix + '.csv')
-    wordsFile = os.path.join(TDMdir,'tdm.words'  + fileSuffix + '.csv')
-    docsFile  = os.path.join(TDMdir,'tdm.docs'   + fileSuffix + '.csv')
-
-    # Read in tdm, whose first row is the column number (j), second rows is a
-    # row number (i), and final column is the word count for word i in document
-    # j.
-    TDMsparse  = np.genfromtxt(TDMfile, delimiter=',')
-    nwords     = int(max(TDMsparse[:,1])+1)
-    ndocs      = int(max(TDMsparse[:,0])+1)
-    TDM        = csr_matrix((TDMsparse[:,2],
-                             (TDMsparse[:,1], TDMsparse[:,0])),
-                            shape = (nwords,ndocs)).toarray()
-    # Read in words and documents associated with rows and columns of the tdm
-    wordsRaw = np.array([line.rstrip() for line in open(wordsFile, 'r')])
-    docsRaw  = np.array([line.rstrip() for line in open(docsFile, 'r')])
-
-
-    # Sort these alphabetically (this is chronoligical for the document names)
-    wsort = np.argsort(wordsRaw)
-    words = wordsRaw[wsort]
-    dsort = np.argsort(docsRaw)
-    docs  = docsRaw[dsort]
-
-    # Sort the tdm according to the alphabetical sorting
-    TDM = TDM[wsort,:]
-    TDM = TDM[:,dsort]
-
-    # Apply term-frequency, inverse document frequency weighting (TF-IDF)
-    if IDF:
-        TDMbool = TDM.copy()
-        TDMbool[TDMbool > 0] = 1
-        # number of documents in which term i occurs
-        n_i = np.sum(TDMbool, axis = 1)
-        # Inverse document frequency
-        IDFvec = np.log(ndocs/n_i)
-        IDFmat = np.tile(IDFvec,(ndocs,1)).transpose()
-
-        # Multiply term-frequency by inverse document frequency to get TF-IDF
-        TDM = np.multiply(IDFmat, TDM)
-
-    # Calculate semantic persistence
-    persistence = []
-    for d in range(1,ndocs):
-        persistence.append(cossim(TDM[:,d],TDM[:,d-1]))
+    # Map the tdm into memory: its rows (words) and columns (document names)
+    # are already sorted alphabetically, which is chronological for the
+    # document names
+    with instrumentation.stage('load' + fileSuffix):
+        TDM, words, docs, meta = loadCachedTDM(tdmPath(TDMdir, fileSuffix))
+        instrumentation.count(documents = TDM.shape[1], words = TDM.shape[0],
+                              nonzeros = TDM.nnz)
+    ndocs = TDM.shape[1]
+
+    # Apply term-frequency, inverse document frequency weighting (TF-IDF), or
+    # another weighting scheme
+    if schemeName(IDF) != 'raw':
+        with instrumentation.stage('weight' + fileSuffix):
+            TDM = weigh(TDM, IDF)
+
+    # Calculate semantic persistence: the similarity of every document with
+    # the one before it
+    with instrumentation.stage('similarity' + fileSuffix, pairs = ndocs - 1):
+        persistence = lagSimilarity(TDM, 1).tolist()
 
     if persistenceAll.empty:
         dates = [dt.strptime(doc[15:23], '%Y%m%d') for doc in docs.tolist()]
@@ -132,6 +174,99 @@ def calculatePersistence(fileSuffix, IDF, descriptive, persistenceAll):
         persistenceAll  [descriptive] = persistence
     return(persistenceAll)
 
+#-----------------------------------------------------------------------------#
+# compilePhrases: prepares a list of words/phrases for countPhrasesInText.
+#   Returns a dictionary that maps the first word of each phrase to a list of
+#   (position in phrases, list of words in the phrase) tuples, and the
+#   positions of the phrases that cannot be split into words separated by
+#   single spaces (which are counted with str.count instead).
+#-----------------------------------------------------------------------------#
+def compilePhrases(phrases):
+    byFirst, fallback = {}, []
+    for q in range(len(phrases)):
+        words = phrases[q].split(' ')
+        if all(words):
+            byFirst.setdefault(words[0], []).append((q, words))
+        else:
+            fallback.append(q)
+    return byFirst, fallback
+
+#-----------------------------------------------------------------------------#
+# countPhrasesInText: counts the number of times that each of a list of
+#   words/phrases occurs in text, with a single pass over the words of text.
+#   phrases is the list, and byFirst and fallback come from
+#   compilePhrases(phrases). Each count is exactly text.count(' ' + phrase +
+#   ' '): a phrase only counts when it is surrounded by spaces, and two
+#   occurrences that are separated by a single space share it, so only the
+#   first is counted. Returns a list of counts, in the order of phrases.
+#-----------------------------------------------------------------------------#
+def countPhrasesInText(text, phrases, byFirst, fallback):
+    counts = [0]*len(phrases)
+    for q in fallback:
+        counts[q] = text.count(' ' + phrases[q] + ' ')
+
+    # Split into words, keeping track of where each starts, so that the
+    # number of spaces between two words is the difference of their starts
+    pieces = text.split(' ')
+    starts = [k for k in range(len(pieces)) if pieces[k]]
+    tokens = [pieces[k] for k in starts]
+    starts.append(len(pieces) - 1)
+    ntokens = len(tokens)
+
+    # lastEnd[q] is the last word of the previous occurrence of phrase q
+    lastEnd = {}
+    for t in [t for t in range(ntokens) if tokens[t] in byFirst]:
+        for q, words in byFirst[tokens[t]]:
+            end = t + len(words) - 1
+            previous = lastEnd.get(q, -2)
+            if end >= ntokens or previous >= t or \
+               starts[end] - starts[t] != len(words) - 1 or \
+               tokens[t:end+1] != words:
+                continue
+            spaceBefore = starts[t] - starts[t-1] if t > 0 else starts[0]
+            if previous == t - 1:
+                spaceBefore = spaceBefore - 1
+            if spaceBefore < 1 or starts[end+1] - starts[end] < 1:
+                continue
+            counts[q] = counts[q] + 1
+            lastEnd[q] = end
+    return counts
+
+#-----------------------------------------------------------------------------#
+# countPhrases: counts the number of times that words/phrases are used in each
+#   FOMC statement, for many queries at once. queries is a list of lists of
+#   words and/or phrases (see wordCounts), and names is a list with a name for
+#   each. Every statement is read once, from the pack of the statements (see
+#   corpusStore.py), and all of the words and phrases are counted in a single
+#   pass over it. An empty query counts the total number
+#   of words in each statement. Returns a pandas data frame with one row per
+#   statement (indexed by date) and one column per query (named by names),
+#   where each entry is the sum of the counts of the words in the query.
+#-----------------------------------------------------------------------------#
+def countPhrases(queries, names):
+    corpus = loadCorpus(statementDir)
+    statementList, dates = corpus.names, corpus.dates
+
+    # Every distinct phrase, counted once per statement
+    phrases = sorted(set(word for words in queries for word in words))
+    byFirst, fallback = compilePhrases(phrases)
+    column  = dict((phrases[q], q) for q in range(len(phrases)))
+
+    frequencies = np.zeros((len(statementList), len(queries)), dtype = int)
+    with instrumentation.stage('count', documents = len(statementList),
+                               phrases = len(phrases)):
+        for s in range(len(statementList)):
+            text = corpus.text(s)
+            counts = countPhrasesInText(text, phrases, byFirst, fallback)
+            for i in range(len(queries)):
+                if queries[i]:
+                    frequencies[s,i] = sum(counts[column[word]]
+                                           for word in queries[i])
+                else:
+                    frequencies[s,i] = len(text.split())
+            instrumentation.count(characters = len(text))
+    return pd.DataFrame(frequencies, index = dates, columns = names)
+
 #-----------------------------------------------------------------------------#
 # wordCounts: counts the number of times that a word/phrase is used in each
 #   FOMC statement. It takes as an input 'words,' which is a list containing
@@ -143,26 +278,10 @@ def calculatePersistence(fileSuffix, IDF, descriptive, persistenceAll):
 #   (for the 'inflation' example, we might let outname='pi')
 #   total is a boolean indicating whether the total number of words in the
 #   statements should be counted, instead of a particular query.
+#   To run many queries, use countPhrases, which reads the statements once.
 #-----------------------------------------------------------------------------#
 def wordCounts (words, total,outname):
-    statementList = sorted([ f for f in os.listdir(statementDir)
-                      if os.path.isfile(os.path.join(statementDir,f))])
-    dates = [dt.strptime(s[15:23], '%Y%m%d') for s in statementList]
-
-    # The main data frame where the counts will be stored
-    frequencies = pd.DataFrame([0]*(len(statementList)),
-                               index = dates,
-                               columns = ['Count'])
-    for word in words:
-        for statement in statementList:
-            date = dt.strptime(statement[15:23], '%Y%m%d')
-            text  = open(os.path.join(statementDir,statement),'r').read()
-            if total:
-                frequencies['Count'][date] = len(text.split())
-            else:
-                frequency = text.count(" " + word + " ", 0, len(text))
-                frequencies['Count'][date] = frequency + \
-                                             frequencies['Count'][date]
+    frequencies = countPhrases([[] if total else words], ['Count'])
 
     # Print the csv
     frequencies.to_csv(path_or_buf = \
@@ -177,23 +296,18 @@ def wordCounts (words, total,outname):
 #   prints the output to a csv.
 #-----------------------------------------------------------------------------#
 def main():
-    # Calculate the persistence results: these lists of length three
-    # correspond to the three levels of preprocessing in Acosta and
-    # Meade (2015)
-    fileSuffixes = ['.np',   '',  '']
-    IDF          = [False,False,True]
-    descriptive  = ['Baseline', 'Preprocessing', 'Preprocessing + IDF']
+    # Calculate the persistence results (see the global variables)
     n_alts       = len(descriptive)
 
     # persistenceAll contains the persistence figure for each meeting
     persistenceAll = pd.DataFrame()
     for i in range(0,n_alts):
         persistenceAll = calculatePersistence(fileSuffixes[i],
-                                              IDF[i],
+                                              useIDF[i],
                                               descriptive[i],
                                               persistenceAll)
     # persistenceAllMA contains an eight meeting moving average
-    persistenceAllMA  = pd.rolling_mean(persistenceAll,8)
+    persistenceAllMA  = persistenceAll.rolling(maWindow).mean()
 
     # Print persistence csv
     persistenceAll.to_csv(path_or_buf = \
@@ -212,8 +326,15 @@ def main():
                   ['weather', 'hurricane', 'katrina', 'winter'], \
                   []]
     searchOutnames=['piexp', 'prod', 'energy', 'foreign', 'weather', 'all']
-    for ii in range(len(countLists)):
-        wordCounts(countLists[i],(not countLists[i]),searchOutnames[i])
+    # All of the queries are counted together, and saved both in one table
+    # (output/counts_AM15.csv) and one query per file (output/counts_*.csv)
+    frequencies = countPhrases(countLists, searchOutnames)
+    frequencies.to_csv(path_or_buf = os.path.join(outdir,'counts_AM15.csv'),
+                       index_label = "Date")
+    for outname in searchOutnames:
+        frequencies[[outname]].rename(columns = {outname: 'Count'}).to_csv(
+            path_or_buf = os.path.join(outdir,'counts_' + outname + '.csv'),
+            index_label = "Date")
 
 
 if __name__ == "__main__":
@@ -13,13 +13,13 @@
 #                edit the FOMCstatementURL function.
 #                
 # Output:        Files titles 'statements.fomc.YYYYMMDD', each of which contains
-#                an FOMC statement.
+#                an FOMC statement, and their packed copy (see corpusStore.py).
 #                
 # Author:        Miguel Acosta
 #
 # Contributors:  Eric Chu
 #
-# Last edited:   January 5, 2026
+# Last edited:   October 17, 2026
 #                See change log at bottom of file.
 #------------------------------------------------------------------------------#
 
@@ -27,16 +27,61 @@
 
 #--------------------------------- IMPORTS -----------------------------------#
 from   bs4    import BeautifulSoup
-from   urllib.request import urlopen
+from   bs4.dammit import EncodingDetector
 from   time   import sleep
-from urllib.request import Request
-import re,csv,os
+from   http.client import HTTPConnection, HTTPSConnection
+from   urllib.parse import urlsplit, urljoin
+from   concurrent.futures import ThreadPoolExecutor
+from   collections import namedtuple
+from   multiprocessing import Pool
+from   htmlCache import HtmlCache
+from   corpusStore import packDirectory
+import instrumentation
+import re,csv,os,sys,time,threading
+# lxml is optional: without it, statements are extracted with BeautifulSoup
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
 
 #-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
 # Directory in which to place statements (careful in changing this--other
 # scripts in this package rely on it).
 
 outdir = os.path.join('statements','statements.raw')
+# File in which the dates that could not be pulled are listed, with the reason
+failuresFile = os.path.join('statements','failures.csv')
+
+# Downloading: number of statements fetched at once, the most requests per
+# second sent to any one host, how many times (and after how long, doubling
+# each time) a failed request is retried, and how long to wait for a reply
+fetchWorkers      = 8
+requestsPerSecond = 4.0
+maxRetries        = 4
+backoffSeconds    = 1.0
+timeoutSeconds    = 30
+# Number of processes used to extract statements from the stored pages
+extractWorkers    = os.cpu_count() or 1
+# Header sent with every request
+requestHeaders    = { 'User-Agent' : 'Mozilla/5.0 (Windows NT 6.1; Win64; x64)'}
+
+# Extracting: the patterns that mark the start and the end of a statement
+# (legacy patterns first, then modern ones--see extractStatement), and the
+# "Share" section of modern statements
+startPatterns = [re.compile(r"[Ff]or\s[Ii]mmediate\s[Rr]elease", re.IGNORECASE),
+                 re.compile(r"[Ff]or\s+release\s+at\s+\d+:\d+\s+[ap]\.?m\.?\s+[A-Z]{3}T?",
+                            re.IGNORECASE)]
+endPatterns   = [re.compile(r"[0-9]{4}\s[Mm]onetary\s[Pp]olicy", re.IGNORECASE),
+                 re.compile(r"Last\s+Update:\s+[A-Za-z]+\s+\d+,\s+\d{4}",
+                            re.IGNORECASE)]
+sharePattern  = re.compile(r'\s+Share\s+')
+blankLines    = re.compile(r'\n\s*\n\s*\n+')
+manySpaces    = re.compile(r' {2,}')
+# Tags whose text BeautifulSoup leaves out of get_text, tags in which it keeps
+# whitespace as it is, and the characters it counts as whitespace
+hiddenTags    = {'script', 'style', 'template', 'rt', 'rp'}
+preserveTags  = {'pre', 'textarea'}
+asciiSpaces   = '\x20\x0a\x09\x0c\x0d'
 
 #-----------------------------------------------------------------------------#
 # FOMCstatementsURL: A function that returns the appropriate URL of the
@@ -80,96 +125,503 @@ def FOMCstatementURL(date):
     return urlout
 
 #-----------------------------------------------------------------------------#
-# getDate: A function that uses the BeautifulSoup library to scrape the
-#   text of the FOMC statement from the Fed website, which the funnction
-#   returns as a string. Note that there is little effort to clean the text---
-#   that is reserved for another step.
+# FetchResult: The outcome of fetching one URL. status is the HTTP status of
+#   the last response (None if there was none), body is its content (bytes,
+#   None if the fetch failed), headers are its headers (a dictionary with
+#   lower-case keys), error describes why the fetch failed (None if it
+#   succeeded) and attempts is the number of requests that were made.
 #-----------------------------------------------------------------------------#
+FetchResult = namedtuple('FetchResult',
+                         ['url', 'status', 'body', 'headers', 'error',
+                          'attempts'])
 
-def getStatement(mtgDate):
-    url = FOMCstatementURL(mtgDate)
-    try:
-        hdr = { 'User-Agent' : 'Mozilla/5.0 (Windows NT 6.1; Win64; x64)'}
-        html = urlopen(Request(url,headers=hdr)).read()
-        soup = BeautifulSoup(html)
-        allText = soup.get_text(" ")
-        
-        # Start patterns: Check legacy patterns first, then modern ones
-        start_patterns = [
-            r"[Ff]or\s[Ii]mmediate\s[Rr]elease",  # Legacy pattern (1999-2015)
-            r"[Ff]or\s+release\s+at\s+\d+:\d+\s+[ap]\.?m\.?\s+[A-Z]{3}T?"  # Modern pattern (2016+) e.g., "For release at 2:00 p.m. EDT"
-        ]
-        
-        startLoc = None
-        for pattern in start_patterns:
-            match = re.search(pattern, allText, re.IGNORECASE)
+#-----------------------------------------------------------------------------#
+# HostRateLimiter: Spaces out the requests sent to each host, so that no more
+#   than rate requests per second go to any one of them, however many
+#   threads are sending them. Call wait(host) before each request.
+#-----------------------------------------------------------------------------#
+class HostRateLimiter(object):
+    def __init__ (self, rate):
+        self.interval = 1.0/rate if rate else 0.0
+        self.nextTime = {}
+        self.lock     = threading.Lock()
+
+    def wait (self, host):
+        with self.lock:
+            now  = time.time()
+            when = max(now, self.nextTime.get(host, now))
+            self.nextTime[host] = when + self.interval
+        if when > now:
+            sleep(when - now)
+
+#-----------------------------------------------------------------------------#
+# Fetcher: Downloads web pages, politely. Each thread keeps one open
+#   (keep-alive) connection per host, requests to each host are rate limited
+#   (see HostRateLimiter), and requests that fail because of the network or
+#   the server (5xx, 429) are retried after backoff, 2*backoff, 4*backoff...
+#   seconds. Redirects are followed. Use fetch for one URL and fetchAll for
+#   many; neither raises an exception when a page cannot be fetched--the
+#   reason is in the error field of the FetchResult.
+#   If cache (an htmlCache.HtmlCache) is given, every page fetched is stored
+#   in it, and requests for pages it already has are conditional: if the
+#   server replies that the page has not changed, the stored copy is used.
+#-----------------------------------------------------------------------------#
+class Fetcher(object):
+    def __init__ (self, rate = requestsPerSecond, retries = maxRetries,
+                  backoff = backoffSeconds, timeout = timeoutSeconds,
+                  headers = requestHeaders, cache = None):
+        self.cache   = cache
+        self.limiter = HostRateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers
+        self.local   = threading.local()
+
+    #-------------------------------------------------------------------------#
+    # connection: Returns this thread's connection to scheme://host.
+    #-------------------------------------------------------------------------#
+    def connection (self, scheme, host):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        key = (scheme, host)
+        if key not in self.local.connections:
+            make = HTTPSConnection if scheme == 'https' else HTTPConnection
+            self.local.connections[key] = make(host, timeout = self.timeout)
+        return self.local.connections[key]
+
+    #-------------------------------------------------------------------------#
+    # dropConnection: Closes (and forgets) this thread's connection to
+    #   scheme://host, after an error left it in an unknown state.
+    #-------------------------------------------------------------------------#
+    def dropConnection (self, scheme, host):
+        connection = getattr(self.local, 'connections', {}).pop(
+            (scheme, host), None)
+        if connection is not None:
+            connection.close()
+
+    #-------------------------------------------------------------------------#
+    # request: Sends one GET request for url, with extra headers added to
+    #   the default ones, following up to maxRedirects redirects. Returns the
+    #   status, headers (lower-case keys) and body of the final response.
+    #   Network errors are raised.
+    #-------------------------------------------------------------------------#
+    def request (self, url, extra = None, maxRedirects = 5):
+        headers = dict(self.headers, **(extra or {}))
+        for redirect in range(maxRedirects + 1):
+            parts = urlsplit(url)
+            path  = parts.path or '/'
+            if parts.query:
+                path = path + '?' + parts.query
+            self.limiter.wait(parts.netloc)
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers = headers)
+                response = connection.getresponse()
+                body     = response.read()
+            except Exception:
+                self.dropConnection(parts.scheme, parts.netloc)
+                raise
+            responseHeaders = dict((k.lower(), v)
+                                   for k, v in response.getheaders())
+            if response.status in (301, 302, 303, 307, 308) and \
+               'location' in responseHeaders:
+                url = urljoin(url, responseHeaders['location'])
+                continue
+            return response.status, responseHeaders, body
+        raise IOError('Too many redirects')
+
+    #-------------------------------------------------------------------------#
+    # fetch: Fetches url, retrying with exponential backoff. Returns a
+    #   FetchResult. extra are headers to add to the request. Responses with
+    #   status 200 and 304 (not modified) count as success. With a cache,
+    #   the body of a 304 response is the stored page.
+    #-------------------------------------------------------------------------#
+    def fetch (self, url, extra = None):
+        if self.cache is None:
+            return self.fetchOnce(url, extra)
+        result = self.fetchOnce(url, dict(self.cache.conditionalHeaders(url),
+                                          **(extra or {})))
+        if result.status == 304:
+            body = self.cache.read(url)
+            if body is None:
+                return self.fetchOnce(url, extra)
+            self.cache.touch(url)
+            return result._replace(body = body)
+        if result.error is None:
+            self.cache.store(url, result.body, result.headers)
+        return result
+
+    #-------------------------------------------------------------------------#
+    # fetchOnce: Does the work of fetch, without the cache.
+    #-------------------------------------------------------------------------#
+    def fetchOnce (self, url, extra = None):
+        status, error = None, None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                sleep(self.backoff * 2**(attempt - 1))
+            try:
+                status, headers, body = self.request(url, extra)
+            except Exception as e:
+                status, error = None, '%s: %s' % (type(e).__name__, e)
+                continue
+            if status in (200, 304):
+                return FetchResult(url, status, body, headers, None,
+                                   attempt + 1)
+            error = 'HTTP status %d' % status
+            if status != 429 and status < 500:
+                break
+        return FetchResult(url, status, None, None, error, attempt + 1)
+
+    #-------------------------------------------------------------------------#
+    # fetchAll: Fetches every URL in urls, using up to workers threads.
+    #   Returns a list of FetchResults, in the same order as urls.
+    #-------------------------------------------------------------------------#
+    def fetchAll (self, urls, workers = fetchWorkers):
+        if workers <= 1:
+            return [self.fetch(url) for url in urls]
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            return list(pool.map(self.fetch, urls))
+
+#-----------------------------------------------------------------------------#
+# extractStatement: Returns the text of the FOMC statement in html (the page
+#   downloaded from the Fed website, as bytes or a string), using the
+#   BeautifulSoup library, or "" if the start of the statement cannot be
+#   found. Note that there is little effort to clean the text---that is
+#   reserved for another step.
+#-----------------------------------------------------------------------------#
+def extractStatement(html):
+    soup = BeautifulSoup(html)
+    allText = soup.get_text(" ")
+
+    # Start patterns: Check legacy patterns first, then modern ones
+    start_patterns = [
+        r"[Ff]or\s[Ii]mmediate\s[Rr]elease",  # Legacy pattern (1999-2015)
+        r"[Ff]or\s+release\s+at\s+\d+:\d+\s+[ap]\.?m\.?\s+[A-Z]{3}T?"  # Modern pattern (2016+) e.g., "For release at 2:00 p.m. EDT"
+    ]
+
+    startLoc = None
+    for pattern in start_patterns:
+        match = re.search(pattern, allText, re.IGNORECASE)
+        if match:
+            startLoc = match.start()
+            break
+
+    if startLoc is None:
+        return ""
+
+    statementText = allText[startLoc:]
+
+    # End patterns: Check legacy patterns first, then modern ones
+    end_patterns = [
+        r"[0-9]{4}\s[Mm]onetary\s[Pp]olicy",  # Legacy pattern (1999-2015) e.g., "2015 Monetary Policy"
+        r"Last\s+Update:\s+[A-Za-z]+\s+\d+,\s+\d{4}"  # Modern pattern (2016+) e.g., "Last Update: January 31, 2006"
+    ]
+
+    endLoc = None
+    for pattern in end_patterns:
+        match = re.search(pattern, statementText, re.IGNORECASE)
+        if match:
+            endLoc = match.start()
+            break
+
+    if endLoc is None:
+        pass
+        # Use the full statement if we can't find the end
+    else:
+        statementText = statementText[:endLoc]
+
+    # Remove "Share" section that appears in "modern" FOMC statements
+    share_match = re.search(r'\s+Share\s+', statementText)
+    if share_match:
+        after_share = statementText[share_match.end():]
+        lines = after_share.split('\n')
+        first_content_idx = 0
+        for i, line in enumerate(lines):
+            if line.strip() and len(line.strip()) > 20:
+                first_content_idx = i
+                break
+        # Keep everything before "Share" + skip to first real content
+        before_share = statementText[:share_match.start()]
+        real_content = '\n'.join(lines[first_content_idx:])
+        statementText = before_share + '\n' + real_content
+
+    # Clean up excessive whitespace: collapse multiple blank lines into one
+    statementText = re.sub(r'\n\s*\n\s*\n+', '\n\n', statementText)
+    statementText = re.sub(r' {2,}', ' ', statementText)
+
+    statementText = statementText.encode('ascii', 'ignore').decode('ascii')
+    return statementText
+
+#-----------------------------------------------------------------------------#
+# PageText: Collects the text of a page as lxml parses it, without building
+#   a tree, in the same pieces that BeautifulSoup's get_text gives when it
+#   uses lxml (see the tags and characters in the global variables). It is
+#   used as the target of an lxml.etree.HTMLParser, whose close method returns
+#   the list of pieces.
+#-----------------------------------------------------------------------------#
+class PageText(object):
+    def __init__ (self):
+        self.strings  = []
+        self.current  = []
+        self.tags     = []
+        self.hidden   = 0
+        self.preserve = 0
+
+    #-------------------------------------------------------------------------#
+    # endData: Ends the piece of text collected since the last tag, comment,
+    #   etc. Whitespace is shortened to one space or newline (except inside
+    #   preserveTags), and the text in hiddenTags is dropped.
+    #-------------------------------------------------------------------------#
+    def endData (self, keep = True):
+        if not self.current:
+            return
+        text = ''.join(self.current)
+        self.current = []
+        if not keep or self.hidden:
+            return
+        if not self.preserve and not text.strip(asciiSpaces):
+            text = '\n' if '\n' in text else ' '
+        self.strings.append(text)
+
+    def start (self, tag, attrib, nsmap = None):
+        self.endData()
+        self.tags.append(tag)
+        self.hidden   = self.hidden + (tag in hiddenTags)
+        self.preserve = self.preserve + (tag in preserveTags)
+
+    # Like BeautifulSoup, an end tag closes every tag opened after the last
+    # tag of the same name, and is ignored if there is none
+    def end (self, tag):
+        self.endData()
+        if tag not in self.tags:
+            return
+        while True:
+            name = self.tags.pop()
+            self.hidden   = self.hidden - (name in hiddenTags)
+            self.preserve = self.preserve - (name in preserveTags)
+            if name == tag:
+                break
+
+    def data (self, data):
+        self.current.append(data)
+
+    # Comments, processing instructions and the doctype are not text
+    def comment (self, text):
+        self.endData()
+
+    def pi (self, target, data = None):
+        self.endData()
+
+    def doctype (self, *args):
+        self.endData()
+
+    def close (self):
+        self.endData()
+        return self.strings
+
+#-----------------------------------------------------------------------------#
+# StatementExtractor: Extracts FOMC statements from pages, giving exactly the
+#   same text as extractStatement, faster. extract(html) returns the
+#   statement. parser chooses how the text of the page is found: 'lxml' (the
+#   default, if lxml is installed) feeds the page to lxml and keeps only its
+#   text (see PageText), without building the BeautifulSoup tree that
+#   extractStatement walks; any other value is the name of a BeautifulSoup
+#   parser, and None uses BeautifulSoup's default one, like extractStatement.
+#   The start and end patterns are compiled once (see the global variables).
+#-----------------------------------------------------------------------------#
+class StatementExtractor(object):
+    def __init__ (self, parser = 'lxml' if etree is not None else None):
+        if parser == 'lxml' and etree is None:
+            raise ImportError('the lxml parser needs the lxml package')
+        self.parser = parser
+
+    #-------------------------------------------------------------------------#
+    # pageText: Returns all of the text of html (bytes or a string), like
+    #   BeautifulSoup(html).get_text(" ").
+    #-------------------------------------------------------------------------#
+    def pageText (self, html):
+        if self.parser != 'lxml':
+            return BeautifulSoup(html, self.parser).get_text(" ")
+        # Read bytes the way BeautifulSoup does: try each likely encoding
+        # (declared in the page, UTF-8, windows-1252...) until one works
+        if isinstance(html, str):
+            if html[:1] == '\ufeff':
+                html = html[1:]
+            attempts = [(html, None)]
+        else:
+            detector = EncodingDetector(html, is_html = True)
+            attempts = [(detector.markup, encoding)
+                        for encoding in detector.encodings]
+        for markup, encoding in attempts:
+            parser = etree.HTMLParser(target = PageText(), recover = True,
+                                      encoding = encoding)
+            try:
+                parser.feed(markup)
+                return " ".join(parser.close())
+            except (UnicodeDecodeError, LookupError, etree.ParserError):
+                continue
+        raise ValueError('could not read the page with any encoding')
+
+    #-------------------------------------------------------------------------#
+    # statementText: Returns the statement in allText, the text of a page
+    #   (see extractStatement for the steps).
+    #-------------------------------------------------------------------------#
+    def statementText (self, allText):
+        for pattern in startPatterns:
+            match = pattern.search(allText)
             if match:
-                startLoc = match.start()
                 break
-        
-        if startLoc is None:
+        else:
             return ""
-            
-        statementText = allText[startLoc:]
-
-        # End patterns: Check legacy patterns first, then modern ones
-        end_patterns = [
-            r"[0-9]{4}\s[Mm]onetary\s[Pp]olicy",  # Legacy pattern (1999-2015) e.g., "2015 Monetary Policy"
-            r"Last\s+Update:\s+[A-Za-z]+\s+\d+,\s+\d{4}"  # Modern pattern (2016+) e.g., "Last Update: January 31, 2006"
-        ]
-        
-        endLoc = None
-        for pattern in end_patterns:
-            match = re.search(pattern, statementText, re.IGNORECASE)
+        statementText = allText[match.start():]
+
+        for pattern in endPatterns:
+            match = pattern.search(statementText)
             if match:
-                endLoc = match.start()
+                statementText = statementText[:match.start()]
                 break
-        
-        if endLoc is None:
-            pass
-            # Use the full statement if we can't find the end
-        else:
-            statementText = statementText[:endLoc]
-        
-        # Remove "Share" section that appears in "modern" FOMC statements
-        share_match = re.search(r'\s+Share\s+', statementText)
-        if share_match:
-            after_share = statementText[share_match.end():]
-            lines = after_share.split('\n')
-            first_content_idx = 0
-            for i, line in enumerate(lines):
-                if line.strip() and len(line.strip()) > 20:
-                    first_content_idx = i
+
+        # Remove the "Share" section: skip the lines after it up to the first
+        # one with more than 20 characters (or none, if there is no such line)
+        match = sharePattern.search(statementText)
+        if match:
+            afterShare = statementText[match.end():]
+            start = 0
+            while True:
+                newline = afterShare.find('\n', start)
+                line = afterShare[start:] if newline < 0 else \
+                       afterShare[start:newline]
+                if len(line.strip()) > 20:
+                    break
+                if newline < 0:
+                    start = 0
                     break
-            # Keep everything before "Share" + skip to first real content
-            before_share = statementText[:share_match.start()]
-            real_content = '\n'.join(lines[first_content_idx:])
-            statementText = before_share + '\n' + real_content
-        
-        # Clean up excessive whitespace: collapse multiple blank lines into one
-        statementText = re.sub(r'\n\s*\n\s*\n+', '\n\n', statementText)
-        statementText = re.sub(r' {2,}', ' ', statementText)
-            
-        # Add a printed message for tracking
-        # If we see this error messgae printed out in terminal, just delete the corresponding files manually.
-        # Then, run the one-line script again!
-        statementText = statementText.encode('ascii', 'ignore').decode('ascii')
-        print(f"Extracted statement text ({len(statementText)} characters)") # To eyeball whether this scrape works
-        return statementText
-    except Exception as e:
-        print(f"[!!] Error accessing URL: {e}") # Comment out this line for a cleaner terminal
+                start = newline + 1
+            statementText = statementText[:match.start()] + '\n' + \
+                            afterShare[start:]
+
+        statementText = blankLines.sub('\n\n', statementText)
+        statementText = manySpaces.sub(' ', statementText)
+        return statementText.encode('ascii', 'ignore').decode('ascii')
+
+    #-------------------------------------------------------------------------#
+    # extract: Returns the statement in html, or "" if there is none.
+    #-------------------------------------------------------------------------#
+    def extract (self, html):
+        return self.statementText(self.pageText(html))
+
+#-----------------------------------------------------------------------------#
+# getStatement: A function that downloads the FOMC statement from the
+#   meeting on mtgDate (a string, YYYYMMDD) and returns its text as a string
+#   (see extractStatement), or "" if it could not be downloaded or found.
+#-----------------------------------------------------------------------------#
+
+def getStatement(mtgDate):
+    result = Fetcher().fetch(FOMCstatementURL(mtgDate))
+    if result.error is not None:
+        print(f"[!!] Error accessing URL: {result.error}") # Comment out this line for a cleaner terminal
         return ""
-        
-        # Notes: if a FOMC statement is not scraped properly, we'll  notice the file size being 0.
-        # What to do: delete that file manually, and simply run this program again
-        # in "main()" below, there's a skip-existing-file feature so we only re-scrape the deleted files/dates
+    statementText = StatementExtractor().extract(result.body)
+    # Add a printed message for tracking
+    print(f"Extracted statement text ({len(statementText)} characters)") # To eyeball whether this scrape works
+    return statementText
+
+    # Notes: if a FOMC statement is not scraped properly, it is listed in
+    # statements/failures.csv by main() below, and no file is written for it.
+    # What to do: simply run this program again--in "main()" below, there's a
+    # skip-existing-file feature so we only re-scrape the missing dates
+
+
+#-----------------------------------------------------------------------------#
+# extractFile: Returns the text of the FOMC statement in the page stored in
+#   the file path (see extractStatement). Used to extract statements in
+#   parallel.
+#-----------------------------------------------------------------------------#
+def extractFile(path):
+    with open(path, 'rb') as f:
+        return StatementExtractor().extract(f.read())
+
+#-----------------------------------------------------------------------------#
+# saveStatement: Writes data, the text of the FOMC statement from the
+#   meeting on releaseDate (YYYYMMDD), to its file in outdir.
+#-----------------------------------------------------------------------------#
+def saveStatement(releaseDate, data):
+    # The URL for 20070628 is stored at 20070618 page.
+    if releaseDate.find("20070618")>-1:
+       releaseDate = "20070628"
+    filename="statement.fomc." + releaseDate +".txt"
+    filepath = os.path.join(outdir,filename)
+    print(f"Saving to: {filepath}") # For progress tracjing
+    f = open(filepath, 'w')
+    f.write(data)
+    f.close()
+
+#-----------------------------------------------------------------------------#
+# writeFailures: Lists the dates that could not be pulled, and why, in
+#   failuresFile. failures is a list of [date, url, status, error, attempts].
+#-----------------------------------------------------------------------------#
+def writeFailures(failures):
+    with open(failuresFile, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['date', 'url', 'status', 'error', 'attempts'])
+        writer.writerows(failures)
+    print(f"\n{len(failures)} dates could not be pulled (see {failuresFile})") # For progress tracking
+
+#-----------------------------------------------------------------------------#
+# extractFromCache: Extracts the FOMC statements again from the pages stored
+#   by main (see htmlCache.py), without using the network, and overwrites the
+#   statement files (and their pack, see corpusStore.py). The pages are split across extractWorkers processes.
+#   releaseDates is a list of dates (YYYYMMDD) to extract; by default, every
+#   date in data/dates.sort.txt. Run it with 'python pullStatements.py
+#   extract', e.g. after changing the extraction patterns.
+#-----------------------------------------------------------------------------#
+def extractFromCache(releaseDates = None):
+    if releaseDates is None:
+        releaseDates = [line.rstrip() for line in
+                        open(os.path.join('data','dates.sort.txt'), 'r')]
+    os.makedirs(outdir, exist_ok=True)
+    cache = HtmlCache()
+
+    failures, stored = [], []
+    for releaseDate in releaseDates:
+        url   = FOMCstatementURL(releaseDate)
+        entry = cache.lookup(url)
+        if entry is None:
+            failures.append([releaseDate, url, None, 'page not stored', 0])
+        else:
+            stored.append((releaseDate, url,
+                           cache.objectPath(entry['sha1'])))
+
+    start = time.time()
+    paths = [path for releaseDate, url, path in stored]
+    with instrumentation.stage('extract', pages = len(paths)):
+        if extractWorkers > 1:
+            pool  = Pool(extractWorkers)
+            texts = pool.map(extractFile, paths)
+            pool.close()
+            pool.join()
+        else:
+            texts = [extractFile(path) for path in paths]
+        instrumentation.count(characters = sum(len(t) for t in texts))
+    print(f"Extracted {len(texts)} statements in {time.time()-start:.1f} seconds") # For progress tracking
+
+    for (releaseDate, url, path), data in zip(stored, texts):
+        if not data:
+            failures.append([releaseDate, url, None,
+                             'no statement text found', 0])
+            continue
+        saveStatement(releaseDate, data)
+    packDirectory(outdir)
+    writeFailures(failures)
 
 
 #-----------------------------------------------------------------------------#
 # The Main function reads the file data/data.sort.txt, forms a list of the
-#   meeting dates contained therein, and loops over them, at each iteration
-#   calling the function getStatement to get the FOMC statement from
-#   that date. It then prints out the results to individual files.
+#   meeting dates contained therein, and downloads the pages of those that
+#   have not been pulled yet, several at a time (see Fetcher). It then
+#   extracts the FOMC statement from each page and prints out the results to
+#   individual files. The dates that failed are listed in failuresFile.
 #-----------------------------------------------------------------------------#
 
 def main():
@@ -190,29 +642,58 @@ def main():
     releaseDates = [d for d in releaseDates if d not in existing_files] # Added a skip feature
     print(f"Skipping {len(existing_files)} already pulled, processing {len(releaseDates)} remaining") # For progress tracking
 
-    for releaseDate in releaseDates:
+    # Download all of the statements at once (see the global variables for
+    # the number of simultaneous downloads and the limit on requests/second),
+    # keeping a copy of each page (see htmlCache.py)
+    start   = time.time()
+    cache   = HtmlCache()
+    with instrumentation.stage('fetch', pages = len(releaseDates)):
+        results = Fetcher(cache = cache).fetchAll(
+                      [FOMCstatementURL(d) for d in releaseDates], fetchWorkers)
+        cache.save()
+        instrumentation.count(
+            bytes    = sum(len(r.body) for r in results if r.body),
+            requests = sum(r.attempts for r in results),
+            failures = sum(r.error is not None for r in results))
+    print(f"Downloaded {len(results)} pages in {time.time()-start:.1f} seconds") # For progress tracking
+
+    extractor = StatementExtractor()
+    failures  = []
+    extracted = {}
+    with instrumentation.stage('extract', pages = len(results)):
+        for releaseDate, result in zip(releaseDates, results):
+            if result.error is None:
+                extracted[releaseDate] = extractor.extract(result.body)
+        instrumentation.count(
+            characters = sum(len(t) for t in extracted.values()))
+    for releaseDate, result in zip(releaseDates, results):
         print(f"\nProcessing date: {releaseDate}") # For porgress tracking
-        data = getStatement(releaseDate)
-        
+        if result.error is not None:
+            print(f"[!!] Skipping {releaseDate} - {result.error}") # For porgress tracking
+            failures.append([releaseDate, result.url, result.status,
+                             result.error, result.attempts])
+            continue
+        data = extracted[releaseDate]
         if not data:
-            print(f"[!!] Skipping {releaseDate} - no data retrieved") # For porgress tracking
+            print(f"[!!] Skipping {releaseDate} - no statement text found") # For porgress tracking
+            failures.append([releaseDate, result.url, result.status,
+                             'no statement text found', result.attempts])
             continue
-        
-        # Give the Fed servers a break
-        sleep(2) 
-        # The URL for 20070628 is stored at 20070618 page.
-        if releaseDate.find("20070618")>-1:
-           releaseDate = "20070628"
-        filename="statement.fomc." + releaseDate +".txt"
-        filepath = os.path.join(outdir,filename)
-        print(f"Saving to: {filepath}") # For progress tracjing
-        f = open(filepath, 'w')
-        f.write(data)
-        f.close()
+        print(f"Extracted statement text ({len(data)} characters)") # To eyeball whether this scrape works
+        saveStatement(releaseDate, data)
+    # Bring the packed copy of the statements up to date (see corpusStore.py)
+    packDirectory(outdir)
+
+    # List the dates that could not be pulled, and why
+    writeFailures(failures)
 
 
 if __name__ == "__main__":
-    main()
+    # 'python pullStatements.py extract' re-extracts from the stored pages
+    if len(sys.argv) > 1 and sys.argv[1] == 'extract':
+        extractFromCache()
+    else:
+        main()
 
 
 #------------------------------------------------------------------------------#
@@ -245,4 +726,20 @@ if __name__ == "__main__":
 #    3) Added header to url request
 #    4) Modification to missing dates/files logic 
 #
+#
+# Modification date: October 17, 2026
+#
+#    1) Statements are downloaded several at a time, over keep-alive
+#       connections, with a limit on requests per second and retries with
+#       exponential backoff (replacing the 2 second pause)
+#    2) Dates that could not be pulled are listed in statements/failures.csv
+#    3) Downloaded pages are kept in statements/statements.html (see
+#       htmlCache.py), re-downloaded only if they have changed, and the
+#       statements can be extracted from them again with
+#       'python pullStatements.py extract'
+#    4) Statements are extracted by StatementExtractor, which reads the
+#       text of each page straight from lxml (when installed) instead of
+#       building a BeautifulSoup tree, and gives the same text as
+#       extractStatement (checked by benchmark.py)
+#
 #------------------------------------------------------------------------------#    
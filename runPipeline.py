@@ -0,0 +1,291 @@
+# Filename:    runPipeline.py
+#
+# Description: This file runs the whole pipeline (pullStatements.py,
+#              cleanStatements.py and persistence.py), redoing only the work
+#              whose inputs have changed since the last run. Every input is
+#              identified by a hash of its contents (a fingerprint):
+#                - each raw statement;
+#                - each type of cleaning: the stop list, the replacement list,
+#                  the characters kept, whether words are stemmed (and the
+#                  version of nltk, if so) and the code that cleans;
+#                - each tdm: the fingerprints of the cleaned statements that
+#                  it is made from, the cutoff and the code that builds it;
+#                - the persistence and word count results: the fingerprints of
+#                  the tdms and cleaned statements they read, and the code.
+#              A cleaned statement is only made again if the raw statement or
+#              its type of cleaning changed. A tdm is only rebuilt if one of
+#              its statements changed, and then incrementally (see createtdm
+#              in cleanStatements.py), so after a new meeting only one
+#              statement is cleaned and split into words for each tdm.
+#              The fingerprints are kept in output/build.json. The hash of a
+#              file is only recomputed when its size or modification time
+#              changes, and the slow packages (nltk, pandas...) are only
+#              loaded when there is work to do, so a run with nothing to do
+#              takes a fraction of a second.
+#
+# Input:       The files read by each of the scripts (see their headers).
+#              Type 'python runPipeline.py pull' to also download any
+#              statement that is missing (see pullStatements.py), and
+#              'python runPipeline.py' to work with the statements already
+#              downloaded.
+#
+# Output:      The files written by each of the scripts, and output/build.json.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys, json, hashlib, time
+from   importlib import import_module, metadata
+import instrumentation
+import cleanStatements, corpusStore
+# The directories, the types of cleaning and the settings of the tdms are
+# those of cleanStatements.py
+from   cleanStatements import cleaningConfigs, datadir, statementdir, \
+                              outputDir, cutoff
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# File in which the fingerprints of the last run are kept
+manifestFile = os.path.join(outputDir, 'build.json')
+# The code that each step depends on: if it changes, the step is redone
+cleaningCode    = ['cleanStatements.py', 'stemCache.py']
+tdmCode         = ['cleanStatements.py', 'textmining_withnumbers.py',
+                   'tdmStore.py', 'corpusStore.py']
+persistenceCode = ['persistence.py', 'tdmStore.py', 'weighting.py',
+                   'corpusStore.py']
+
+#-----------------------------------------------------------------------------#
+# fingerprint: Returns the SHA-1 hash (a hexadecimal string) of parts, a list
+#   of strings and other JSON-serializable values.
+#-----------------------------------------------------------------------------#
+def fingerprint (*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys = True)
+                        .encode('utf-8')).hexdigest()
+
+#-----------------------------------------------------------------------------#
+# FileHashes: The hashes of the contents of files. known is the dictionary
+#   saved by the last run, mapping each path to [size, modification time,
+#   hash]; a file is only read again if its size or modification time has
+#   changed. hash(path) returns the hash of a file (None if it does not
+#   exist), and known holds every file hashed in this run.
+#-----------------------------------------------------------------------------#
+class FileHashes(object):
+    def __init__ (self, known = None):
+        self.previous = known or {}
+        self.known    = {}
+
+    def hash (self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.previous.get(path)
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            with open(path, 'rb') as f:
+                entry = [stat.st_size, stat.st_mtime_ns,
+                         hashlib.sha1(f.read()).hexdigest()]
+        self.known[path] = entry
+        return entry[2]
+
+    # The hash of several files together
+    def hashAll (self, paths):
+        return fingerprint([[path, self.hash(path)] for path in paths])
+
+#-----------------------------------------------------------------------------#
+# loadManifest: Returns the fingerprints saved by the last run (an empty
+#   dictionary if there was none). saveManifest writes them.
+#-----------------------------------------------------------------------------#
+def loadManifest (path = manifestFile):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def saveManifest (manifest, path = manifestFile):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent = 1, sort_keys = True)
+    os.replace(tmp, path)
+
+#-----------------------------------------------------------------------------#
+# configFingerprint: Returns the fingerprint of a type of cleaning (an
+#   element of cleaningConfigs), hashing its files with hashes (a FileHashes).
+#-----------------------------------------------------------------------------#
+def configFingerprint (config, hashes):
+    return fingerprint(hashes.hash(os.path.join(datadir, config['stoplist'])),
+                       hashes.hash(os.path.join(datadir,
+                                                config['replacements'])),
+                       config['charsToKeep'], config['stem'],
+                       metadata.version('nltk') if config['stem'] else None,
+                       hashes.hashAll(cleaningCode))
+
+#-----------------------------------------------------------------------------#
+# pullStage: Downloads the statements of the dates in data/dates.sort.txt
+#   that have not been pulled yet (see pullStatements.main). Nothing is
+#   downloaded if every statement is already there.
+#-----------------------------------------------------------------------------#
+def pullStage ():
+    dates    = [line.rstrip() for line in
+                open(os.path.join(datadir, 'dates.sort.txt'), 'r')]
+    existing = set(os.listdir(statementdir)) \
+               if os.path.isdir(statementdir) else set()
+    missing  = [d for d in dates
+                if 'statement.fomc.' + d + '.txt' not in existing and
+                not (d == '20070618' and
+                     'statement.fomc.20070628.txt' in existing)]
+    if not missing:
+        print('pull: up to date')
+        return
+    print('pull: %d statements missing' % len(missing))
+    import_module('pullStatements').main()
+
+#-----------------------------------------------------------------------------#
+# cleanStage: Cleans the raw statements whose cleaned versions are missing or
+#   out of date, for each type of cleaning, and deletes the cleaned versions
+#   of raw statements that no longer exist. manifest and hashes are the saved
+#   fingerprints and a FileHashes. Returns, for each type of cleaning, the
+#   fingerprint of each cleaned statement, and the word counts of the
+#   statements cleaned (only if the tdms are hashed, see cleanAll; None
+#   otherwise).
+#-----------------------------------------------------------------------------#
+def cleanStage (manifest, hashes, workers = 1):
+    statementList = sorted(f for f in os.listdir(statementdir)
+                           if os.path.isfile(os.path.join(statementdir, f)))
+    rawHashes = dict((f, hashes.hash(os.path.join(statementdir, f)))
+                     for f in statementList)
+    # The raw statements may have been added or edited by hand since they
+    # were pulled (see corpusStore.py)
+    corpusStore.packDirectory(statementdir)
+
+    keys, stale = [], {}
+    for c, config in enumerate(cleaningConfigs):
+        previous = manifest.get('clean', {}).get(config['suffix'], {})
+        cfp      = configFingerprint(config, hashes)
+        keys.append(dict((f, fingerprint(cfp, rawHashes[f]))
+                         for f in statementList))
+        os.makedirs(config['cleanDir'], exist_ok = True)
+        for f in statementList:
+            if previous.get(f) != keys[c][f] or \
+               not os.path.isfile(os.path.join(config['cleanDir'], f)):
+                stale.setdefault(f, []).append(c)
+        removed = [f for f in set(previous) - set(statementList)
+                   if os.path.isfile(os.path.join(config['cleanDir'], f))]
+        for f in removed:
+            os.remove(os.path.join(config['cleanDir'], f))
+        if removed:
+            corpusStore.packDirectory(config['cleanDir'])
+
+    hashed = cleanStatements.features is not None
+    counts = [{} if hashed else None for config in cleaningConfigs]
+    if not stale:
+        print('clean: up to date')
+        return keys, counts
+
+    # Clean together the statements that are out of date for the same types
+    # of cleaning, so each is read once
+    configs = [cleanStatements.cleaningArgs(config)
+               for config in cleaningConfigs]
+    groups = {}
+    for f in sorted(stale):
+        groups.setdefault(tuple(stale[f]), []).append(f)
+    for which, group in sorted(groups.items()):
+        print('clean: %d statements, cleanings %s'
+              % (len(group), [cleaningConfigs[c]['suffix'] for c in which]))
+        with instrumentation.stage('clean', documents = len(group)):
+            found = cleanStatements.cleanAll(group, statementdir,
+                                             [configs[c] for c in which],
+                                             workers, counting = hashed)
+        if hashed:
+            for c, groupCounts in zip(which, found):
+                counts[c].update(groupCounts)
+    return keys, counts
+
+#-----------------------------------------------------------------------------#
+# tdmStage: Updates the tdm of each type of cleaning whose statements have
+#   changed (see createtdm in cleanStatements.py). keys and counts come from
+#   cleanStage. Returns the fingerprint of each tdm, by suffix.
+#-----------------------------------------------------------------------------#
+def tdmStage (manifest, hashes, keys, counts):
+    tdmKeys = {}
+    stale   = []
+    for c, config in enumerate(cleaningConfigs):
+        suffix = config['suffix']
+        tdmKeys[suffix] = fingerprint(sorted(keys[c].items()), cutoff,
+                                      cleanStatements.features,
+                                      hashes.hashAll(tdmCode))
+        if manifest.get('tdm', {}).get(suffix) != tdmKeys[suffix] or \
+           not os.path.isfile(os.path.join(outputDir, 'tdm' + suffix,
+                                           'meta.json')):
+            stale.append(c)
+    if not stale:
+        print('tdm: up to date')
+        return tdmKeys
+
+    for c in stale:
+        config = cleaningConfigs[c]
+        print('tdm: updating tdm%s' % config['suffix'])
+        meta = dict((k, config[k]) for k in
+                    ['stoplist', 'replacements', 'charsToKeep', 'stem'])
+        cleanStatements.createtdm(config['cleanDir'], outputDir,
+                                  config['suffix'], meta, cutoff = cutoff,
+                                  incremental = True, counts = counts[c],
+                                  features = cleanStatements.features)
+    return tdmKeys
+
+#-----------------------------------------------------------------------------#
+# persistenceStage: Calculates persistence and the word counts again (see
+#   persistence.main) if a tdm or the statements that are counted changed.
+#   Returns the fingerprint of the results. Everything is computed again on
+#   purpose, rather than adding the new statements as onlinePersistence.py
+#   does: with IDF weighting, a new statement changes the document
+#   frequencies, and so the persistence of every earlier statement, and the
+#   results must be the ones persistence.py gives.
+#-----------------------------------------------------------------------------#
+def persistenceStage (manifest, hashes, keys, tdmKeys):
+    # persistence.py counts words in the statements cleaned without
+    # preprocessing
+    countKeys = [keys[c] for c in range(len(cleaningConfigs))
+                 if cleaningConfigs[c]['suffix'] == '.np']
+    key = fingerprint(sorted(tdmKeys.items()),
+                      [sorted(k.items()) for k in countKeys],
+                      hashes.hashAll(persistenceCode))
+    if manifest.get('persistence') == key and \
+       os.path.isfile(os.path.join(outputDir, 'persistence_AM15.csv')):
+        print('persistence: up to date')
+        return key
+    print('persistence: calculating')
+    import_module('persistence').main()
+    return key
+
+#-----------------------------------------------------------------------------#
+# The main function runs each step (see above) that has something to do, and
+#   saves the fingerprints of the outputs after each, so that if a step fails,
+#   the steps before it are not redone.
+#-----------------------------------------------------------------------------#
+def main(pull = False, workers = 1):
+    start    = time.time()
+    manifest = loadManifest()
+    hashes   = FileHashes(manifest.get('files'))
+    if pull:
+        pullStage()
+
+    keys, counts = cleanStage(manifest, hashes, workers)
+    manifest['clean'] = dict((cleaningConfigs[c]['suffix'], keys[c])
+                             for c in range(len(cleaningConfigs)))
+    manifest['files'] = hashes.known
+    saveManifest(manifest)
+
+    manifest['tdm'] = tdmStage(manifest, hashes, keys, counts)
+    manifest['files'] = hashes.known
+    saveManifest(manifest)
+
+    manifest['persistence'] = persistenceStage(manifest, hashes, keys,
+                                               manifest['tdm'])
+    manifest['files'] = hashes.known
+    saveManifest(manifest)
+    print('Finished in %.2f seconds' % (time.time() - start))
+
+
+if __name__ == "__main__":
+    main(pull = len(sys.argv) > 1 and sys.argv[1] == 'pull')
@@ -0,0 +1,205 @@
+# Filename:    searchIndex.py
+#
+# Description: This file finds the statements most similar to a given one
+#              (or to any text), among all of the statements rather than
+#              only the one before it, as in persistence.py. The statements
+#              of a tdm are weighted (TF-IDF, by default, as in
+#              persistence.py, or any scheme of weighting.py) and scaled to
+#              unit length once, when the index is built, so the cosine
+#              similarity of a query with every statement is a single
+#              product. Queries are weighted as if they were statements of
+#              the tdm. Queries are answered in batches: the sparse statement
+#              vectors are multiplied by the sparse (words x queries) batch
+#              a block of statements at a time, and only the (statements x
+#              queries) result is made dense, keeping the best k of each
+#              query as it goes, so memory does not grow with the number of
+#              statements or the size of the vocabulary. A single query only
+#              visits the statements that share a word with it. The
+#              statements that share no word with a query are never among
+#              its results. Optionally, the smallest weights of the
+#              statement vectors can be pruned, to make the index smaller and
+#              faster at the cost of slightly approximate similarities.
+#              Text queries are cleaned as cleanStatement cleaned the
+#              statements of the tdm (the cleaning is stored with the tdm).
+#
+# Input:       The tdm stored by cleanStatements.py in output/tdm* (by
+#              default, output/tdm, the one with preprocessing).
+#
+# Output:      None. Type 'python searchIndex.py k query' to print the k
+#              statements most similar to query: the name of a statement
+#              (e.g. statement.fomc.20150729.txt, compared only with the
+#              statements before it) or any text.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys
+import numpy as np
+from   scipy.sparse import csr_matrix
+from   tdmStore import loadTDM, tdmPath
+from   weighting import weigh
+from   textmining_withnumbers import simple_tokenize
+from   cleanStatements import datadir, outputDir, getReplacementList, \
+                              getCleaner, startText
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Number of statements multiplied at a time by a batch of queries
+blockSize = 4096
+
+#-----------------------------------------------------------------------------#
+# SimilarityIndex: The weighted, unit-length statement vectors of a tdm, and
+#   what is needed to weight queries the same way.
+#     TDM, words, docs, meta: A tdm, as returned by loadTDM.
+#     weighting: The weighting scheme (see weighting.py), 'idf' (TF-IDF, as
+#       in persistence.py) by default; the vectors are then scaled to unit
+#       length.
+#     prune: Weights of the unit-length statement vectors below this are
+#       dropped (0 keeps them all, and gives exact similarities).
+#   Use fromTDM to build it from a stored tdm, and search (text queries) or
+#   similarTo (statements of the tdm) to query it.
+#-----------------------------------------------------------------------------#
+class SimilarityIndex(object):
+    def __init__ (self, TDM, words, docs, meta = None, weighting = 'idf',
+                  prune = 0):
+        self.words = [str(w) for w in words]
+        self.docs  = [str(d) for d in docs]
+        self.vocabulary = dict((w, i) for i, w in enumerate(self.words))
+        self.meta  = meta if meta is not None else {}
+        # The counts, whose statistics weight the queries too
+        self.counts = csr_matrix(TDM).astype(np.float64)
+        self.weighting = weighting
+        # Statements x words
+        matrix = weigh(self.counts, weighting + '+l2').T.tocsr()
+        if prune > 0:
+            matrix.data[np.abs(matrix.data) < prune] = 0
+            matrix.eliminate_zeros()
+        self.matrix  = matrix
+        # The same, by word, for single queries
+        self.columns = matrix.tocsc()
+        self.cleaner = None
+
+    @classmethod
+    def fromTDM (cls, fileSuffix = '', TDMdir = outputDir, **options):
+        TDM, words, docs, meta = loadTDM(tdmPath(TDMdir, fileSuffix))
+        return cls(TDM, words, docs, meta, **options)
+
+    # clean: Returns the text cleaned as the statements of the tdm were (see
+    #   cleanStatement). Text without the header of a statement (in any case,
+    #   as preprocessText looks for it in the lowercased text) is cleaned
+    #   whole.
+    def clean (self, text):
+        if self.cleaner is None:
+            meta = self.meta
+            stoplist = [line.rstrip('\n') for line in
+                        open(os.path.join(datadir, meta['stoplist']), 'r')]
+            self.cleaner = getCleaner(
+                getReplacementList(os.path.join(datadir,
+                                                meta['replacements'])),
+                stoplist, meta['charsToKeep'], meta['stem'])
+        if not startText.search(text.lower()):
+            text = 'For immediate release\n' + text
+        return self.cleaner.clean(text)
+
+    # vectors: Returns the weighted, unit-length vectors (queries x words) of
+    #   texts (a list of strings), weighted as statements of the tdm. Words
+    #   that are not in the tdm are ignored.
+    def vectors (self, texts):
+        rows, cols = [], []
+        for q, text in enumerate(texts):
+            for word in simple_tokenize(self.clean(text)):
+                if word in self.vocabulary:
+                    rows.append(q)
+                    cols.append(self.vocabulary[word])
+        counts = csr_matrix((np.ones(len(rows)), (cols, rows)),
+                            shape = (len(self.words), len(texts)))
+        return weigh(counts, self.weighting + '+l2', self.counts).T.tocsr()
+
+    # topK: Returns, for each row of queries (sparse, queries x words, unit
+    #   length), the k most similar statements among the first limits[q]
+    #   (all, if limits is None), as a list of (statement, similarity) lists,
+    #   most similar first. Statements with a similarity of 0 (no word in
+    #   common) are left out, so a query with no word of the tdm gets an
+    #   empty list.
+    def topK (self, queries, k = 10, limits = None):
+        nq, ndocs = queries.shape[0], len(self.docs)
+        limits = np.full(nq, ndocs) if limits is None else np.asarray(limits)
+        if nq == 1:
+            # Only the statements that share a word with the query
+            q = queries.getrow(0)
+            scores = np.asarray(self.columns[:, q.indices]
+                                .dot(q.data)).ravel()
+            scores[limits[0]:] = -np.inf
+            best = [self.best(scores, k)]
+        else:
+            batch = queries.T.tocsc()
+            bestScores = np.full((0, nq), -np.inf)
+            bestDocs   = np.zeros((0, nq), dtype = np.int64)
+            for start in range(0, ndocs, blockSize):
+                block  = self.matrix[start:start + blockSize].dot(batch) \
+                             .toarray()
+                docIds = np.arange(start, start + block.shape[0])
+                block[docIds[:, None] >= limits[None, :]] = -np.inf
+                scores = np.vstack([bestScores, block])
+                ids    = np.vstack([bestDocs,
+                                    np.repeat(docIds[:, None], nq, axis = 1)])
+                if scores.shape[0] > k:
+                    keep = np.argpartition(-scores, k - 1, axis = 0)[:k]
+                    scores = np.take_along_axis(scores, keep, axis = 0)
+                    ids    = np.take_along_axis(ids, keep, axis = 0)
+                bestScores, bestDocs = scores, ids
+            best = []
+            for q in range(nq):
+                order = np.argsort(-bestScores[:, q], kind = 'stable')
+                best.append([(bestDocs[i, q], bestScores[i, q])
+                             for i in order])
+        return [[(self.docs[d], float(s)) for d, s in found
+                 if s != 0 and s > -np.inf][:k] for found in best]
+
+    # best: Returns the (statement, similarity) pairs of the k largest scores,
+    #   largest first.
+    @staticmethod
+    def best (scores, k):
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind = 'stable')]
+        return [(d, scores[d]) for d in top]
+
+    # search: Returns the k statements most similar to each of texts (a list
+    #   of strings), as in topK.
+    def search (self, texts, k = 10):
+        return self.topK(self.vectors(texts), k)
+
+    # similarTo: Returns the k statements most similar to each of docs (names
+    #   or positions of statements of the tdm), as in topK. If earlier is
+    #   True, each is only compared with the statements before it, and
+    #   otherwise with all of the others.
+    def similarTo (self, docs, k = 10, earlier = True):
+        ids = [d if isinstance(d, (int, np.integer)) else self.docs.index(d)
+               for d in docs]
+        queries = self.matrix[ids]
+        if earlier:
+            return self.topK(queries, k, ids)
+        found = self.topK(queries, k + 1)
+        return [[(d, s) for d, s in found[q] if d != self.docs[ids[q]]][:k]
+                for q in range(len(ids))]
+
+#-----------------------------------------------------------------------------#
+# The main function prints the statements most similar to a query (see the
+#   header).
+#-----------------------------------------------------------------------------#
+def main():
+    k, query = int(sys.argv[1]), ' '.join(sys.argv[2:])
+    index = SimilarityIndex.fromTDM()
+    if query in index.docs:
+        found = index.similarTo([query], k)[0]
+    else:
+        found = index.search([query], k)[0]
+    for doc, similarity in found:
+        print('%s %.3f' % (doc, similarity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Filename:    similarityMatrix.py
+#
+# Description: This file computes the cosine similarity of every pair of
+#              statements (the full matrix, as in figure 4 of Acosta and
+#              Meade (2015)), or of every statement with each of the K
+#              statements before it (a band: lags 1 to K), and summarizes
+#              the band as a lag profile: the mean similarity of statements
+#              k meetings apart, overall and over time.
+#              The statements (or any other units: sentences, several
+#              corpora...) are weighted as in persistence.py and scaled to
+#              unit length, and the products are computed a block of rows at
+#              a time, small enough to stay in the processor's cache, split
+#              across several processes. The result is written straight to
+#              a memory-mapped .npy file, so that even with 10^5 units the
+#              matrix never has to fit in memory (read it back with
+#              np.load(path, mmap_mode = 'r')). For the full matrix, only the
+#              blocks on and below the diagonal are computed.
+#
+# Input:       The tdms stored by cleanStatements.py in output/tdm*.
+#
+# Output:      For each persistence configuration of persistence.py (e.g.
+#              'Baseline'), with * its tdm suffix and [.w] its weighting, if
+#              any (e.g. '.idf'):
+#                output/similarity*[.w].band.npy, the band: element [d,k-1]
+#                  is the similarity of statement d with statement d-k (NaN
+#                  if there is none);
+#                output/similarity*[.w].npy, the full similarity matrix,
+#                  only if 'python similarityMatrix.py full' is typed (it
+#                  takes 8 bytes per pair of statements: 80 GB for 10^5);
+#              and output/lagProfile_AM15.csv, the mean similarity at each
+#              lag for each configuration.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys
+import numpy as np
+import pandas as pd
+from   datetime import datetime as dt
+from   multiprocessing import Pool
+from   tdmStore import loadTDM, tdmPath
+from   weighting import weigh, schemeName
+import persistence
+import instrumentation
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Number of rows (units) in a block: 512 x 512 similarities of 8 bytes fit in
+# a 2 MB cache
+blockSize = 512
+# Number of lags in the band and in the lag profile
+maxLag    = 16
+# Number of processes (None is one per processor)
+workers   = None
+# The rows of the matrix being computed, in each process (see blockWorker)
+rows      = None
+
+#-----------------------------------------------------------------------------#
+# unitRows: Returns the (units x words) CSR matrix of the unit-length vectors
+#   of the columns of TDM (a words x units tdm), weighted by IDF if IDF is
+#   True (or by any scheme of weighting.py, if IDF is its name), and the
+#   norms before scaling (0 for units with no words).
+#-----------------------------------------------------------------------------#
+def unitRows (TDM, IDF = False):
+    TDM = weigh(TDM, IDF)
+    TDMnorm, norms = persistence.normalizeColumns(TDM)
+    return TDMnorm.T.tocsr(), norms
+
+#-----------------------------------------------------------------------------#
+# setRows, blockWorker: Each process of the pool is given the unit-length rows
+#   once (setRows), and then computes blocks of the matrix (blockWorker): the
+#   products of the rows start to end with the rows first to last, written
+#   to the .npy file path, either in the full matrix (band is None) or in
+#   the band of band lags.
+#-----------------------------------------------------------------------------#
+def setRows (matrix, norms):
+    global rows
+    rows = (matrix, norms)
+
+def blockWorker (path, start, end, band):
+    matrix, norms = rows
+    out = np.load(path, mmap_mode = 'r+')
+    empty = norms == 0
+    if band is None:
+        # The blocks from the first to this one (the matrix is symmetric)
+        for first in range(0, end, blockSize):
+            last  = min(first + blockSize, end)
+            block = matrix[start:end].dot(matrix[first:last].T).toarray()
+            block[empty[start:end], :] = np.nan
+            block[:, empty[first:last]] = np.nan
+            out[start:end, first:last] = block
+            out[first:last, start:end] = block.T
+    else:
+        first = max(start - band, 0)
+        block = matrix[start:end].dot(matrix[first:end].T).toarray()
+        block[empty[start:end], :] = np.nan
+        block[:, empty[first:end]] = np.nan
+        result = np.full((end - start, band), np.nan)
+        for d in range(start, end):
+            lags = np.arange(1, min(band, d) + 1)
+            result[d - start, :len(lags)] = block[d - start, d - lags - first]
+        out[start:end] = result
+    out.flush()
+    return end - start
+
+#-----------------------------------------------------------------------------#
+# similarityMatrix: Writes the similarities of the units of TDM (a words x
+#   units tdm, weighted as in unitRows) to the .npy file path: all of
+#   them if band is None, and otherwise those of each unit with the band
+#   units before it (see the header). The blocks are split across workers
+#   processes (1 computes them in this process). Returns the result, mapped
+#   into memory read-only.
+#-----------------------------------------------------------------------------#
+def similarityMatrix (TDM, path, IDF = False, band = None, workers = workers,
+                      dtype = np.float64):
+    matrix, norms = unitRows(TDM, IDF)
+    nunits = matrix.shape[0]
+    shape  = (nunits, nunits) if band is None else (nunits, band)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    out = np.lib.format.open_memmap(path, mode = 'w+', dtype = dtype,
+                                    shape = shape)
+    del out
+    blocks = [(path, start, min(start + blockSize, nunits), band)
+              for start in range(0, nunits, blockSize)]
+    # Later blocks of the full matrix have more to do, so they go first
+    blocks.reverse()
+    with instrumentation.stage('similarity', units = nunits,
+                               blocks = len(blocks)):
+        if workers == 1:
+            setRows(matrix, norms)
+            for block in blocks:
+                blockWorker(*block)
+        else:
+            pool = Pool(workers, initializer = setRows,
+                        initargs = (matrix, norms))
+            pool.starmap(blockWorker, blocks, chunksize = 1)
+            pool.close()
+            pool.join()
+    return np.load(path, mmap_mode = 'r')
+
+#-----------------------------------------------------------------------------#
+# lagProfile: Returns the mean similarity at each lag of a band (see
+#   similarityMatrix), over all units, as a numpy array (element k-1 is lag
+#   k), ignoring units without a similarity at that lag.
+#-----------------------------------------------------------------------------#
+def lagProfile (band):
+    return np.array([np.nanmean(band[:, k]) if np.any(~np.isnan(band[:, k]))
+                     else np.nan for k in range(band.shape[1])])
+
+#-----------------------------------------------------------------------------#
+# lagProfileOverTime: Returns the moving average, over window units, of the
+#   similarity at each lag of a band, as a pandas data frame with one row per
+#   unit (indexed by index, if given) and one column per lag.
+#-----------------------------------------------------------------------------#
+def lagProfileOverTime (band, window = persistence.maWindow, index = None):
+    frame = pd.DataFrame(np.asarray(band), index = index,
+                         columns = range(1, band.shape[1] + 1))
+    return frame.rolling(window, min_periods = 1).mean()
+
+#-----------------------------------------------------------------------------#
+# The main function computes the band of each persistence configuration (and
+#   the full matrix, if full is True), and writes their lag profiles (see the
+#   header).
+#-----------------------------------------------------------------------------#
+def main(full = False):
+    profiles = {}
+    for suffix, IDF, name in zip(persistence.fileSuffixes,
+                                 persistence.useIDF,
+                                 persistence.descriptive):
+        TDM, words, docs, meta = loadTDM(tdmPath(persistence.TDMdir, suffix))
+        base = os.path.join(persistence.outdir,
+                            'similarity' + suffix +
+                            ('' if schemeName(IDF) == 'raw'
+                             else '.' + schemeName(IDF)))
+        if full:
+            similarityMatrix(TDM, base + '.npy', IDF)
+        band = similarityMatrix(TDM, base + '.band.npy', IDF, maxLag)
+        profiles[name] = lagProfile(band)
+    pd.DataFrame(profiles, index = range(1, maxLag + 1)).to_csv(
+        path_or_buf = os.path.join(persistence.outdir, 'lagProfile_AM15.csv'),
+        index_label = "Lag", float_format = '%1.3f')
+
+
+if __name__ == "__main__":
+    main(full = len(sys.argv) > 1 and sys.argv[1] == 'full')
@@ -0,0 +1,157 @@
+# Filename:    stemCache.py
+#
+# Description: This file keeps the stems of the words that have already been
+#              stemmed, so that each word is stemmed once rather than every
+#              time it appears. The FOMC statements use a small vocabulary
+#              over and over again, so after the first run over the corpus
+#              (or the first configuration of a parameter sweep) almost no
+#              stemming is left to do.
+#
+#              Stems are kept in two places: in memory, up to a maximum
+#              number of words (the least recently used are dropped first),
+#              and in a table on disk that survives between runs. Rows of the
+#              table are keyed by the name and version of the stemmer, so
+#              that a different stemmer, or a new version of nltk, never
+#              reads stems made by another one.
+#
+# Input:       The table cache/stems.sqlite, if it exists.
+#
+# Output:      The table cache/stems.sqlite, with the new stems added.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sqlite3, atexit
+from   collections import OrderedDict
+from   importlib import import_module
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Where the table of stems is stored
+cacheDir   = 'cache'
+cacheFile  = os.path.join(cacheDir, 'stems.sqlite')
+# Maximum number of stems kept in memory
+maxInMemory = 200000
+# Number of new stems to collect before they are written to disk
+flushEvery  = 5000
+
+#-----------------------------------------------------------------------------#
+# lancasterStemmer: Returns nltk's LancasterStemmer class. nltk is only loaded
+#   the first time a stemmer is made, since it takes a second or more to load
+#   and runPipeline.py reads the cleaning settings of cleanStatements.py (and
+#   so this file) even when there is nothing to do.
+#-----------------------------------------------------------------------------#
+def lancasterStemmer ():
+    return import_module('nltk.stem.lancaster').LancasterStemmer
+
+#-----------------------------------------------------------------------------#
+# StemCache: Stems words with stemmer (by default, nltk's LancasterStemmer),
+#   remembering the results. path is the file holding the table on disk
+#   (None keeps the stems in memory only), and maxsize is the number of stems
+#   kept in memory. Use stem as a drop-in replacement for stemmer.stem, and
+#   flush to write new stems to disk (this also happens every flushEvery new
+#   stems, and when python exits).
+#-----------------------------------------------------------------------------#
+class StemCache(object):
+    def __init__ (self, stemmer = None, path = cacheFile,
+                  maxsize = maxInMemory):
+        self.stemmer = stemmer if stemmer is not None \
+                       else lancasterStemmer()()
+        self.name    = type(self.stemmer).__name__
+        self.version = import_module('nltk').__version__
+        self.path    = path
+        self.maxsize = maxsize
+        self.memory  = OrderedDict()
+        self.pending = {}
+        self.db      = None
+        self.pid     = None
+        # Counts of where the stems came from
+        self.hits, self.diskHits, self.misses = 0, 0, 0
+        # Save any new stems when python exits (once, however many times
+        # the table is opened)
+        if path is not None:
+            atexit.register(self.flush)
+
+    #-------------------------------------------------------------------------#
+    # connect: Returns the connection to the table on disk (None if there is
+    #   no table), opening it (and loading up to maxsize of its stems into
+    #   memory) the first time it is needed in this process.
+    #-------------------------------------------------------------------------#
+    def connect (self):
+        if self.path is None:
+            return None
+        # A connection cannot be shared with a forked process
+        if self.db is not None and self.pid == os.getpid():
+            return self.db
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok = True)
+        self.db  = sqlite3.connect(self.path, timeout = 60)
+        self.pid = os.getpid()
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS stems ('
+                        'stemmer TEXT, version TEXT, word TEXT, stem TEXT, '
+                        'PRIMARY KEY (stemmer, version, word))')
+        self.db.commit()
+        rows = self.db.execute('SELECT word, stem FROM stems '
+                               'WHERE stemmer = ? AND version = ? LIMIT ?',
+                               (self.name, self.version, self.maxsize))
+        for word, stem in rows:
+            self.memory.setdefault(word, stem)
+        return self.db
+
+    #-------------------------------------------------------------------------#
+    # stem: Returns the stem of word.
+    #-------------------------------------------------------------------------#
+    def stem (self, word):
+        memory = self.memory
+        if word in memory:
+            self.hits = self.hits + 1
+            memory.move_to_end(word)
+            return memory[word]
+
+        db   = self.connect()
+        stem = self.pending.get(word)
+        if db is not None and stem is None:
+            row = db.execute('SELECT stem FROM stems WHERE stemmer = ? AND '
+                             'version = ? AND word = ?',
+                             (self.name, self.version, word)).fetchone()
+            if row is not None:
+                stem = row[0]
+                self.diskHits = self.diskHits + 1
+        if stem is None:
+            stem = self.stemmer.stem(word)
+            self.misses = self.misses + 1
+            if db is not None:
+                self.pending[word] = stem
+                if len(self.pending) >= flushEvery:
+                    self.flush()
+
+        memory[word] = stem
+        if len(memory) > self.maxsize:
+            memory.popitem(last = False)
+        return stem
+
+    #-------------------------------------------------------------------------#
+    # flush: Writes the stems computed since the last flush to disk.
+    #-------------------------------------------------------------------------#
+    def flush (self):
+        if not self.pending or self.path is None:
+            return
+        db = self.connect()
+        db.executemany('INSERT OR IGNORE INTO stems VALUES (?, ?, ?, ?)',
+                       [(self.name, self.version, word, stem)
+                        for word, stem in self.pending.items()])
+        db.commit()
+        self.pending = {}
+
+#-----------------------------------------------------------------------------#
+# getStemCache: Returns the StemCache shared by everything in this process
+#   that stems with the same kind of stemmer (by default, LancasterStemmer).
+#-----------------------------------------------------------------------------#
+stemCaches = {}
+def getStemCache (stemmer = None):
+    stemmer = stemmer if stemmer is not None else lancasterStemmer()
+    if stemmer not in stemCaches:
+        stemCaches[stemmer] = StemCache(stemmer())
+    return stemCaches[stemmer]
@@ -0,0 +1,224 @@
+# Filename:    sweep.py
+#
+# Description: This file computes the persistence of the statements for
+#              every combination of a grid of settings, to check how robust
+#              it is to the choices made in cleanStatements.py and
+#              persistence.py: the stop list, the replacement list, the
+#              characters kept, stemming, the number of statements a word
+#              must appear in (the cutoff) and the weighting (raw counts,
+#              TF-IDF, BM25...; see weighting.py). Nothing is written to the
+#              statement directories, and each step is done once for all of
+#              the combinations that share it:
+#                - each raw statement is read once, and preprocessed once
+#                  for each set of characters kept;
+#                - the n-grams are replaced once for each replacement list
+#                  (and set of characters), and the stop words removed once
+#                  for each stop list, before stemming, which is done through
+#                  the shared cache of stemCache.py;
+#                - the word counts of each type of cleaning are put in one
+#                  tdm, from which the words below each cutoff are dropped,
+#                  and each weighting uses the same (cut) tdm.
+#              The statements are cleaned in parallel, and then each type of
+#              cleaning is made into tdms and persistence in parallel.
+#              Type 'python sweep.py [workers]' to run the grid in
+#              sweepGrid below, with workers processes (by default, one per
+#              processor).
+#
+# Input:       The raw statements in statements/statements.raw (read from
+#              their pack; see corpusStore.py), and the word lists in the
+#              directory 'data'.
+#
+# Output:      output/sweep_persistence.csv, which contains the persistence
+#              of each statement (rows) for each combination of settings
+#              (columns, named after the settings, e.g.
+#              'stoplist=emptystop.txt;replacements=wordlist.np.txt;
+#              charsToKeep=[^A-Za-z0-9 ]+;stem=0;cutoff=1;weighting=raw').
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, sys, itertools
+from   os.path import join
+from   functools import partial
+from   multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from   textmining_withnumbers import TermDocumentArrays
+from   cleanStatements import datadir, statementdir, outputDir, \
+                              getReplacementList, getCleaner, preprocessText
+from   stemCache import getStemCache
+from   persistence import lagSimilarity
+from   weighting import weigh
+from   corpusStore import loadCorpus
+import instrumentation
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# The settings to combine: the stop lists and replacement lists (files in
+# datadir), the characters removed, whether to stem, the cutoffs and the
+# weightings (any scheme of weighting.py, e.g. 'raw', 'idf' or 'bm25+l2'),
+# each applied to the same tdm. The first combination with 'emptystop.txt',
+# 'wordlist.np.txt', '[^A-Za-z0-9 ]+', 0, 1 and 'raw' is the 'Baseline' of
+# persistence.py.
+sweepGrid = {'stoplist'    : ['emptystop.txt', 'stoplist_mcdonald_comb.txt'],
+             'replacements': ['wordlist.np.txt', 'wordlist.txt'],
+             'charsToKeep' : ['[^A-Za-z0-9 ]+', '[^A-Za-z ]+'],
+             'stem'        : [0, 1],
+             'cutoff'      : [1, 2, 5],
+             'weighting'   : ['raw', 'idf']}
+# The order of the settings in the names of the combinations, those that
+# change the cleaning coming first
+settings  = ['stoplist', 'replacements', 'charsToKeep', 'stem', 'cutoff',
+             'weighting']
+# Number of processes (None is one per processor)
+workers   = None
+# Where the results go
+sweepFile = join(outputDir, 'sweep_persistence.csv')
+
+#-----------------------------------------------------------------------------#
+# gridConfigs: Returns the list of combinations of the settings in grid (a
+#   dictionary like sweepGrid), each a dictionary of settings.
+#-----------------------------------------------------------------------------#
+def gridConfigs (grid = sweepGrid):
+    return [dict(zip(settings, values))
+            for values in itertools.product(*[grid[s] for s in settings])]
+
+#-----------------------------------------------------------------------------#
+# configName: Returns the name of a combination of settings (see the header).
+#-----------------------------------------------------------------------------#
+def configName (config):
+    return ';'.join('%s=%s' % (s, config[s]) for s in settings)
+
+#-----------------------------------------------------------------------------#
+# statementWords: Returns the words of the raw statement original, cleaned in
+#   each of the ways in cleanings (a list of (replacements, stoplist,
+#   charsToKeep, stem) tuples), as StatementCleaner.tokens would, doing each
+#   step only once for the cleanings that share it (see the header).
+#-----------------------------------------------------------------------------#
+def statementWords (original, cleanings):
+    shared, words = {}, []
+    stem = getStemCache().stem
+    for replacements, stoplist, charsToKeep, doStem in cleanings:
+        cleaner = getCleaner(replacements, stoplist, charsToKeep, doStem)
+        if cleaner.stopwords is None:
+            # Word lists that StatementCleaner cannot compile
+            words.append(cleaner.tokens(original))
+            continue
+        keys = [charsToKeep, (tuple(replacements[0]),
+                              tuple(replacements[1])), tuple(stoplist)]
+        if (keys[0],) not in shared:
+            shared[(keys[0],)] = preprocessText(original, charsToKeep)
+        if tuple(keys[:2]) not in shared:
+            shared[tuple(keys[:2])] = cleaner.replace(shared[(keys[0],)])
+        if tuple(keys) not in shared:
+            shared[tuple(keys)] = ' '.join(cleaner.removeStopwords(
+                                      shared[tuple(keys[:2])])[0]).split()
+        tokens = shared[tuple(keys)]
+        if doStem == 1:
+            tokens = ' '.join([stem(w) for w in tokens]).split()
+        words.append(tokens)
+    return words
+
+#-----------------------------------------------------------------------------#
+# countStatement: Returns the word counts of the statement in locationold
+#   (read from its pack, which all of the processes share; see
+#   corpusStore.py), for each of the cleanings (see statementWords). This is
+#   what each process runs when the statements are cleaned in parallel.
+#-----------------------------------------------------------------------------#
+def countStatement (statement, locationold, cleanings):
+    original = loadCorpus(locationold).text(statement)
+    tdm      = TermDocumentArrays()
+    counts   = [tdm.count(' '.join(words))
+                for words in statementWords(original, cleanings)]
+    # Save any new stems (processes in a pool do not run exit handlers)
+    getStemCache().flush()
+    return counts
+
+#-----------------------------------------------------------------------------#
+# sweepPersistence: Returns the persistence of the statements whose word
+#   counts are in counts (one dictionary per statement, in order), for each
+#   (cutoff, weighting) in variants, as a list of arrays. This is what each
+#   process runs for one type of cleaning.
+#-----------------------------------------------------------------------------#
+def sweepPersistence (counts, variants):
+    tdm = TermDocumentArrays()
+    for wordCounts in counts:
+        tdm.add_counts(wordCounts)
+    results, cut = [], {}
+    for cutoff, weighting in variants:
+        if cutoff not in cut:
+            cut[cutoff] = tdm.to_csr(cutoff = cutoff)[0].T.astype(np.float64)
+        results.append(lagSimilarity(weigh(cut[cutoff], weighting), 1))
+    return results
+
+#-----------------------------------------------------------------------------#
+# sweep: Computes the persistence of the statements in locationold for each
+#   combination of settings in grid, with workers processes (see the header),
+#   and returns it as a pandas data frame, with one column per combination
+#   (see configName) and one row per statement (but the first).
+#-----------------------------------------------------------------------------#
+def sweep (grid = sweepGrid, locationold = statementdir, workers = workers):
+    configs  = gridConfigs(grid)
+    corpus   = loadCorpus(locationold)
+    statementList = corpus.names
+    # The types of cleaning, each with the (cutoff, weighting) variants of
+    # its tdm
+    cleanKeys, variants = [], {}
+    for config in configs:
+        key = (config['stoplist'], config['replacements'],
+               config['charsToKeep'], config['stem'])
+        if key not in variants:
+            cleanKeys.append(key)
+            variants[key] = []
+        variants[key].append((config['cutoff'], config['weighting']))
+    lists = {}
+    for name in set(k[0] for k in cleanKeys) | set(k[1] for k in cleanKeys):
+        lists[name] = join(datadir, name)
+    cleanings = [(getReplacementList(lists[replacements]),
+                  [line.rstrip('\n') for line in open(lists[stoplist], 'r')],
+                  charsToKeep, stem)
+                 for stoplist, replacements, charsToKeep, stem in cleanKeys]
+
+    pool = Pool(workers)
+    try:
+        with instrumentation.stage('clean', documents = len(statementList),
+                                   cleanings = len(cleanings)):
+            counts = pool.map(partial(countStatement,
+                                      locationold = locationold,
+                                      cleanings = cleanings),
+                              statementList,
+                              chunksize = max(1, len(statementList) //
+                                                 (4*(workers or
+                                                     os.cpu_count() or 1))))
+        with instrumentation.stage('persistence', configs = len(configs)):
+            results = pool.starmap(sweepPersistence,
+                                   [([c[k] for c in counts],
+                                     variants[cleanKeys[k]])
+                                    for k in range(len(cleanKeys))])
+    finally:
+        pool.close()
+        pool.join()
+
+    dates   = corpus.dates
+    columns = {}
+    for k in range(len(cleanKeys)):
+        for (cutoff, weighting), persistence in zip(variants[cleanKeys[k]],
+                                                    results[k]):
+            config = dict(zip(settings, cleanKeys[k] + (cutoff, weighting)))
+            columns[configName(config)] = persistence
+    return pd.DataFrame(columns, index = dates[1:],
+                        columns = [configName(c) for c in configs])
+
+#-----------------------------------------------------------------------------#
+# The main function runs the grid in sweepGrid and writes the results to
+#   sweepFile (see the header).
+#-----------------------------------------------------------------------------#
+def main():
+    persistenceAll = sweep(workers = int(sys.argv[1]) if len(sys.argv) > 1
+                                     else workers)
+    persistenceAll.to_csv(path_or_buf = sweepFile, index_label = "Date",
+                          float_format = '%1.2f')
+
+
+if __name__ == "__main__":
+    main()
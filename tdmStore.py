@@ -0,0 +1,167 @@
+# Filename:    tdmStore.py
+#
+# Description: This file stores term-document matrices (tdms) in a binary,
+#              memory-mappable format, and reads them back. It replaces the
+#              text triplets in tdm.sparse*.csv (and the word and document
+#              lists in tdm.words*.csv and tdm.docs*.csv) as the format read
+#              by persistence.py. Parsing the text files and sorting the
+#              words and documents took longer than the analysis itself;
+#              here, the sorting is done once, when the matrix is saved.
+#
+# Input:       A sparse (words x documents) tdm, the words associated with
+#              its rows, the documents associated with its columns and a
+#              dictionary describing how the matrix was made (the
+#              preprocessing configuration, the cutoff, etc.).
+#
+# Output:      A directory, output/tdm*/ (where * is the same suffix used for
+#              the csv files), containing:
+#                indptr.<g>.npy, indices.<g>.npy, data.<g>.npy: the
+#                  compressed sparse row (CSR) arrays of the tdm, with words
+#                  (rows) and documents (columns) sorted alphabetically;
+#                words.<g>.npy, docs.<g>.npy: the sorted words and document
+#                  names;
+#                meta.json: the shape, the number of nonzeros, the format
+#                  version, the dictionary passed in when saving, the
+#                  generation <g> of the arrays and an id that is new each
+#                  time the tdm is saved (which tells a reader that has kept
+#                  the tdm whether it is still current).
+#              Each time the tdm is saved, its arrays are written as a new
+#              generation, and meta.json, which points to them, is replaced
+#              last, so a process that reads the tdm meanwhile gets either
+#              the old arrays or the new ones, never a mix. The older
+#              generations are then deleted.
+#              Each .npy file is a plain array, so loadTDM maps it into
+#              memory rather than reading it; several processes that load
+#              the same matrix share one copy in the operating system's page
+#              cache.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import os, json, uuid, glob
+import numpy as np
+from   scipy.sparse import csr_matrix
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# Version of the on-disk format, stored in meta.json
+formatVersion = 2
+# Arrays that make up a stored tdm
+arrayNames    = ['indptr', 'indices', 'data', 'words', 'docs']
+
+#-----------------------------------------------------------------------------#
+# tdmPath: Returns the directory in which the tdm with suffix fname (e.g. ''
+#   or '.np', as in cleanStatements.py) is stored, under the directory outdir.
+#-----------------------------------------------------------------------------#
+def tdmPath (outdir, fname):
+    return os.path.join(outdir, 'tdm' + fname)
+
+#-----------------------------------------------------------------------------#
+# arrayPath: Returns the file of the array called name, of generation
+#   generation, of the tdm stored in the directory path.
+#-----------------------------------------------------------------------------#
+def arrayPath (path, name, generation):
+    return os.path.join(path, '%s.%d.npy' % (name, generation))
+
+#-----------------------------------------------------------------------------#
+# sortTDM: Sorts the rows of a (words x documents) sparse matrix, TDM,
+#   alphabetically by word, and its columns alphabetically by document name
+#   (which is chronological for the FOMC statements). Returns the sorted
+#   matrix (CSR, with sorted indices), words and docs as numpy arrays.
+#-----------------------------------------------------------------------------#
+def sortTDM (TDM, words, docs):
+    words = np.array(words, dtype = str)
+    docs  = np.array(docs,  dtype = str)
+    wsort = np.argsort(words, kind = 'stable')
+    dsort = np.argsort(docs,  kind = 'stable')
+    TDM   = csr_matrix(TDM)[wsort,:][:,dsort].tocsr()
+    TDM.sum_duplicates()
+    TDM.sort_indices()
+    return TDM, words[wsort], docs[dsort]
+
+#-----------------------------------------------------------------------------#
+# saveTDM: Writes the tdm to the directory path (see tdmPath). TDM is a
+#   (words x documents) sparse matrix, words and docs are lists with the words
+#   and document names associated with its rows and columns, and meta is a
+#   dictionary (which must be JSON-serializable) describing how the tdm was
+#   made. The arrays are written as a new generation and meta.json is
+#   replaced last (see the header), so a process that is reading the
+#   previous version never sees a partial or mixed tdm.
+#-----------------------------------------------------------------------------#
+def saveTDM (TDM, words, docs, path, meta = None):
+    TDM, words, docs = sortTDM(TDM, words, docs)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    # The generation after the one in use (0 for a new tdm, or one stored in
+    # an older format)
+    generation = 0
+    metaFile   = os.path.join(path, 'meta.json')
+    if os.path.isfile(metaFile):
+        with open(metaFile, 'r') as f:
+            generation = json.load(f).get('generation', -1) + 1
+
+    arrays = {'indptr' : TDM.indptr,
+              'indices': TDM.indices,
+              'data'   : TDM.data,
+              'words'  : words,
+              'docs'   : docs}
+    for name in arrayNames:
+        with open(arrayPath(path, name, generation), 'wb') as f:
+            np.save(f, np.ascontiguousarray(arrays[name]))
+            f.flush()
+            os.fsync(f.fileno())
+
+    info = {'version'   : formatVersion,
+            'shape'     : list(TDM.shape),
+            'nnz'       : int(TDM.nnz),
+            'generation': generation,
+            'saved'     : uuid.uuid4().hex,
+            'meta'      : meta if meta is not None else {}}
+    tmp = os.path.join(path, 'meta.tmp.json')
+    with open(tmp, 'w') as f:
+        json.dump(info, f, indent = 1, sort_keys = True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, metaFile)
+
+    # Delete the arrays of the older generations (a process that has them
+    # open keeps them until it closes them)
+    current = set(arrayPath(path, name, generation) for name in arrayNames)
+    for name in arrayNames:
+        for old in glob.glob(os.path.join(path, name + '.*npy')):
+            if old not in current:
+                os.remove(old)
+
+#-----------------------------------------------------------------------------#
+# loadTDM: Reads the tdm stored in the directory path (see tdmPath). If mmap
+#   is True (the default), the arrays are mapped into memory read-only, and
+#   nothing is copied until it is used. Returns four things: the tdm as a
+#   (words x documents) scipy CSR matrix, the sorted words and documents (as
+#   numpy arrays) and the dictionary that was passed to saveTDM as meta.
+#   The arrays are those of the generation named in meta.json; if the tdm is
+#   saved again (and they are deleted) before they are all opened, meta.json
+#   is read again.
+#-----------------------------------------------------------------------------#
+def loadTDM (path, mmap = True):
+    mode, tried = 'r' if mmap else None, None
+    while True:
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            info = json.load(f)
+        if info['version'] != formatVersion:
+            raise ValueError('Unsupported tdm format version %s in %s'
+                             % (info['version'], path))
+        try:
+            arrays = dict((name, np.load(arrayPath(path, name,
+                                                   info['generation']),
+                                         mmap_mode = mode))
+                          for name in arrayNames)
+            break
+        except FileNotFoundError:
+            # Only if a newer generation has been saved since
+            if info['generation'] == tried:
+                raise
+            tried = info['generation']
+    TDM = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                     shape = tuple(info['shape']), copy = False)
+    return TDM, arrays['words'], arrays['docs'], info['meta']
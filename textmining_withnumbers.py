@@ -1,88 +1,759 @@
-# This is taken from the textmining package, which is described
-# at http://www.christianpeccei.com/textmining/, extended to
-# not discard numeric characters. 
-import re, csv, os
-
-def simple_tokenize(document):
-    """
-    Clean up a document and split into a list of words.
-
-    Converts document (a string) to lowercase and strips out everything which
-    is not a lowercase letter.
-
-    """
-    document = document.lower()
-    document = re.sub('[^a-z0-9]', ' ', document)
-    return document.strip().split()
-
-
-class TermDocumentMatrix(object):
-
-    """
-    Class to efficiently create a term-document matrix.
-
-    The only initialization parameter is a tokenizer function, which should
-    take in a single string representing a document and return a list of
-    strings representing the tokens in the document. If the tokenizer
-    parameter is omitted it defaults to using textmining.simple_tokenize
-
-    Use the add_doc method to add a document (document is a string). Use the
-    write_csv method to output the current term-document matrix to a csv
-    file. You can use the rows method to return the rows of the matrix if
-    you wish to access the individual elements without writing directly to a
-    file.
-
-    """
-
-    def __init__(self, tokenizer=simple_tokenize):
-        """Initialize with tokenizer to split documents into words."""
-        # Set tokenizer to use for tokenizing new documents
-        self.tokenize = tokenizer
-        # The term document matrix is a sparse matrix represented as a
-        # list of dictionaries. Each dictionary contains the word
-        # counts for a document.
-        self.sparse = []
-        # Keep track of the number of documents containing the word.
-        self.doc_count = {}
-
-    def add_doc(self, document):
-        """Add document to the term-document matrix."""
-        # Split document up into list of strings
-        words = self.tokenize(document)
-        # Count word frequencies in this document
-        word_counts = {}
-        for word in words:
-            word_counts[word] = word_counts.get(word, 0) + 1
-        # Add word counts as new row to sparse matrix
-        self.sparse.append(word_counts)
-        # Add to total document count for each word
-        for word in word_counts:
-            self.doc_count[word] = self.doc_count.get(word, 0) + 1
-
-    def rows(self, cutoff=2):
-        """Helper function that returns rows of term-document matrix."""
-        # Get master list of words that meet or exceed the cutoff frequency
-        words = [word for word in self.doc_count \
-          if self.doc_count[word] >= cutoff]
-        # Return header
-        yield words
-        # Loop over rows
-        for row in self.sparse:
-            # Get word counts for all words in master list. If a word does
-            # not appear in this document it gets a count of 0.
-            data = [row.get(word, 0) for word in words]
-            yield data
-
-    def write_csv(self, filename, cutoff=2):
-        """
-        Write term-document matrix to a CSV file.
-
-        filename is the name of the output file (e.g. 'mymatrix.csv').
-        cutoff is an integer that specifies only words which appear in
-        'cutoff' or more documents should be written out as columns in
-        the matrix.
-
-        """
-        f = csv.writer(open(filename, 'wb'))
-        for row in self.rows(cutoff=cutoff):
-            f.writerow(row)
+# This is taken from the textmining package, which is described
+# at http://www.christianpeccei.com/textmining/, extended to
+# not discard numeric characters. TermDocumentArrays and
+# HashedTermDocumentArrays, at the bottom, were added to build large matrices
+# in compact arrays, and in a fixed amount of memory, LossyCounter,
+# CollocationFinder and phrase_tokenizer to count phrases (collocations) as
+# single terms, and TokenStream to keep a tokenized corpus as integer ids.
+import re, csv, os, json, math, zlib
+from array import array
+from collections import Counter
+import numpy as np
+from scipy.sparse import csr_matrix
+
+def simple_tokenize(document):
+    """
+    Clean up a document and split into a list of words.
+
+    Converts document (a string) to lowercase and strips out everything which
+    is not a lowercase letter.
+
+    """
+    document = document.lower()
+    document = re.sub('[^a-z0-9]', ' ', document)
+    return document.strip().split()
+
+
+class TermDocumentMatrix(object):
+
+    """
+    Class to efficiently create a term-document matrix.
+
+    The only initialization parameter is a tokenizer function, which should
+    take in a single string representing a document and return a list of
+    strings representing the tokens in the document. If the tokenizer
+    parameter is omitted it defaults to using textmining.simple_tokenize
+
+    Use the add_doc method to add a document (document is a string). Use the
+    write_csv method to output the current term-document matrix to a csv
+    file. You can use the rows method to return the rows of the matrix if
+    you wish to access the individual elements without writing directly to a
+    file.
+
+    """
+
+    def __init__(self, tokenizer=simple_tokenize):
+        """Initialize with tokenizer to split documents into words."""
+        # Set tokenizer to use for tokenizing new documents
+        self.tokenize = tokenizer
+        # The term document matrix is a sparse matrix represented as a
+        # list of dictionaries. Each dictionary contains the word
+        # counts for a document.
+        self.sparse = []
+        # Keep track of the number of documents containing the word.
+        self.doc_count = {}
+
+    def count(self, document):
+        """
+        Return the word counts of document, without adding it.
+
+        The counts are a dictionary whose keys are in the order the words
+        first appear in the document. They can be computed in another
+        process, and added with add_counts.
+
+        """
+        # Split document up into list of strings
+        words = self.tokenize(document)
+        # Count word frequencies in this document (Counter keeps the words
+        # in the order they are first seen)
+        return dict(Counter(words))
+
+    def add_doc(self, document):
+        """Add document to the term-document matrix."""
+        self.add_counts(self.count(document))
+
+    def add_counts(self, word_counts):
+        """Add a document, given its word counts (see count)."""
+        # Add word counts as new row to sparse matrix
+        self.sparse.append(word_counts)
+        # Add to total document count for each word
+        for word in word_counts:
+            self.doc_count[word] = self.doc_count.get(word, 0) + 1
+
+    def save_state(self, filename, docs=None):
+        """
+        Save the state of the term-document matrix to a JSON file.
+
+        The state is the word counts of each document, the number of
+        documents containing each word (in the order the words were first
+        seen, which is the order of the columns returned by rows) and docs,
+        an optional list with one entry per document describing it (e.g. its
+        file name), so that a caller can tell which documents have already
+        been added. Reload it with load_state and keep calling add_doc.
+
+        """
+        if docs is not None and len(docs) != len(self.sparse):
+            raise ValueError('docs must have one entry per document')
+        state = {'sparse': self.sparse,
+                 'doc_count': self.doc_count,
+                 'docs': docs}
+        tmp = filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load_state(cls, filename, tokenizer=simple_tokenize):
+        """
+        Load a term-document matrix saved with save_state.
+
+        Returns the matrix and the list of document descriptions that was
+        passed to save_state (None if none was passed). Documents added to
+        the loaded matrix give exactly the same result as adding all of the
+        documents to a new one.
+
+        """
+        with open(filename, 'r') as f:
+            state = json.load(f)
+        tdm = cls(tokenizer)
+        tdm.sparse = state['sparse']
+        tdm.doc_count = state['doc_count']
+        return tdm, state['docs']
+
+    def rows(self, cutoff=2):
+        """Helper function that returns rows of term-document matrix."""
+        # Get master list of words that meet or exceed the cutoff frequency
+        words = [word for word in self.doc_count \
+          if self.doc_count[word] >= cutoff]
+        # Return header
+        yield words
+        # Loop over rows
+        for row in self.sparse:
+            # Get word counts for all words in master list. If a word does
+            # not appear in this document it gets a count of 0.
+            data = [row.get(word, 0) for word in words]
+            yield data
+
+    def write_csv(self, filename, cutoff=2):
+        """
+        Write term-document matrix to a CSV file.
+
+        filename is the name of the output file (e.g. 'mymatrix.csv').
+        cutoff is an integer that specifies only words which appear in
+        'cutoff' or more documents should be written out as columns in
+        the matrix.
+
+        """
+        f = csv.writer(open(filename, 'wb'))
+        for row in self.rows(cutoff=cutoff):
+            f.writerow(row)
+
+
+class TermDocumentArrays(object):
+
+    """
+    Term-document matrix kept in compact arrays rather than dictionaries.
+
+    It has the same methods as TermDocumentMatrix for adding documents and
+    saving and loading its state, and gives the same matrix, but each word
+    is given an integer id (in the order the words are first seen), and the
+    documents are stored as three typed arrays in compressed sparse row
+    form: for each document, the ids of its words and their counts. Memory
+    grows with the number of nonzero counts, rather than the number of words
+    times the number of documents. Use to_csr to get the matrix, with the
+    words that meet the cutoff, as a scipy sparse matrix.
+
+    """
+
+    count = TermDocumentMatrix.count
+    # Number of hashed features (see HashedTermDocumentArrays)
+    features = None
+
+    def __init__(self, tokenizer=simple_tokenize):
+        """Initialize with tokenizer to split documents into words."""
+        self.tokenize = tokenizer
+        # Word ids, and the words in the order of their ids
+        self.vocabulary = {}
+        self.words = []
+        # Document d has the words indices[indptr[d]:indptr[d+1]], with
+        # counts counts[indptr[d]:indptr[d+1]]
+        self.indptr = array('q', [0])
+        self.indices = array('i')
+        self.counts = array('i')
+
+    def add_doc(self, document):
+        """Add document to the term-document matrix."""
+        self.add_counts(self.count(document))
+
+    def add_counts(self, word_counts):
+        """Add a document, given its word counts (see count)."""
+        vocabulary = self.vocabulary
+        ids = [vocabulary.get(word, -1) for word in word_counts]
+        if -1 in ids:
+            for k, word in enumerate(word_counts):
+                if ids[k] == -1:
+                    ids[k] = vocabulary.setdefault(word, len(self.words))
+                    if ids[k] == len(self.words):
+                        self.words.append(word)
+        self.indices.extend(ids)
+        self.counts.extend(word_counts.values())
+        self.indptr.append(len(self.indices))
+
+    def __len__(self):
+        """Number of documents."""
+        return len(self.indptr) - 1
+
+    def to_csr(self, cutoff=2):
+        """
+        Return the (documents x words) matrix as a scipy CSR matrix.
+
+        Only the words which appear in 'cutoff' or more documents are kept,
+        in the order they were first seen (the order of TermDocumentMatrix's
+        rows). Returns the matrix, whose integer counts have sorted column
+        indices in each row, and the list of kept words.
+
+        """
+        ndocs = len(self)
+        indices = np.array(self.indices, dtype=np.int64)
+        # Number of documents containing each word (a word appears once in
+        # each document's list)
+        doc_count = np.bincount(indices, minlength=len(self.words))
+        keep = doc_count >= cutoff
+        # New id of each word, -1 for the words that are dropped
+        remap = np.full(len(self.words), -1, dtype=np.int64)
+        remap[keep] = np.arange(int(keep.sum()))
+        indices = remap[indices]
+        counts = np.array(self.counts, dtype=np.int64)
+        indptr = np.array(self.indptr, dtype=np.int64)
+        kept = indices >= 0
+        # Number of kept words in each document
+        rows = np.repeat(np.arange(ndocs), np.diff(indptr))
+        sizes = np.bincount(rows[kept], minlength=ndocs)
+        indptr = np.concatenate([[0], np.cumsum(sizes)])
+        matrix = csr_matrix((counts[kept], indices[kept], indptr),
+                            shape=(ndocs, int(keep.sum())))
+        matrix.sort_indices()
+        words = [self.words[i] for i in np.flatnonzero(keep)]
+        return matrix, words
+
+    def save_state(self, filename, docs=None):
+        """Save the state to a JSON file (see TermDocumentMatrix)."""
+        if docs is not None and len(docs) != len(self):
+            raise ValueError('docs must have one entry per document')
+        state = {'words': self.words,
+                 'indptr': self.indptr.tolist(),
+                 'indices': self.indices.tolist(),
+                 'counts': self.counts.tolist(),
+                 'docs': docs}
+        tmp = filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load_state(cls, filename, tokenizer=simple_tokenize):
+        """
+        Load a term-document matrix saved with save_state.
+
+        States saved by TermDocumentMatrix are read too. Returns the matrix
+        and the list of document descriptions (see TermDocumentMatrix). If
+        the state was saved by HashedTermDocumentArrays, the matrix is empty
+        and its features attribute is not None.
+
+        """
+        with open(filename, 'r') as f:
+            state = json.load(f)
+        tdm = cls(tokenizer)
+        if 'sparse' in state:
+            for word_counts in state['sparse']:
+                tdm.add_counts(word_counts)
+            return tdm, state['docs']
+        # A state saved by HashedTermDocumentArrays cannot be read here;
+        # features tells the caller
+        if state.get('features') is not None:
+            tdm.features = state['features']
+            return tdm, state.get('docs')
+        tdm.words = state['words']
+        tdm.vocabulary = dict((word, i) for i, word in enumerate(tdm.words))
+        tdm.indptr = array('q', state['indptr'])
+        tdm.indices = array('i', state['indices'])
+        tdm.counts = array('i', state['counts'])
+        return tdm, state['docs']
+
+
+class HashedTermDocumentArrays(TermDocumentArrays):
+
+    """
+    Term-document matrix over a fixed number of hashed features.
+
+    Instead of giving each word its own id (and keeping a vocabulary that
+    grows without bound), each word is mapped by a hash (CRC-32) to one of
+    'features' columns, and its count is added with a sign (+1 or -1) also
+    taken from the hash. Words that share a column then tend to cancel out
+    rather than add up, so inner products, and the cosine similarities
+    computed from them, are unbiased estimates of those of the exact
+    matrix; their error has a standard deviation of about
+    sqrt((1 + cos^2)/features) (Weinberger et al., 2009, "Feature hashing
+    for large scale multitask learning"). Counts can therefore be negative.
+
+    Only the 'track' most frequent words (approximately: the table of
+    counts is cut down to the top 'track' words whenever it reaches twice
+    that size) are remembered, to label the columns: a column is named
+    after the most frequent remembered word that maps to it, or '#n' for
+    column n if there is none. Use feature to find the column of a word,
+    and feature_words for the remembered words of a column.
+
+    """
+
+    def __init__(self, features=2**18, tokenizer=simple_tokenize,
+                 track=10000):
+        """Initialize with the number of features (at most 2**30)."""
+        TermDocumentArrays.__init__(self, tokenizer)
+        if not 0 < features <= 2**30:
+            raise ValueError('features must be between 1 and 2**30')
+        self.features = features
+        self.track = track
+        # Approximate total counts of the most frequent words
+        self.top = {}
+
+    def feature(self, word):
+        """Return the column of word and its sign (+1 or -1)."""
+        h = zlib.crc32(word.encode('utf-8'))
+        return h % self.features, 1 - 2*(h >> 31)
+
+    def feature_words(self, feature):
+        """Return the remembered words of a column, most frequent first."""
+        words = [word for word in self.top
+                 if self.feature(word)[0] == feature]
+        return sorted(words, key=lambda word: -self.top[word])
+
+    def add_counts(self, word_counts):
+        """Add a document, given its word counts (see count)."""
+        values = {}
+        for word, n in word_counts.items():
+            column, sign = self.feature(word)
+            values[column] = values.get(column, 0) + sign*n
+        self.indices.extend(values.keys())
+        self.counts.extend(values.values())
+        self.indptr.append(len(self.indices))
+
+        top = self.top
+        for word, n in word_counts.items():
+            top[word] = top.get(word, 0) + n
+        if len(top) >= 2*self.track:
+            kept = sorted(top, key=lambda word: -top[word])[:self.track]
+            self.top = dict((word, top[word]) for word in kept)
+
+    def labels(self, columns=None):
+        """
+        Return the name of each of columns (a list of column numbers; all
+        of them by default), as in the class description.
+
+        """
+        if columns is None:
+            columns = range(self.features)
+        names = {}
+        for word in sorted(self.top, key=lambda word: self.top[word]):
+            names[self.feature(word)[0]] = word
+        return [names.get(n, '#%d' % n) for n in columns]
+
+    def to_csr(self, cutoff=2):
+        """
+        Return the (documents x features) matrix as a scipy CSR matrix.
+
+        Only the columns which are nonzero in 'cutoff' or more documents
+        are kept, in order. Returns the matrix and the names of the kept
+        columns (see labels).
+
+        """
+        ndocs = len(self)
+        indptr = np.array(self.indptr, dtype=np.int64)
+        matrix = csr_matrix((np.array(self.counts, dtype=np.int64),
+                             np.array(self.indices, dtype=np.int64), indptr),
+                            shape=(ndocs, self.features))
+        matrix.eliminate_zeros()
+        doc_count = np.bincount(matrix.indices, minlength=self.features)
+        keep = np.flatnonzero(doc_count >= max(cutoff, 1))
+        matrix = matrix[:, keep].tocsr()
+        matrix.sort_indices()
+        return matrix, self.labels(keep.tolist())
+
+    def save_state(self, filename, docs=None):
+        """Save the state to a JSON file (see TermDocumentMatrix)."""
+        if docs is not None and len(docs) != len(self):
+            raise ValueError('docs must have one entry per document')
+        state = {'features': self.features,
+                 'track': self.track,
+                 'top': self.top,
+                 'indptr': self.indptr.tolist(),
+                 'indices': self.indices.tolist(),
+                 'counts': self.counts.tolist(),
+                 'docs': docs}
+        tmp = filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load_state(cls, filename, tokenizer=simple_tokenize):
+        """
+        Load a matrix saved with save_state.
+
+        Returns the matrix and the list of document descriptions. If the
+        state was not saved by this class, the matrix is empty and its
+        features attribute is None.
+
+        """
+        with open(filename, 'r') as f:
+            state = json.load(f)
+        if state.get('features') is None:
+            tdm = cls(tokenizer=tokenizer)
+            tdm.features = None
+            return tdm, state.get('docs')
+        tdm = cls(state['features'], tokenizer, state['track'])
+        tdm.top = state['top']
+        tdm.indptr = array('q', state['indptr'])
+        tdm.indices = array('i', state['indices'])
+        tdm.counts = array('i', state['counts'])
+        return tdm, state['docs']
+
+
+class LossyCounter(object):
+
+    """
+    Approximate counts of the frequent items of a stream, in bounded memory.
+
+    This is lossy counting (Manku and Motwani, 2002, "Approximate frequency
+    counts over data streams"). The stream is split into buckets of
+    1/epsilon items; at the end of each bucket, the items whose count could
+    not be more than the number of buckets so far are dropped. After n
+    items, every item seen more than epsilon*n times is kept, its count is
+    at most epsilon*n too low, and about (1/epsilon)*log(epsilon*n) items
+    are kept at most. Items are added a document at a time with update.
+
+    """
+
+    def __init__(self, epsilon=1e-5):
+        """Initialize with the largest error, as a share of the items."""
+        self.width = int(math.ceil(1.0/epsilon))
+        # Number of items added, and the current bucket
+        self.n = 0
+        self.bucket = 1
+        # Counts, and the most each item may have been undercounted by
+        self.counts = {}
+        self.errors = {}
+
+    def update(self, item_counts):
+        """Add the items counted in item_counts (a dictionary)."""
+        counts, errors = self.counts, self.errors
+        for item, n in item_counts.items():
+            if item in counts:
+                counts[item] += n
+            else:
+                counts[item] = n
+                errors[item] = self.bucket - 1
+        self.n += sum(item_counts.values())
+        if self.n >= self.bucket*self.width:
+            self.bucket = self.n//self.width + 1
+            dropped = [item for item in counts
+                       if counts[item] + errors[item] < self.bucket]
+            for item in dropped:
+                del counts[item], errors[item]
+
+    def __getitem__(self, item):
+        """Return the count of item (0 if it is not kept)."""
+        return self.counts.get(item, 0)
+
+    def __len__(self):
+        """Return the number of items kept."""
+        return len(self.counts)
+
+
+class CollocationFinder(object):
+
+    """
+    Find the phrases (collocations) of a corpus: words that go together.
+
+    Every bigram and trigram (two or three consecutive words) of each
+    document added is counted in a LossyCounter, so memory stays bounded
+    however many distinct ones there are; single words are counted exactly.
+    select then scores the phrases seen at least min_count times, either by
+    pointwise mutual information (PMI), log(p(ab)/(p(a)p(b))), which favours
+    rare words that always appear together, or by the log-likelihood ratio
+    (LLR) of Dunning (1993, "Accurate methods for the statistics of surprise
+    and coincidence"), which favours frequent phrases. A trigram abc is
+    scored as the bigram of the phrase ab and the word c.
+
+    """
+
+    def __init__(self, tokenizer=simple_tokenize, epsilon=1e-5, max_n=3):
+        """Initialize with tokenizer, the error of the counts and the
+        longest phrases to count (2 or 3)."""
+        self.tokenize = tokenizer
+        self.max_n = max_n
+        self.words = Counter()
+        # Number of words added (the sum of the counts in words)
+        self.total = 0
+        self.ngrams = dict((n, LossyCounter(epsilon))
+                           for n in range(2, max_n + 1))
+
+    def add_doc(self, document):
+        """Add the phrases of document."""
+        self.add_words(self.tokenize(document))
+
+    def add_words(self, words):
+        """Add the phrases of a document, given its list of words."""
+        self.words.update(words)
+        self.total += len(words)
+        for n in self.ngrams:
+            self.ngrams[n].update(Counter(
+                ' '.join(words[i:i + n]) for i in range(len(words) - n + 1)))
+
+    def score(self, phrase, method='llr'):
+        """Return the score of phrase (words separated by spaces)."""
+        *first, last = phrase.split(' ')
+        if len(first) == 1:
+            n_ab, n_a = self.ngrams[2][phrase], self.words[first[0]]
+        else:
+            n_ab = self.ngrams[len(first) + 1][phrase]
+            n_a = self.ngrams[len(first)][' '.join(first)]
+        n_b, total = self.words[last], self.total
+        if not n_ab or not n_a or not n_b:
+            return float('-inf')
+        if method == 'pmi':
+            return math.log(float(n_ab)*total/(n_a*n_b))
+        if method != 'llr':
+            raise ValueError('method must be pmi or llr')
+        # Counts of the 2x2 table: phrase ab, a without b, b without a,
+        # neither (the counts of the phrases may be slightly low, so the
+        # table is kept positive)
+        table = [n_ab, max(n_a - n_ab, 0), max(n_b - n_ab, 0),
+                 max(total - n_a - n_b + n_ab, 0)]
+        rows = [table[0] + table[1], table[2] + table[3]]
+        cols = [table[0] + table[2], table[1] + table[3]]
+        llr = 0.0
+        for k, (i, j) in zip(table, [(0, 0), (0, 1), (1, 0), (1, 1)]):
+            if k:
+                llr += k*math.log(float(k)*total/(rows[i]*cols[j]))
+        # Only phrases that appear more often than chance are collocations
+        return 2*llr if n_ab*total > n_a*n_b else -2*llr
+
+    def select(self, method='llr', top=None, min_score=None, min_count=5):
+        """
+        Return the best phrases, best first.
+
+        The phrases are those counted at least min_count times whose score
+        (see score) is at least min_score (if given); only the best 'top'
+        are returned (if given).
+
+        """
+        scores = {}
+        for counter in self.ngrams.values():
+            for phrase, n in counter.counts.items():
+                if n >= min_count:
+                    scores[phrase] = self.score(phrase, method)
+        phrases = sorted((phrase for phrase in scores
+                          if min_score is None or scores[phrase] >= min_score),
+                         key=lambda phrase: (-scores[phrase], phrase))
+        return phrases[:top] if top is not None else phrases
+
+
+def phrase_tokenizer(phrases, tokenizer=simple_tokenize, join='_'):
+    """
+    Return a tokenizer that counts phrases as single words.
+
+    phrases is a list of phrases (words separated by spaces, e.g. from
+    CollocationFinder.select). The tokenizer splits a document into words
+    with tokenizer, then replaces every phrase with one word, its words
+    joined by join ('federal funds rate' becomes 'federal_funds_rate'),
+    going from left to right and trying the longest phrases first.
+
+    """
+    by_first = {}
+    for phrase in sorted(set(phrases)):
+        words = phrase.split(' ')
+        by_first.setdefault(words[0], []).append(words)
+    for candidates in by_first.values():
+        candidates.sort(key=lambda words: -len(words))
+
+    def tokenize(document):
+        words = tokenizer(document)
+        tokens, i = [], 0
+        while i < len(words):
+            for candidate in by_first.get(words[i], ()):
+                if words[i:i + len(candidate)] == candidate:
+                    tokens.append(join.join(candidate))
+                    i += len(candidate)
+                    break
+            else:
+                tokens.append(words[i])
+                i += 1
+        return tokens
+    return tokenize
+
+
+class TokenStream(object):
+
+    """
+    Documents kept as one stream of integer word ids.
+
+    Each word is given an id (in the order the words are first seen), and
+    the documents are stored back to back as a single int32 array of the ids
+    of their words, in order, with the position where each document starts
+    (4 bytes per word, whatever the length of the words). Once a corpus has
+    been tokenized, everything else is done with array operations on the
+    ids rather than on strings: finding phrases (phrase_matches), replacing
+    them by single words (merge_phrases) and building the term-document
+    matrix (to_csr, the same matrix as TermDocumentArrays gives for the same
+    documents).
+
+    """
+
+    def __init__(self, tokenizer=simple_tokenize):
+        """Initialize with tokenizer to split documents into words."""
+        self.tokenize = tokenizer
+        # Word ids, and the words in the order of their ids
+        self.vocabulary = {}
+        self.words = []
+        # Document d has the words tokens[offsets[d]:offsets[d+1]]
+        self.tokens = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, tokens, offsets, words, tokenizer=simple_tokenize):
+        """Return a stream with the given ids, offsets and words."""
+        stream = cls(tokenizer)
+        stream.tokens = tokens
+        stream.offsets = offsets
+        stream.words = list(words)
+        stream.vocabulary = dict((word, i) for i, word in
+                                 enumerate(stream.words))
+        return stream
+
+    def add_docs(self, documents):
+        """Add documents (a list of strings) to the end of the stream."""
+        vocabulary, words = self.vocabulary, self.words
+        ids, sizes = [], []
+        for document in documents:
+            tokens = self.tokenize(document)
+            for word in tokens:
+                if word not in vocabulary:
+                    vocabulary[word] = len(words)
+                    words.append(word)
+            ids.extend(vocabulary[word] for word in tokens)
+            sizes.append(len(tokens))
+        self.tokens = np.concatenate([self.tokens,
+                                      np.array(ids, dtype=np.int32)])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] +
+                                       np.cumsum(sizes, dtype=np.int64)])
+
+    def add_doc(self, document):
+        """Add document to the end of the stream."""
+        self.add_docs([document])
+
+    def __len__(self):
+        """Number of documents."""
+        return len(self.offsets) - 1
+
+    def document_ids(self):
+        """Return the document of each word of the stream."""
+        return np.repeat(np.arange(len(self), dtype=np.int32),
+                         np.diff(self.offsets))
+
+    def renumbered(self, tokens, offsets, words):
+        """
+        Return a stream of tokens (ids of words) and offsets, with the words
+        given new ids in the order they are first seen, and the words that do
+        not appear dropped, as if the documents had been added one by one.
+
+        """
+        seen, first = np.unique(tokens, return_index=True)
+        order = seen[np.argsort(first, kind='stable')]
+        remap = np.zeros(len(words), dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        return TokenStream.from_arrays(remap[tokens], offsets,
+                                       [words[i] for i in order],
+                                       self.tokenize)
+
+    def phrase_matches(self, words):
+        """
+        Return the positions in the stream where the phrase words (a list)
+        starts, within a document, including overlapping ones.
+
+        """
+        if any(word not in self.vocabulary for word in words):
+            return np.zeros(0, dtype=np.int64)
+        n = len(words)
+        ids = [self.vocabulary[word] for word in words]
+        starts = np.flatnonzero(self.tokens[:max(len(self.tokens) - n + 1,
+                                                 0)] == ids[0])
+        for k in range(1, n):
+            starts = starts[self.tokens[starts + k] == ids[k]]
+        # Not across two documents: the document of the last word starts
+        # before the first
+        last = np.searchsorted(self.offsets, starts + n - 1, side='right')
+        return starts[self.offsets[last - 1] <= starts]
+
+    def merge_phrases(self, phrases, join='_'):
+        """
+        Return a stream in which every phrase (words separated by spaces) is
+        one word, its words joined by join, as phrase_tokenizer would split
+        the documents: from left to right, trying the longest phrases first.
+
+        """
+        # The longest phrase starting at each position
+        length = np.zeros(len(self.tokens), dtype=np.int64)
+        which = np.zeros(len(self.tokens), dtype=np.int64)
+        phrases = sorted(set(phrases))
+        for q, phrase in enumerate(phrases):
+            words = phrase.split(' ')
+            starts = self.phrase_matches(words)
+            longer = len(words) > length[starts]
+            length[starts[longer]] = len(words)
+            which[starts[longer]] = q
+        # Phrases that start inside an earlier one are not replaced
+        kept, free = [], -1
+        for start in np.flatnonzero(length).tolist():
+            if start >= free:
+                kept.append(start)
+                free = start + length[start]
+        kept = np.array(kept, dtype=np.int64)
+        # Each phrase becomes its first word, with a new id, and its other
+        # words are dropped
+        tokens = self.tokens.astype(np.int32)
+        words = list(self.words)
+        joined = [join.join(phrase.split(' ')) for phrase in phrases]
+        phrase_id = np.arange(len(words), len(words) + len(phrases),
+                              dtype=np.int32)
+        words.extend(joined)
+        tokens[kept] = phrase_id[which[kept]]
+        keep = np.ones(len(tokens), dtype=bool)
+        if len(kept):
+            covered = np.zeros(len(tokens) + 1, dtype=np.int64)
+            np.add.at(covered, kept + 1, 1)
+            np.add.at(covered, kept + length[kept], -1)
+            keep = np.cumsum(covered)[:-1] == 0
+        sizes = np.bincount(self.document_ids()[keep], minlength=len(self))
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        return self.renumbered(tokens[keep], offsets, words)
+
+    def to_csr(self, cutoff=2):
+        """
+        Return the (documents x words) matrix as a scipy CSR matrix.
+
+        Only the words which appear in 'cutoff' or more documents are kept,
+        in the order they were first seen, as in TermDocumentArrays.to_csr.
+        The counts are summed in a single pass over the stream.
+
+        """
+        ndocs, nwords = len(self), len(self.words)
+        matrix = csr_matrix((np.ones(len(self.tokens), dtype=np.int64),
+                             (self.document_ids(), self.tokens)),
+                            shape=(ndocs, nwords))
+        matrix.sum_duplicates()
+        # Number of documents containing each word
+        doc_count = np.bincount(matrix.indices, minlength=nwords)
+        keep = np.flatnonzero(doc_count >= cutoff)
+        matrix = matrix[:, keep].tocsr()
+        matrix.sort_indices()
+        return matrix, [self.words[i] for i in keep]
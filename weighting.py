@@ -0,0 +1,192 @@
+# Filename:    weighting.py
+#
+# Description: This file weights the counts of term-document matrices (tdms)
+#              before similarities are computed. Each weighting scheme has a
+#              name, and schemes are composed by joining their names with
+#              '+', applied from left to right (e.g. 'sublinear+idf+l2'):
+#                raw:       the counts, unchanged;
+#                idf:       each word multiplied by its inverse document
+#                           frequency, log(D/n), where D is the number of
+#                           documents and n the number in which the word
+#                           occurs (TF-IDF, as in Acosta and Meade (2015));
+#                sublinear: each count c replaced by 1 + log(c);
+#                bm25:      each count c replaced by the BM25 weight
+#                           c(k1 + 1)/(c + k1(1 - b + b L/A)) times
+#                           log(1 + (D - n + 0.5)/(n + 0.5)), where L is the
+#                           length (number of words) of the document and A
+#                           the average length (Robertson and Zaragoza, 2009,
+#                           "The probabilistic relevance framework: BM25 and
+#                           beyond");
+#                l2:        each document scaled to unit length.
+#              Every scheme works on the sparse matrix, by scaling its rows
+#              or columns (a product with a sparse diagonal matrix) or by
+#              transforming its nonzeros, so memory grows with the number of
+#              nonzeros. The statistics that the schemes need (document
+#              frequencies, document lengths...) are computed from the counts
+#              the first time they are needed for a matrix, and kept for as
+#              long as the matrix is, so that every configuration that uses
+#              the same matrix shares them. Other documents (e.g. queries)
+#              can be weighted as the documents of a matrix, with its
+#              document frequencies and average length (see weigh).
+#
+# Input:       None.
+#
+# Output:      None.
+#
+# Last edited: October 17, 2026
+
+
+#--------------------------------- IMPORTS -----------------------------------#
+import weakref
+import numpy as np
+from   scipy.sparse import csr_matrix, diags
+
+#-------------------------DEFINE GLOBAL VARIABLES-----------------------------#
+# The parameters of BM25
+bm25K1 = 1.2
+bm25B  = 0.75
+# The statistics of each matrix (see statistics), by id, with a weak
+# reference to the matrix to tell when it is gone
+cache  = {}
+
+#-----------------------------------------------------------------------------#
+# Statistics: The statistics of the counts of a (words x documents) tdm used
+#   by the weighting schemes, each computed the first time it is asked for.
+#   collection is the Statistics of the tdm whose document frequencies and
+#   average length are used (those of another tdm, to weight documents that
+#   are not part of it, and by default these).
+#-----------------------------------------------------------------------------#
+class Statistics(object):
+    def __init__ (self, TDM, collection = None):
+        # Not a reference that keeps the matrix alive (see statistics)
+        self.matrix = weakref.ref(TDM)
+        self.ndocs  = TDM.shape[1]
+        self.values = {}
+        self.collection = collection if collection is not None else self
+
+    @property
+    def TDM (self):
+        return self.matrix()
+
+    def get (self, name, compute):
+        if name not in self.values:
+            self.values[name] = compute()
+        return self.values[name]
+
+    # documentFrequency: the number of documents in which each word occurs
+    #   (nonzero, since the counts of a hashed tdm may be negative)
+    def documentFrequency (self):
+        return self.get('documentFrequency', lambda: np.asarray(
+            (self.TDM != 0).sum(axis = 1)).ravel())
+
+    def idf (self):
+        c = self.collection
+        return c.get('idf', lambda: np.log(
+            float(c.ndocs)/c.documentFrequency()))
+
+    def bm25idf (self):
+        c = self.collection
+        return c.get('bm25idf', lambda: np.log(
+            1 + (c.ndocs - c.documentFrequency() + 0.5)/
+                (c.documentFrequency() + 0.5)))
+
+    # documentLength: the number of words in each document
+    def documentLength (self):
+        return self.get('documentLength', lambda: np.asarray(
+            abs(self.TDM).sum(axis = 0)).ravel())
+
+    # averageLength: the average number of words in a document of the
+    #   collection
+    def averageLength (self):
+        c = self.collection
+        return c.get('averageLength', lambda: c.documentLength().mean()
+                                              if c.ndocs else 1.0)
+
+#-----------------------------------------------------------------------------#
+# statistics: Returns the Statistics of TDM, the same object for as long as
+#   TDM exists.
+#-----------------------------------------------------------------------------#
+def statistics (TDM):
+    key = id(TDM)
+    if key in cache and cache[key][0]() is TDM:
+        return cache[key][1]
+    stats = Statistics(TDM)
+    cache[key] = (weakref.ref(TDM, lambda ref, key = key: cache.pop(key,
+                                                                    None)),
+                  stats)
+    return stats
+
+#-----------------------------------------------------------------------------#
+# mapNonzeros: Returns TDM (CSR) with function applied to its nonzeros, and
+#   to the column (document) index of each, given as the second argument.
+#-----------------------------------------------------------------------------#
+def mapNonzeros (TDM, function):
+    TDM  = csr_matrix(TDM)
+    cols = TDM.indices
+    return csr_matrix((function(np.asarray(TDM.data, dtype = np.float64),
+                                cols), cols, TDM.indptr), shape = TDM.shape)
+
+#-----------------------------------------------------------------------------#
+# The schemes: each takes the matrix being weighted and the Statistics of the
+#   counts, and returns the weighted matrix.
+#-----------------------------------------------------------------------------#
+def weighRaw (TDM, stats):
+    return TDM
+
+def weighIDF (TDM, stats):
+    return diags(stats.idf()).dot(TDM)
+
+def weighSublinear (TDM, stats):
+    return mapNonzeros(TDM, lambda data, docs:
+                       np.sign(data)*(1 + np.log(np.abs(data))))
+
+def weighBM25 (TDM, stats):
+    lengths = stats.documentLength()
+    average = stats.averageLength()
+    norm    = bm25K1*(1 - bm25B + bm25B*lengths/(average or 1.0))
+    TDM = mapNonzeros(TDM, lambda data, docs:
+                      data*(bm25K1 + 1)/(np.abs(data) + norm[docs]))
+    return diags(stats.bm25idf()).dot(TDM)
+
+def weighL2 (TDM, stats):
+    TDM   = csr_matrix(TDM)
+    norms = np.sqrt(np.asarray(TDM.multiply(TDM).sum(axis = 0)).ravel())
+    scale = np.zeros(len(norms))
+    scale[norms > 0] = 1.0/norms[norms > 0]
+    return TDM.dot(diags(scale))
+
+schemes = {'raw'      : weighRaw,
+           'idf'      : weighIDF,
+           'sublinear': weighSublinear,
+           'bm25'     : weighBM25,
+           'l2'       : weighL2}
+
+#-----------------------------------------------------------------------------#
+# schemeName: Returns the name of the scheme meant by weighting: a name (see
+#   the header), or True or False, for 'idf' and 'raw', as in the IDF
+#   argument of calculatePersistence.
+#-----------------------------------------------------------------------------#
+def schemeName (weighting):
+    if weighting is True or weighting is False:
+        return 'idf' if weighting else 'raw'
+    return weighting
+
+#-----------------------------------------------------------------------------#
+# weigh: Returns TDM (a sparse, words x documents tdm of counts) weighted by
+#   the scheme weighting (see schemeName), as a sparse matrix. If corpus (a
+#   tdm of counts, with the same words) is given, the documents of TDM are
+#   weighted as if they were documents of corpus: with its document
+#   frequencies and average document length (e.g. to weight queries; see
+#   searchIndex.py).
+#-----------------------------------------------------------------------------#
+def weigh (TDM, weighting = 'raw', corpus = None):
+    parts = schemeName(weighting).split('+')
+    for part in parts:
+        if part not in schemes:
+            raise ValueError('unknown weighting scheme: ' + part)
+    stats = statistics(TDM) if corpus is None else \
+            Statistics(TDM, statistics(corpus))
+    weighted = TDM
+    for part in parts:
+        weighted = schemes[part](weighted, stats)
+    return csr_matrix(weighted)